@@ -0,0 +1,316 @@
+# ==================== 准入控制模块 ====================
+
+"""
+准入控制模块
+按路由类别限制同时处理的请求数，过载时尽早拒绝，而不是让所有请求一起变慢
+
+请求分为四类，各自有并发上限和有界的等待队列：
+- auth：登录、注册、刷新 Token、登出、修改密码（受 bcrypt 工作池限制，耗时长）
+- read：读取待办事项（GET /api/todos...）
+- write：修改待办事项（POST / PUT / DELETE /api/todos...）
+- transfer：导出和导入（/api/todos/export、/api/todos/import），流式响应和大请求体耗时长，
+  单独限制，避免占满 read / write 的名额或拉高它们的平均处理耗时
+某一类过载不会占满其他类别的处理能力。
+
+并发已满的请求按到达顺序排队，最多等待 ADMISSION_QUEUE_TIMEOUT 秒。
+按该类别近期的平均处理耗时估算排队时间，估算超过上限或队列已满时不再排队，
+直接返回 503 和 Retry-After；排队超时的请求同样返回 503。
+
+事件推送（/api/todos/events）是长连接，不计入并发；
+其他非 /api 路径、监控指标和运行状态统计也不受限制。
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from backend.config import (
+    ADMISSION_CONTROL_ENABLED, ADMISSION_QUEUE_TIMEOUT,
+    ADMISSION_AUTH_CONCURRENCY, ADMISSION_AUTH_QUEUE,
+    ADMISSION_READ_CONCURRENCY, ADMISSION_READ_QUEUE,
+    ADMISSION_WRITE_CONCURRENCY, ADMISSION_WRITE_QUEUE,
+    ADMISSION_TRANSFER_CONCURRENCY, ADMISSION_TRANSFER_QUEUE
+)
+from backend.metrics import Gauge, registry
+from backend.schemas import ApiResponse
+from backend.serialization import dumps_json
+
+# 认证相关的路径（/api/users 开头的路径也属于 auth）
+AUTH_PATHS = ("/api/token", "/api/token/refresh", "/api/logout")
+
+# 导出和导入的路径（单独的 transfer 类别）
+TRANSFER_PATHS = ("/api/todos/export", "/api/todos/import")
+
+# 不受准入控制的长连接路径
+EXEMPT_PATHS = ("/api/todos/events",)
+
+# 平均处理耗时的指数移动平均系数
+SERVICE_TIME_ALPHA = 0.2
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    """
+    返回请求所属的路由类别
+
+    中间件在路由匹配之前执行，因此按路径前缀和方法分类。
+
+    Args:
+        method: HTTP 方法
+        path: 请求路径
+
+    Returns:
+        Optional[str]: auth、read、write 或 transfer，不受准入控制时为 None
+    """
+    if method == "OPTIONS" or path in EXEMPT_PATHS:
+        return None
+    if path in AUTH_PATHS or path == "/api/users" or path.startswith("/api/users/"):
+        return "auth"
+    if path in TRANSFER_PATHS:
+        return "transfer"
+    if path == "/api/todos" or path.startswith("/api/todos/"):
+        return "read" if method in ("GET", "HEAD") else "write"
+    return None
+
+
+class AdmissionRejected(Exception):
+    """请求未被接纳"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("服务繁忙，请稍后重试")
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """
+    单个路由类别的并发限制和等待队列
+
+    释放名额时直接交给队首的等待者，不会被新到达的请求插队。
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        """
+        Args:
+            name: 路由类别
+            max_concurrent: 同时处理的最大请求数
+            max_queue: 排队的最大请求数
+            queue_timeout: 排队的最长时间（秒）
+        """
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # 近期单个请求处理耗时的移动平均（秒），用于估算排队时间
+        self.service_time = 0.0
+
+        # 统计指标
+        self.admitted = 0
+        self.max_queue_depth = 0
+        self.shed = {"queue_full": 0, "deadline": 0, "timeout": 0}
+
+    @property
+    def queue_depth(self) -> int:
+        """正在排队的请求数"""
+        return len(self._waiters)
+
+    def estimated_wait(self, position: int) -> float:
+        """
+        估算排在第 position 位（从 0 开始）的请求需要等待的秒数
+
+        Returns:
+            float: 估算的等待时间，还没有耗时样本时为 0
+        """
+        return (position + 1) * self.service_time / self.max_concurrent
+
+    async def acquire(self) -> None:
+        """
+        获取一个处理名额，必要时排队等待
+
+        Raises:
+            AdmissionRejected: 队列已满、估算等待超过上限或排队超时
+        """
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        position = len(self._waiters)
+        estimate = self.estimated_wait(position)
+        if position >= self.max_queue:
+            self.shed["queue_full"] += 1
+            raise AdmissionRejected(estimate)
+        if estimate > self.queue_timeout:
+            self.shed["deadline"] += 1
+            raise AdmissionRejected(estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        try:
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(future)
+            self.shed["timeout"] += 1
+            raise AdmissionRejected(self.estimated_wait(len(self._waiters)))
+        except asyncio.CancelledError:
+            # 已经分到名额后才被取消时要归还，否则名额会永久丢失
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._discard(future)
+            raise
+
+    def _discard(self, future: asyncio.Future) -> None:
+        """从队列中移除不再等待的请求"""
+        try:
+            self._waiters.remove(future)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        """归还处理名额，有请求在排队时直接交给队首"""
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                self.admitted += 1
+                return
+        self.in_flight -= 1
+
+    def observe(self, elapsed: float) -> None:
+        """记录一个请求的处理耗时"""
+        if self.service_time == 0:
+            self.service_time = elapsed
+        else:
+            self.service_time += SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+
+    def stats(self) -> dict:
+        """返回并发限制和统计指标"""
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "queue_timeout": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+            "avg_service_ms": round(self.service_time * 1000, 3),
+        }
+
+
+class AdmissionController:
+    """各路由类别的准入控制"""
+
+    def __init__(self, limiters: Dict[str, AdmissionLimiter], enabled: bool = True):
+        self.limiters = limiters
+        self.enabled = enabled
+
+    def limiter_for(self, scope) -> Optional[AdmissionLimiter]:
+        """返回请求对应的限制器，不受控制时为 None"""
+        if not self.enabled:
+            return None
+        return self.limiters.get(route_class(scope["method"], scope["path"]))
+
+    def stats(self) -> dict:
+        """返回各路由类别的统计指标"""
+        return {
+            "enabled": self.enabled,
+            "classes": {name: limiter.stats() for name, limiter in self.limiters.items()},
+        }
+
+
+# 全局准入控制器
+admission_controller = AdmissionController(
+    {
+        "auth": AdmissionLimiter("auth", ADMISSION_AUTH_CONCURRENCY, ADMISSION_AUTH_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+        "read": AdmissionLimiter("read", ADMISSION_READ_CONCURRENCY, ADMISSION_READ_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+        "write": AdmissionLimiter("write", ADMISSION_WRITE_CONCURRENCY, ADMISSION_WRITE_QUEUE, ADMISSION_QUEUE_TIMEOUT),
+        "transfer": AdmissionLimiter(
+            "transfer", ADMISSION_TRANSFER_CONCURRENCY, ADMISSION_TRANSFER_QUEUE, ADMISSION_QUEUE_TIMEOUT
+        ),
+    },
+    enabled=ADMISSION_CONTROL_ENABLED,
+)
+
+
+class AdmissionControlMiddleware:
+    """
+    准入控制 ASGI 中间件
+
+    请求占用名额直到响应发送完毕（流式响应包括发送响应体的时间）。
+    未被接纳的请求不会进入路由，直接返回 503 和 Retry-After。
+    """
+
+    def __init__(self, app, controller: AdmissionController = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.limiter_for(scope)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            await self._reject(send, e.retry_after)
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.observe(time.perf_counter() - started)
+            limiter.release()
+
+    @staticmethod
+    async def _reject(send, retry_after: float) -> None:
+        """发送 503 响应"""
+        body = dumps_json(ApiResponse(
+            success=False,
+            error="服务繁忙，请稍后重试",
+            message="请求失败"
+        ).model_dump())
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# ==================== 监控指标 ====================
+
+registry.register(Gauge(
+    "admission_in_flight", "各路由类别正在处理的请求数",
+    lambda: {(name,): limiter.in_flight for name, limiter in admission_controller.limiters.items()},
+    ("route_class",)
+))
+registry.register(Gauge(
+    "admission_queue_depth", "各路由类别正在排队的请求数",
+    lambda: {(name,): limiter.queue_depth for name, limiter in admission_controller.limiters.items()},
+    ("route_class",)
+))
+registry.register(Gauge(
+    "admission_shed_total", "未被接纳（503）的请求数",
+    lambda: {
+        (name, reason): count
+        for name, limiter in admission_controller.limiters.items()
+        for reason, count in limiter.shed.items()
+    },
+    ("route_class", "reason"), kind="counter"
+))
@@ -0,0 +1,221 @@
+# ==================== 进程内缓存模块 ====================
+
+"""
+进程内缓存模块
+
+包含：
+- TTLCache：容量有限的 LRU 缓存，每个条目带过期时间，并统计命中/未命中次数
+- BytesLRUCache：按总字节数限制容量的 LRU 缓存，条目按分组（例如用户）整体失效
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+
+class TTLCache:
+    """
+    带过期时间的 LRU 缓存
+
+    超出容量时淘汰最久未使用的条目；读取到已过期的条目时视为未命中并删除。
+    只在事件循环线程中使用，因此不加锁。
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        """
+        Args:
+            maxsize: 最多缓存的条目数，为 0 时不缓存任何内容
+            ttl: 条目默认存活时间（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+        # 统计指标
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        读取缓存条目
+
+        Returns:
+            缓存的值；不存在或已过期时返回 None
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        写入缓存条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 本条目的存活时间（秒），默认使用缓存的 ttl
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if self.maxsize <= 0 or ttl <= 0:
+            return
+
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """删除缓存条目（不存在时忽略）"""
+        if self._data.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """返回缓存的统计指标"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+class BytesLRUCache:
+    """
+    按总字节数限制容量的 LRU 缓存
+
+    值为 (版本号, 字节串)，读取时需要给出当前版本号，版本号不一致视为未命中并删除，
+    因此即使其他进程修改了数据、本进程没有收到失效通知，也不会返回过期内容。
+    每个条目属于一个分组，invalidate_group 删除分组的所有条目。
+    只在事件循环线程中使用，因此不加锁。
+    """
+
+    # 每个条目除字节串外的估算开销（键、元组、字典槽位）
+    ENTRY_OVERHEAD = 200
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: 所有条目的总字节数上限，为 0 时不缓存任何内容
+        """
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._data: "OrderedDict[Hashable, Tuple[Hashable, int, bytes]]" = OrderedDict()
+        self._groups: Dict[Hashable, Set[Hashable]] = {}
+
+        # 统计指标
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[bytes]:
+        """
+        读取缓存条目
+
+        Args:
+            key: 缓存键
+            version: 当前版本号
+
+        Returns:
+            缓存的字节串；不存在或版本号不一致时返回 None
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry[1] != version:
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def set(self, group: Hashable, key: Hashable, version: int, value: bytes) -> None:
+        """
+        写入缓存条目，超出容量时淘汰最久未使用的条目
+
+        Args:
+            group: 条目所属的分组
+            key: 缓存键
+            version: 内容对应的版本号
+            value: 字节串
+        """
+        size = len(value) + self.ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (group, version, value)
+        self._groups.setdefault(group, set()).add(key)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable) -> None:
+        """删除条目并更新字节数和分组索引"""
+        group, _, value = self._data.pop(key)
+        self.bytes -= len(value) + self.ENTRY_OVERHEAD
+        keys = self._groups.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def invalidate_group(self, group: Hashable) -> None:
+        """删除分组的所有条目（不存在时忽略）"""
+        for key in list(self._groups.get(group, ())):
+            self._remove(key)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._data.clear()
+        self._groups.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """返回缓存的统计指标"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
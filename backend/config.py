@@ -0,0 +1,244 @@
+# ==================== 运行配置模块 ====================
+
+"""
+运行配置模块
+从环境变量（以及项目根目录的 .env 文件）读取可调参数
+
+所有配置项都有默认值，未设置环境变量时行为与之前一致。
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+# 获取项目根目录，用于定位 .env 文件
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 加载 .env 文件（已存在的环境变量优先）
+load_dotenv(os.path.join(BASE_DIR, ".env"))
+
+
+# ==================== 读取辅助函数 ====================
+
+
+def env_int(name: str, default: int) -> int:
+    """读取整数类型的环境变量"""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_float(name: str, default: float) -> float:
+    """读取浮点数类型的环境变量"""
+    value = os.getenv(name)
+    return float(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    """读取布尔类型的环境变量，接受 1/true/yes/on"""
+    value = os.getenv(name)
+    if value in (None, ""):
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# ==================== 密码 Hash 工作池 ====================
+
+# 执行 bcrypt 的工作池类型：thread（线程池）或 process（进程池）
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+
+# 同时执行 bcrypt 的最大任务数（即工作池大小）
+PASSWORD_HASH_WORKERS = env_int("PASSWORD_HASH_WORKERS", os.cpu_count() or 1)
+
+# 排队等待工作池的最长时间（秒），超时返回 503
+PASSWORD_HASH_QUEUE_TIMEOUT = env_float("PASSWORD_HASH_QUEUE_TIMEOUT", 5.0)
+
+# bcrypt 轮数（cost factor），0 表示使用 passlib 默认值（12）
+# 可通过 `python -m backend.manage calibrate-bcrypt` 在目标机器上测出合适的值
+PASSWORD_HASH_ROUNDS = env_int("PASSWORD_HASH_ROUNDS", 0)
+
+# 启动时自动校准 bcrypt 轮数，取单次验证不超过目标耗时的最大轮数（覆盖 PASSWORD_HASH_ROUNDS）
+PASSWORD_HASH_CALIBRATE_ON_STARTUP = env_bool("PASSWORD_HASH_CALIBRATE_ON_STARTUP", False)
+
+# 校准的目标耗时（毫秒）
+PASSWORD_HASH_TARGET_MS = env_float("PASSWORD_HASH_TARGET_MS", 250.0)
+
+# 校准结果的上下限：下限保证最低安全强度，再快的机器也不会低于它
+PASSWORD_HASH_MIN_ROUNDS = env_int("PASSWORD_HASH_MIN_ROUNDS", 10)
+PASSWORD_HASH_MAX_ROUNDS = env_int("PASSWORD_HASH_MAX_ROUNDS", 16)
+
+
+# ==================== 准入控制 ====================
+
+# 是否按路由类别限制同时处理的请求数，超出的请求排队，排不上时直接返回 503
+ADMISSION_CONTROL_ENABLED = env_bool("ADMISSION_CONTROL_ENABLED", True)
+
+# 各类别同时处理的最大请求数和排队上限：auth（登录 / 注册等）、read（读取待办事项）、write（修改待办事项）
+ADMISSION_AUTH_CONCURRENCY = env_int("ADMISSION_AUTH_CONCURRENCY", 16)
+ADMISSION_AUTH_QUEUE = env_int("ADMISSION_AUTH_QUEUE", 64)
+ADMISSION_READ_CONCURRENCY = env_int("ADMISSION_READ_CONCURRENCY", 64)
+ADMISSION_READ_QUEUE = env_int("ADMISSION_READ_QUEUE", 256)
+ADMISSION_WRITE_CONCURRENCY = env_int("ADMISSION_WRITE_CONCURRENCY", 32)
+ADMISSION_WRITE_QUEUE = env_int("ADMISSION_WRITE_QUEUE", 128)
+
+# 导入 / 导出单独一类：请求体或响应体大、耗时长，并发上限很小，不占用也不拉高 read / write 的名额和平均耗时
+ADMISSION_TRANSFER_CONCURRENCY = env_int("ADMISSION_TRANSFER_CONCURRENCY", 2)
+ADMISSION_TRANSFER_QUEUE = env_int("ADMISSION_TRANSFER_QUEUE", 8)
+
+# 排队的最长时间（秒）；按近期处理耗时估算的等待时间超过它时，请求不再排队，立即返回 503
+ADMISSION_QUEUE_TIMEOUT = env_float("ADMISSION_QUEUE_TIMEOUT", 2.0)
+
+
+# ==================== 登录限流 ====================
+
+# 是否在计算 bcrypt 之前按用户名和 IP 限制登录 / 注册频率
+LOGIN_RATE_LIMIT_ENABLED = env_bool("LOGIN_RATE_LIMIT_ENABLED", True)
+
+# 每个用户名每分钟补充的尝试次数和允许的突发次数
+LOGIN_USERNAME_PER_MINUTE = env_float("LOGIN_USERNAME_PER_MINUTE", 6.0)
+LOGIN_USERNAME_BURST = env_int("LOGIN_USERNAME_BURST", 5)
+
+# 每个客户端 IP 每分钟补充的尝试次数和允许的突发次数
+LOGIN_IP_PER_MINUTE = env_float("LOGIN_IP_PER_MINUTE", 60.0)
+LOGIN_IP_BURST = env_int("LOGIN_IP_BURST", 30)
+
+# 进程内每个维度最多跟踪的键数量，以及清理已补满的令牌桶的间隔（秒）
+RATE_LIMIT_MAX_KEYS = env_int("RATE_LIMIT_MAX_KEYS", 100000)
+RATE_LIMIT_SWEEP_INTERVAL = env_float("RATE_LIMIT_SWEEP_INTERVAL", 60.0)
+
+# 限流状态的存储：memory（每个进程独立）或 redis（多个 worker 共享）
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+# 可信的反向代理（以逗号分隔的 IP 或 CIDR）。来自它们的请求按 X-Forwarded-For 识别客户端 IP，
+# 为空时始终使用连接的对端地址
+TRUSTED_PROXIES = os.getenv("TRUSTED_PROXIES", "")
+
+
+# ==================== 数据库 ====================
+
+# 数据库连接地址，默认使用项目根目录下的 SQLite 文件
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR}/todos.db")
+
+# SQLite 每个新连接上执行的 PRAGMA
+# WAL 允许读写并发；synchronous=NORMAL 在 WAL 下只在检查点时 fsync；
+# cache_size 为负数时单位是 KiB；busy_timeout 单位为毫秒
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "mmap_size": env_int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+    "cache_size": env_int("SQLITE_CACHE_SIZE", -64000),
+    "busy_timeout": env_int("SQLITE_BUSY_TIMEOUT_MS", 5000),
+}
+
+# 连接池配置（SQLite 文件数据库和 Postgres 都适用）
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_float("DB_POOL_TIMEOUT", 30.0)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+
+# Postgres 单条语句的超时时间（毫秒），0 表示不限制
+DB_STATEMENT_TIMEOUT_MS = env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+
+
+# ==================== 认证缓存 ====================
+
+# 已解码 Token 和用户记录的缓存时间（秒），用户删除或改密码时立即失效
+AUTH_CACHE_TTL = env_float("AUTH_CACHE_TTL", 60.0)
+
+# 认证缓存最多保存的条目数，为 0 时关闭缓存
+AUTH_CACHE_MAX_ENTRIES = env_int("AUTH_CACHE_MAX_ENTRIES", 10000)
+
+
+# ==================== Token 吊销 ====================
+
+# Refresh Token 有效期（天）
+REFRESH_TOKEN_EXPIRE_DAYS = env_float("REFRESH_TOKEN_EXPIRE_DAYS", 14.0)
+
+# 从数据库增量同步吊销记录的间隔（秒），即其他 worker 中的吊销最迟多久生效
+TOKEN_REVOCATION_SYNC_INTERVAL = env_float("TOKEN_REVOCATION_SYNC_INTERVAL", 5.0)
+
+# 删除已过期吊销记录的间隔（秒）
+TOKEN_REVOCATION_PURGE_INTERVAL = env_float("TOKEN_REVOCATION_PURGE_INTERVAL", 3600.0)
+
+
+# ==================== 列表缓存 ====================
+
+# 已编码的待办事项列表响应的缓存总字节数上限，为 0 时关闭缓存
+LIST_CACHE_MAX_BYTES = env_int("LIST_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+
+
+# ==================== 增量同步 ====================
+
+# 删除墓碑的保留天数，超过后被压缩；落后更久的客户端需要全量刷新
+TOMBSTONE_RETENTION_DAYS = env_float("TOMBSTONE_RETENTION_DAYS", 30.0)
+
+# 后台压缩删除墓碑的间隔（秒），为 0 时不在应用内压缩
+TOMBSTONE_COMPACT_INTERVAL = env_float("TOMBSTONE_COMPACT_INTERVAL", 3600.0)
+
+# 单次增量同步最多返回的变化条数，超过时要求客户端全量刷新
+MAX_SYNC_CHANGES = env_int("MAX_SYNC_CHANGES", 1000)
+
+
+# ==================== 导出 ====================
+
+# 流式导出时每批从数据库读取的行数
+EXPORT_BATCH_SIZE = env_int("EXPORT_BATCH_SIZE", 1000)
+
+
+# ==================== 导入 ====================
+
+# 批量导入时每个事务插入的行数
+IMPORT_CHUNK_SIZE = env_int("IMPORT_CHUNK_SIZE", 5000)
+
+# 导入请求体中单行的最大字节数，超过的行记为错误
+IMPORT_MAX_LINE_BYTES = env_int("IMPORT_MAX_LINE_BYTES", 64 * 1024)
+
+# 导入结果中最多返回的逐行错误数（错误总数仍完整统计）
+IMPORT_MAX_ERRORS = env_int("IMPORT_MAX_ERRORS", 100)
+
+
+# ==================== 监控指标 ====================
+
+# 是否启用 /metrics 端点及请求、SQL、连接池的指标采集
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+
+# ==================== 请求剖析 ====================
+
+# 是否为每个响应加入 Server-Timing 头（auth、db、serialize 等阶段耗时）
+PROFILING_ENABLED = env_bool("PROFILING_ENABLED", False)
+
+# 慢查询阈值（毫秒），超过时记录语句、参数结构和执行计划；0 表示不记录
+SLOW_QUERY_MS = env_float("SLOW_QUERY_MS", 0.0)
+
+# 慢查询日志是否附带 EXPLAIN 执行计划
+SLOW_QUERY_EXPLAIN = env_bool("SLOW_QUERY_EXPLAIN", True)
+
+
+# ==================== 事件推送 ====================
+
+# 事件分发后端：memory（单进程内分发）或 redis（多个 worker 通过 Redis 发布订阅共享事件）
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+
+# EVENTS_BACKEND=redis 时使用的 Redis 地址和频道
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL", "redis://localhost:6379/0")
+EVENTS_REDIS_CHANNEL = os.getenv("EVENTS_REDIS_CHANNEL", "todo-events")
+
+# 每个连接最多缓存的未发送事件数，超过时丢弃积压并通知客户端重新同步
+EVENTS_QUEUE_SIZE = env_int("EVENTS_QUEUE_SIZE", 100)
+
+# 没有事件时发送心跳注释的间隔（秒），防止代理关闭空闲连接
+EVENTS_HEARTBEAT_INTERVAL = env_float("EVENTS_HEARTBEAT_INTERVAL", 15.0)
+
+
+# ==================== 写入合并 ====================
+
+# 是否把并发的创建 / 更新合并到一个事务中提交（group commit）
+WRITE_BATCHING_ENABLED = env_bool("WRITE_BATCHING_ENABLED", False)
+
+# 每批最多合并的写操作数
+WRITE_BATCH_MAX_SIZE = env_int("WRITE_BATCH_MAX_SIZE", 64)
+
+# 最早的写操作最多等待的时间（毫秒），即写入合并带来的额外延迟上限
+WRITE_BATCH_WINDOW_MS = env_float("WRITE_BATCH_WINDOW_MS", 2.0)
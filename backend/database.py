@@ -1,54 +1,389 @@
-from sqlalchemy import create_engine
+import logging
+import re
+import time
+from typing import Optional
+
+from sqlalchemy import event, inspect, pool
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import os
+
+from backend.config import (
+    DATABASE_URL, SQLITE_PRAGMAS,
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+    DB_STATEMENT_TIMEOUT_MS, METRICS_ENABLED,
+    PROFILING_ENABLED, SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN
+)
+from backend.metrics import db_pool_checkout_wait, instrument_engine
+from backend.profiling import install_query_profiling
+
+logger = logging.getLogger(__name__)
 
 # ==================== 数据库配置 ====================
 
-# 获取项目根目录，用于构建数据库文件路径
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 各数据库对应的异步驱动
+# DATABASE_URL 未指定驱动（如 sqlite:///、postgresql://）时自动换成异步驱动，
+# 已指定异步驱动（如 sqlite+aiosqlite:///、postgresql+asyncpg://）时原样使用
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
 
-# SQLite 数据库路径
-DATABASE_URL = f"sqlite:///{BASE_DIR}/todos.db"
+# PRAGMA 取值只允许字母、数字、下划线和负号，防止拼接出其他语句
+_PRAGMA_VALUE = re.compile(r"^-?[A-Za-z0-9_]+$")
 
-# 创建数据库引擎
-# check_same_thread=False 是 SQLite 必需的配置（允许多线程访问）
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+
+def to_async_url(url: str) -> URL:
+    """
+    将数据库 URL 转换为使用异步驱动的 URL
+
+    Args:
+        url: 数据库 URL，例如 sqlite:///./todos.db
+
+    Returns:
+        URL: 使用异步驱动的 URL，例如 sqlite+aiosqlite:///./todos.db
+
+    Raises:
+        ValueError: 数据库类型不支持异步驱动时抛出
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"不支持的数据库类型: {backend}")
+    if parsed.get_driver_name() == ASYNC_DRIVERS[backend]:
+        return parsed
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def build_engine(
+    url: str,
+    sqlite_pragmas: Optional[dict] = None,
+    pool_size: int = DB_POOL_SIZE,
+    max_overflow: int = DB_MAX_OVERFLOW,
+    pool_timeout: float = DB_POOL_TIMEOUT,
+    pool_recycle: int = DB_POOL_RECYCLE,
+    pool_pre_ping: bool = DB_POOL_PRE_PING,
+    statement_timeout_ms: int = DB_STATEMENT_TIMEOUT_MS,
+) -> AsyncEngine:
+    """
+    按配置创建异步数据库引擎
+
+    - SQLite：在每个新连接上执行 sqlite_pragmas；文件数据库使用连接池复用连接
+      （aiosqlite 默认每次请求新建连接），内存数据库保持单连接
+    - Postgres：使用连接池参数，并通过 statement_timeout 限制单条语句的执行时间
+
+    Args:
+        url: 数据库 URL
+        sqlite_pragmas: SQLite 连接上执行的 PRAGMA，例如 {"journal_mode": "WAL"}
+        pool_size: 连接池常驻连接数
+        max_overflow: 连接池允许临时超出的连接数
+        pool_timeout: 等待空闲连接的最长时间（秒）
+        pool_recycle: 连接的最长复用时间（秒）
+        pool_pre_ping: 取出连接时是否先检测连接可用
+        statement_timeout_ms: Postgres 语句超时（毫秒），0 表示不限制
+
+    Returns:
+        AsyncEngine: 异步数据库引擎
+    """
+    async_url = to_async_url(url)
+    backend = async_url.get_backend_name()
+    options = {}
+
+    is_memory_sqlite = backend == "sqlite" and async_url.database in (None, "", ":memory:")
+    if not is_memory_sqlite:
+        options.update(
+            poolclass=pool.AsyncAdaptedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+        )
+
+    if backend == "postgresql" and statement_timeout_ms > 0:
+        options["connect_args"] = {
+            "server_settings": {"statement_timeout": str(statement_timeout_ms)}
+        }
+
+    engine = create_async_engine(async_url, **options)
+
+    if backend == "sqlite" and sqlite_pragmas:
+        for name, value in sqlite_pragmas.items():
+            if not _PRAGMA_VALUE.match(str(value)):
+                raise ValueError(f"无效的 PRAGMA 取值: {name}={value}")
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in sqlite_pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
+
+
+# 创建异步数据库引擎
+# 查询在驱动中异步执行，不会阻塞事件循环
+engine = build_engine(DATABASE_URL, SQLITE_PRAGMAS)
+if METRICS_ENABLED:
+    instrument_engine(engine)
+if PROFILING_ENABLED or SLOW_QUERY_MS:
+    install_query_profiling(engine, SLOW_QUERY_MS, SLOW_QUERY_EXPLAIN)
 
 # 创建会话工厂
-# autocommit=False: 需要手动提交事务
 # autoflush=False: 需要手动刷新会话
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: 提交后仍可直接读取对象属性，避免隐式的异步加载
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 
 # SQLAlchemy 声明基类，所有模型都要继承它
 Base = declarative_base()
 
 
-def get_db():
+async def get_db():
     """
     FastAPI 依赖注入：获取数据库会话
     
-    生成器函数，每次请求创建一个新的数据库会话，
+    异步生成器函数，每次请求创建一个新的 AsyncSession，
     请求完成后自动关闭连接
     
     Yields:
-        Session: SQLAlchemy 数据库会话
+        AsyncSession: SQLAlchemy 异步数据库会话
     """
-    db = SessionLocal()
-    try:
+    async with SessionLocal() as db:
+        if METRICS_ENABLED:
+            # 提前获取连接，记录在连接池上的等待时间
+            started = time.perf_counter()
+            await db.connection()
+            db_pool_checkout_wait.observe(time.perf_counter() - started)
         yield db
-    finally:
-        db.close()
 
 
-def init_db():
+# 支持 INSERT ... ON CONFLICT 的方言
+UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def upsert_insert(db: AsyncSession, table):
+    """
+    构建会话所用数据库方言的 INSERT 语句，可继续调用 on_conflict_do_update / on_conflict_do_nothing
+
+    Args:
+        db: 异步数据库会话
+        table: 模型类或表
+
+    Returns:
+        Insert: 对应方言的 INSERT 语句
+
+    Raises:
+        ValueError: 数据库不支持 INSERT ... ON CONFLICT 时抛出
+    """
+    dialect = db.bind.dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise ValueError(f"不支持 INSERT ... ON CONFLICT 的数据库类型: {dialect}")
+    return UPSERT_INSERTS[dialect](table)
+
+
+# 已从模型中移除、没有任何查询使用的索引：(表名, 索引名)，旧数据库中存在时删除
+OBSOLETE_INDEXES = (("todos", "ix_todos_user_updated"),)
+
+
+def add_missing_columns(connection):
+    """
+    为已存在的表补加模型中新增的列
+    
+    只处理新增列（ALTER TABLE ... ADD COLUMN），新增的非空列需要有 server_default。
+    
+    Args:
+        connection: SQLAlchemy 同步连接
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    ddl_compiler = connection.dialect.ddl_compiler(connection.dialect, None)
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_spec = ddl_compiler.get_column_specification(column)
+                connection.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column_spec}")
+
+
+def drop_obsolete_indexes(connection):
+    """
+    删除 OBSOLETE_INDEXES 中仍存在于数据库的索引
+    
+    Args:
+        connection: SQLAlchemy 同步连接
+    """
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table_name, index_name in OBSOLETE_INDEXES:
+        if table_name not in existing_tables:
+            continue
+        if index_name not in {index["name"] for index in inspector.get_indexes(table_name)}:
+            continue
+        # MySQL 的 DROP INDEX 需要指定表名
+        suffix = f" ON {table_name}" if connection.dialect.name == "mysql" else ""
+        connection.exec_driver_sql(f"DROP INDEX {index_name}{suffix}")
+        logger.info(f"已删除废弃的索引: {index_name}")
+
+
+# ==================== 全文搜索 ====================
+
+# 是否已创建 FTS5 全文索引；为 False 时搜索接口使用 LIKE 回退
+fts_enabled = False
+
+# todos_fts 是以 todos 为内容表的 FTS5 外部内容表，只保存索引，不重复保存文本。
+# user_id 也作为索引列，搜索时在 MATCH 中限定用户，只读取该用户的倒排列表。
+# 由触发器同步，批量导入等 Core 语句写入的行也会被索引。
+# prefix='2 3' 为 2、3 个字符的前缀建立额外索引，加速短前缀查询。
+TODO_FTS_COLUMNS = ("text", "user_id")
+
+TODO_FTS_INSERT_TRIGGER = """CREATE TRIGGER todos_fts_ai AFTER INSERT ON todos BEGIN
+        INSERT INTO todos_fts(rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+    END"""
+
+# 批量导入在同一事务中暂时删除插入触发器，整块插入后用一条语句建立索引再恢复触发器。
+# SQLite 的 DDL 是事务性的，写事务期间其他连接无法写入，不会有行漏建索引；
+# 事务回滚时触发器随之恢复。
+DROP_TODO_FTS_INSERT_TRIGGER = "DROP TRIGGER todos_fts_ai"
+
+TODO_FTS_DDL = (
+    """CREATE VIRTUAL TABLE todos_fts USING fts5(
+        text, user_id, content='todos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    TODO_FTS_INSERT_TRIGGER,
+    """CREATE TRIGGER todos_fts_ad AFTER DELETE ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, text, user_id) VALUES ('delete', old.id, old.text, old.user_id);
+    END""",
+    """CREATE TRIGGER todos_fts_au AFTER UPDATE OF text ON todos BEGIN
+        INSERT INTO todos_fts(todos_fts, rowid, text, user_id) VALUES ('delete', old.id, old.text, old.user_id);
+        INSERT INTO todos_fts(rowid, text, user_id) VALUES (new.id, new.text, new.user_id);
+    END""",
+    # 为已有数据建立索引
+    "INSERT INTO todos_fts(todos_fts) VALUES ('rebuild')",
+)
+
+# 旧版本的全文索引列不同时，先删除再按 TODO_FTS_DDL 重建
+DROP_TODO_FTS_DDL = (
+    "DROP TRIGGER IF EXISTS todos_fts_ai",
+    "DROP TRIGGER IF EXISTS todos_fts_ad",
+    "DROP TRIGGER IF EXISTS todos_fts_au",
+    "DROP TABLE todos_fts",
+)
+
+
+def create_todo_fts(connection) -> bool:
+    """
+    在 SQLite 上创建待办事项的 FTS5 全文索引和同步触发器（已存在时跳过）
+    
+    已存在的全文索引列与 TODO_FTS_COLUMNS 不同（旧版本创建）时删除后重建。
+    
+    Args:
+        connection: SQLAlchemy 同步连接
+        
+    Returns:
+        bool: 全文索引是否可用；非 SQLite 或 SQLite 未编译 FTS5 时为 False
+    """
+    global fts_enabled
+    if connection.dialect.name != "sqlite":
+        fts_enabled = False
+        return False
+    
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'todos_fts'"
+    ).first()
+    if exists:
+        columns = tuple(row[1] for row in connection.exec_driver_sql("PRAGMA table_info(todos_fts)"))
+        if columns != TODO_FTS_COLUMNS:
+            logger.info("全文索引结构已变化，重建 todos_fts")
+            for statement in DROP_TODO_FTS_DDL:
+                connection.exec_driver_sql(statement)
+            exists = None
+    if not exists:
+        try:
+            # 先单独创建虚拟表：SQLite 未编译 FTS5 时在这里失败，不会留下触发器
+            connection.exec_driver_sql(TODO_FTS_DDL[0])
+        except Exception as e:
+            logger.warning(f"无法创建 FTS5 全文索引，搜索将使用 LIKE: {str(e)}")
+            fts_enabled = False
+            return False
+        for statement in TODO_FTS_DDL[1:]:
+            connection.exec_driver_sql(statement)
+    
+    fts_enabled = True
+    return True
+
+
+def create_schema(connection):
+    """
+    在给定连接上创建所有表和索引
+    
+    对已存在的表，补加模型中新增的列和索引，删除已废弃的索引；SQLite 上同时创建全文索引。
+    统计计数器表是新建的时，根据已有的待办事项回填计数器。
+    
+    Args:
+        connection: SQLAlchemy 同步连接
+    """
+    existing_tables = set(inspect(connection).get_table_names())
+    Base.metadata.create_all(bind=connection)
+    add_missing_columns(connection)
+    if "token_revocations" in existing_tables:
+        dedupe_token_revocations(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+    drop_obsolete_indexes(connection)
+    create_todo_fts(connection)
+    if "todos" in existing_tables and "todo_stats" not in existing_tables:
+        backfill_todo_stats(connection)
+
+
+def dedupe_token_revocations(connection):
+    """
+    jti 唯一索引还不存在时，删除重复的单个 Token 吊销记录
+    
+    旧版本并发轮换同一个 Refresh Token 时可能写入了重复的 jti，需要先去重才能建唯一索引。
+    
+    Args:
+        connection: SQLAlchemy 同步连接
+    """
+    from backend.queries import duplicate_token_revocations_delete_statement
+    
+    existing_indexes = {index["name"] for index in inspect(connection).get_indexes("token_revocations")}
+    if "ux_token_revocations_jti" in existing_indexes:
+        return
+    removed = connection.execute(duplicate_token_revocations_delete_statement()).rowcount
+    if removed:
+        logger.info(f"已删除重复的 Token 吊销记录: {removed} 条")
+
+
+def backfill_todo_stats(connection):
+    """
+    根据已有的待办事项回填统计计数器
+    
+    Args:
+        connection: SQLAlchemy 同步连接
+    """
+    # 查询构建模块依赖模型，模型又依赖本模块，因此在函数内导入
+    from backend.queries import todo_stats_rebuild_statements
+    
+    for statement in todo_stats_rebuild_statements():
+        connection.execute(statement)
+    logger.info("已根据现有待办事项回填统计计数器")
+
+
+async def init_db():
     """
     初始化数据库
     
     创建所有已定义的表（todos 表）。
     应用启动时自动调用，如果表已存在则不再创建。
     """
-    Base.metadata.create_all(bind=engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(create_schema)
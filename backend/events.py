@@ -0,0 +1,271 @@
+# ==================== 事件推送模块 ====================
+
+"""
+事件推送模块
+把已提交的待办事项变化实时推送给同一用户的所有连接（Server-Sent Events）
+
+包含：
+- EventBroker：进程内按用户分发事件，每个连接一个有界队列
+- RedisEventBackend：可选的 Redis 发布订阅后端，多个 worker 之间共享事件
+- format_sse：编码为 text/event-stream 帧
+
+事件在发布时只编码一次，同一用户的多个连接共享同一份字节。
+连接的队列满时丢弃积压，改为发送一条 resync 事件，
+客户端收到后通过 GET /api/todos/changes 补齐变化。
+"""
+
+import asyncio
+import json
+import logging
+from contextlib import contextmanager
+from typing import Dict, Optional, Set
+
+from backend.config import EVENTS_QUEUE_SIZE
+from backend.metrics import Gauge, registry
+from backend.serialization import dumps_json
+
+# redis 为可选依赖，只有 EVENTS_BACKEND=redis 时需要
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - 取决于运行环境
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(event: str, data: bytes, event_id: Optional[int] = None) -> bytes:
+    """
+    编码一条 Server-Sent Events 帧
+
+    Args:
+        event: 事件类型
+        data: 单行 JSON 数据
+        event_id: 事件 ID（使用版本号，客户端重连时通过 Last-Event-ID 带回）
+
+    Returns:
+        bytes: 以空行结尾的事件帧
+    """
+    frame = b"event: " + event.encode() + b"\n"
+    if event_id is not None:
+        frame += b"id: " + str(event_id).encode() + b"\n"
+    return frame + b"data: " + data + b"\n\n"
+
+
+# 队列溢出时代替积压事件发送的帧
+RESYNC_FRAME = format_sse("resync", b'{"reason":"overflow"}')
+
+
+# ==================== 进程内分发 ====================
+
+
+class Subscription:
+    """一个 SSE 连接的事件队列"""
+
+    def __init__(self, user_id: int, queue_size: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    def put(self, frame: bytes) -> bool:
+        """
+        放入一条事件帧，队列已满时清空积压并放入 resync
+
+        Returns:
+            bool: 是否发生了溢出
+        """
+        try:
+            self.queue.put_nowait(frame)
+            return False
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_FRAME)
+            return True
+
+
+class EventBroker:
+    """
+    按用户分发待办事项事件
+
+    未配置后端时，publish 直接分发给本进程的连接；
+    配置后端后，publish 发送到后端，由后端把所有 worker 发布的事件交给 deliver。
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self.backend = None
+        self._subscribers: Dict[int, Set[Subscription]] = {}
+        self._published = 0
+        self._delivered = 0
+        self._overflows = 0
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        """
+        订阅用户的事件，退出上下文时取消订阅
+
+        Args:
+            user_id: 用户 ID
+
+        Yields:
+            Subscription: 连接的事件队列
+        """
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def deliver(self, user_id: int, frame: bytes) -> None:
+        """把事件帧放入本进程中该用户所有连接的队列"""
+        for subscription in self._subscribers.get(user_id, ()):
+            if subscription.put(frame):
+                self._overflows += 1
+            self._delivered += 1
+
+    async def publish(self, user_id: int, event: str, data: dict, revision: Optional[int] = None) -> None:
+        """
+        发布一条事件
+
+        在事务提交之后调用；发布失败只记录日志，不影响已经成功的请求。
+
+        Args:
+            user_id: 用户 ID
+            event: 事件类型，例如 todo.created
+            data: 事件数据
+            revision: 产生该事件的版本号
+        """
+        self._published += 1
+        frame = format_sse(event, dumps_json(data), revision)
+        if self.backend is None:
+            self.deliver(user_id, frame)
+            return
+        try:
+            await self.backend.publish(user_id, frame)
+        except Exception as e:
+            logger.error(f"发布事件失败: {str(e)}")
+
+    async def start(self, backend=None) -> None:
+        """设置并启动分发后端，None 表示只在进程内分发"""
+        self.backend = backend
+        if backend is not None:
+            await backend.start(self.deliver)
+
+    async def stop(self) -> None:
+        """停止分发后端"""
+        if self.backend is not None:
+            await self.backend.stop()
+            self.backend = None
+
+    def stats(self) -> dict:
+        """返回连接数和分发计数"""
+        return {
+            "backend": self.backend.name if self.backend is not None else "memory",
+            "users": len(self._subscribers),
+            "connections": sum(len(subscribers) for subscribers in self._subscribers.values()),
+            "published": self._published,
+            "delivered": self._delivered,
+            "overflows": self._overflows,
+        }
+
+
+# ==================== Redis 后端 ====================
+
+
+class RedisEventBackend:
+    """
+    通过 Redis 发布订阅在多个 worker 之间共享事件
+
+    所有 worker 订阅同一个频道，消息为 {"user_id": ..., "frame": ...}，
+    收到后交给本进程的 EventBroker.deliver。发布者自己也通过订阅收到事件，
+    因此同一 worker 内的事件顺序与 Redis 中的顺序一致。
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str):
+        if aioredis is None:
+            raise RuntimeError("EVENTS_BACKEND=redis 需要安装 redis（pip install redis）")
+        self.channel = channel
+        self._client = aioredis.from_url(url)
+        self._pubsub = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, deliver) -> None:
+        """订阅频道并启动接收任务"""
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._task = asyncio.create_task(self._listen(deliver))
+
+    async def _listen(self, deliver) -> None:
+        """接收频道中的事件并在本进程内分发"""
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    payload = json.loads(message["data"])
+                    deliver(payload["user_id"], payload["frame"].encode())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"接收 Redis 事件失败，1 秒后重试: {str(e)}")
+                await asyncio.sleep(1)
+
+    async def publish(self, user_id: int, frame: bytes) -> None:
+        """把事件帧发布到频道"""
+        payload = json.dumps({"user_id": user_id, "frame": frame.decode()})
+        await self._client.publish(self.channel, payload)
+
+    async def stop(self) -> None:
+        """停止接收任务并关闭连接"""
+        if self._task is not None:
+            self._task.cancel()
+        if self._pubsub is not None:
+            await self._pubsub.close()
+        await self._client.close()
+
+
+def create_event_backend(name: str, redis_url: str, redis_channel: str):
+    """
+    根据配置创建分发后端
+
+    Args:
+        name: memory 或 redis
+        redis_url: Redis 地址
+        redis_channel: Redis 频道
+
+    Returns:
+        分发后端，memory 时为 None
+
+    Raises:
+        ValueError: 不支持的后端
+    """
+    if name == "memory":
+        return None
+    if name == "redis":
+        return RedisEventBackend(redis_url, redis_channel)
+    raise ValueError(f"不支持的事件分发后端: {name}")
+
+
+# 全局事件分发器
+broker = EventBroker(EVENTS_QUEUE_SIZE)
+
+
+# ==================== 监控指标 ====================
+
+registry.register(Gauge(
+    "events_connections", "当前的事件推送连接数",
+    lambda: {(): broker.stats()["connections"]}
+))
+registry.register(Gauge(
+    "events_published_total", "发布的事件数",
+    lambda: {(): broker.stats()["published"]}, kind="counter"
+))
+registry.register(Gauge(
+    "events_overflows_total", "因队列已满改为发送 resync 的次数",
+    lambda: {(): broker.stats()["overflows"]}, kind="counter"
+))
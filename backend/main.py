@@ -1,20 +1,67 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+import asyncio
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Optional
 import logging
 
-from backend.database import get_db, init_db
+from backend.config import (
+    TOMBSTONE_RETENTION_DAYS, TOMBSTONE_COMPACT_INTERVAL, MAX_SYNC_CHANGES,
+    EXPORT_BATCH_SIZE, IMPORT_CHUNK_SIZE, IMPORT_MAX_LINE_BYTES, IMPORT_MAX_ERRORS,
+    METRICS_ENABLED, PROFILING_ENABLED, LIST_CACHE_MAX_BYTES,
+    EVENTS_BACKEND, EVENTS_REDIS_URL, EVENTS_REDIS_CHANNEL, EVENTS_HEARTBEAT_INTERVAL,
+    PASSWORD_HASH_CALIBRATE_ON_STARTUP, PASSWORD_HASH_TARGET_MS,
+    PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS,
+    TOKEN_REVOCATION_SYNC_INTERVAL, TOKEN_REVOCATION_PURGE_INTERVAL
+)
+from backend.cache import BytesLRUCache
+from backend.metrics import Gauge, MetricsMiddleware, registry, render_metrics
+from backend.profiling import ProfilingMiddleware, timed
+from backend import database
+from backend.database import SessionLocal, get_db, init_db
 from backend.models import User, Todo
+from backend.queries import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+    encode_cursor, decode_cursor, todo_list_query,
+    todo_owner_query, todo_update_returning_statement, todo_delete_returning_statement,
+    user_by_username_query, user_token_version_bump_statement,
+    todo_owners_query, todo_bulk_update_statement, todo_bulk_delete_statement,
+    todos_by_ids_query, todo_sync_state_query, todo_changes_query, tombstones_query,
+    todo_export_query, todo_bulk_insert_statement, todo_fts_index_statement,
+    search_terms, todo_search_query
+)
 from backend.schemas import (
-    UserCreate, UserResponse, Token,
-    TodoCreate, TodoUpdate, TodoResponse,
+    UserCreate, UserResponse, Token, RefreshTokenRequest, LogoutRequest, PasswordChange,
+    TodoCreate, TodoUpdate, TodoResponse, TodoBatchRequest,
     ApiResponse
 )
+from backend.serialization import (
+    todo_row_to_dict, todo_rows_to_dicts, encode_api_response, dumps_json,
+    encode_ndjson_rows, encode_csv_rows, iter_ndjson_lines
+)
+from backend.revisions import (
+    bump_revision, current_revision, make_etag, etag_matches,
+    add_tombstones, compact_tombstones
+)
+from backend.events import broker, create_event_backend, format_sse
+from backend.write_batcher import close_write_batchers, run_write, write_batching_stats
+from backend.rate_limit import client_ip, login_throttle
+from backend.admission import AdmissionControlMiddleware, admission_controller
+from backend.stats import adjust_todo_stats, completion_delta, get_todo_stats
+from backend.token_revocation import (
+    revocation_list, revoke_tokens, consume_refresh_token, token_revocation, user_revocation,
+    purge_expired_revocations
+)
 from backend.security import (
-    hash_password, verify_password,
-    create_access_token, get_current_user,
-    ACCESS_TOKEN_EXPIRE_MINUTES
+    hash_password_async, verify_password_async,
+    create_token_pair, verify_token, get_current_user, get_token_claims, auth_cache_stats,
+    CurrentUser, hash_pool, REFRESH_TOKEN_EXPIRE_MINUTES,
+    calibrate_bcrypt_rounds, configure_bcrypt_rounds, password_needs_rehash, schedule_rehash, wait_rehash_tasks, bcrypt_stats
 )
 
 # 配置日志
@@ -28,6 +75,9 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# 准入控制：按路由类别限制并发，过载时返回 503（在 CORS 内侧，拒绝的响应也带 CORS 头）
+app.add_middleware(AdmissionControlMiddleware)
+
 # 配置 CORS 中间件
 app.add_middleware(
     CORSMiddleware,
@@ -37,15 +87,100 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 按路由统计请求数和延迟（最外层，包含 CORS 等中间件的耗时）
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# 可选的请求剖析：响应头 Server-Timing 给出各阶段耗时
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+
+# 已编码的列表响应缓存，按用户分组；读取时用版本号校验，多进程部署下也不会返回过期内容
+todo_list_cache = BytesLRUCache(LIST_CACHE_MAX_BYTES)
+
+registry.register(Gauge(
+    "list_cache_bytes", "列表缓存占用的字节数",
+    lambda: {(): todo_list_cache.bytes}
+))
+for _field in ("hits", "misses", "evictions", "invalidations"):
+    registry.register(Gauge(
+        f"list_cache_{_field}_total", f"列表缓存 {_field} 次数",
+        lambda field=_field: {(): getattr(todo_list_cache, field)}, kind="counter"
+    ))
+
+
+def todos_changed(user_id: int) -> None:
+    """用户的待办事项在本进程中提交了修改：删除该用户的列表缓存"""
+    todo_list_cache.invalidate_group(user_id)
+
+
+async def compact_tombstones_periodically():
+    """后台任务：定期压缩超过保留期的删除墓碑"""
+    while True:
+        await asyncio.sleep(TOMBSTONE_COMPACT_INTERVAL)
+        try:
+            async with SessionLocal() as db:
+                removed = await compact_tombstones(db, TOMBSTONE_RETENTION_DAYS)
+            if removed:
+                logger.info(f"压缩删除墓碑: {removed} 条")
+        except Exception as e:
+            logger.error(f"压缩删除墓碑失败: {str(e)}")
+
+
+async def sync_token_revocations_periodically():
+    """后台任务：定期同步其他 worker 的 Token 吊销，并删除已过期的吊销记录"""
+    last_purge = asyncio.get_running_loop().time()
+    while True:
+        await asyncio.sleep(TOKEN_REVOCATION_SYNC_INTERVAL)
+        try:
+            async with SessionLocal() as db:
+                await revocation_list.sync(db)
+                if asyncio.get_running_loop().time() - last_purge >= TOKEN_REVOCATION_PURGE_INTERVAL:
+                    last_purge = asyncio.get_running_loop().time()
+                    removed = await purge_expired_revocations(db)
+                    if removed:
+                        logger.info(f"删除过期的 Token 吊销记录: {removed} 条")
+        except Exception as e:
+            logger.error(f"同步 Token 吊销记录失败: {str(e)}")
+
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
     logger.info("初始化数据库...")
-    init_db()
+    await init_db()
+    if PASSWORD_HASH_CALIBRATE_ON_STARTUP:
+        # 校准耗时约为目标耗时的数倍，放到线程中执行，避免阻塞事件循环
+        rounds, measured_ms = await asyncio.to_thread(
+            calibrate_bcrypt_rounds, PASSWORD_HASH_TARGET_MS, PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS
+        )
+        configure_bcrypt_rounds(rounds)
+        logger.info(f"bcrypt 轮数校准为 {rounds}（单次验证约 {measured_ms:.0f} ms，目标 {PASSWORD_HASH_TARGET_MS:.0f} ms）")
+    async with SessionLocal() as db:
+        await revocation_list.sync(db)
+    await broker.start(create_event_backend(EVENTS_BACKEND, EVENTS_REDIS_URL, EVENTS_REDIS_CHANNEL))
+    if TOMBSTONE_COMPACT_INTERVAL > 0:
+        app.state.compaction_task = asyncio.create_task(compact_tombstones_periodically())
+    if TOKEN_REVOCATION_SYNC_INTERVAL > 0:
+        app.state.revocation_sync_task = asyncio.create_task(sync_token_revocations_periodically())
     logger.info("应用启动完成")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """应用关闭事件"""
+    for name in ("compaction_task", "revocation_sync_task"):
+        task = getattr(app.state, name, None)
+        if task is not None:
+            task.cancel()
+    await wait_rehash_tasks()
+    await close_write_batchers()
+    await broker.stop()
+    if login_throttle.backend is not None:
+        await login_throttle.backend.close()
+
+
 @app.get("/", tags=["root"])
 async def root():
     """根路由"""
@@ -57,25 +192,73 @@ async def root():
     }
 
 
+@app.get("/api/system/stats", response_model=ApiResponse, tags=["system"])
+async def system_stats():
+    """
+    运行状态统计
+    
+    返回进程内各组件的统计指标，便于观察负载情况。
+    
+    Returns:
+        ApiResponse: 包含各组件统计指标的响应
+    """
+    return ApiResponse(
+        success=True,
+        data={
+            "password_hashing": hash_pool.stats(),
+            "bcrypt": bcrypt_stats(),
+            "login_throttle": login_throttle.stats(),
+            "admission": admission_controller.stats(),
+            "auth_cache": auth_cache_stats(),
+            "token_revocation": revocation_list.stats(),
+            "events": broker.stats(),
+            "write_batching": write_batching_stats(),
+            "list_cache": todo_list_cache.stats(),
+        },
+        message="获取运行状态成功"
+    )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus 指标
+    
+    以 Prometheus 文本格式返回请求、SQL、连接池、bcrypt 和认证缓存指标。
+    METRICS_ENABLED 关闭时返回 404。
+    
+    Returns:
+        PlainTextResponse: Prometheus 文本格式（0.0.4）的指标
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 # ==================== 用户认证 API 路由 ====================
 
 @app.post("/api/users", response_model=ApiResponse, status_code=status.HTTP_201_CREATED, tags=["auth"])
-async def register_user(user_create: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user_create: UserCreate, request: Request, db: AsyncSession = Depends(get_db)):
     """
     用户注册
     
     创建新用户账户。用户名必须唯一。
+    与登录共用按 IP 的频率限制，超出时返回 429，不计算 bcrypt。
+    注册不消耗用户名的尝试次数。
     
     Args:
         user_create: 用户注册数据（用户名和密码）
-        db: 数据库会话
+        request: 请求对象，用于获取客户端 IP
+        db: 异步数据库会话
         
     Returns:
         ApiResponse: 包含新用户信息的响应
     """
     try:
+        await login_throttle.check(None, client_ip(request))
+        
         # 检查用户名是否已存在
-        existing_user = db.query(User).filter(User.username == user_create.username).first()
+        existing_user = (await db.execute(user_by_username_query(user_create.username))).scalar_one_or_none()
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -85,11 +268,11 @@ async def register_user(user_create: UserCreate, db: Session = Depends(get_db)):
         # 创建新用户
         db_user = User(
             username=user_create.username,
-            hashed_password=hash_password(user_create.password)
+            hashed_password=await hash_password_async(user_create.password)
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
         
         logger.info(f"新用户注册: {db_user.username} (ID: {db_user.id})")
         
@@ -103,7 +286,7 @@ async def register_user(user_create: UserCreate, db: Session = Depends(get_db)):
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"用户注册失败: {str(e)}")
         return ApiResponse(
             success=False,
@@ -113,44 +296,59 @@ async def register_user(user_create: UserCreate, db: Session = Depends(get_db)):
 
 
 @app.post("/api/token", response_model=ApiResponse, tags=["auth"])
-async def login(username: str, password: str, db: Session = Depends(get_db)):
+async def login(
+    username: str,
+    password: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db)
+):
     """
     用户登录
     
-    验证用户凭证并返回 JWT Access Token。
+    验证用户凭证并返回 JWT Access Token 和 Refresh Token。
+    Access Token 过期后用 Refresh Token 调用 /api/token/refresh 换取新的 Token，无需重新计算 bcrypt。
+    按用户名和客户端 IP 限制尝试频率，超出时直接返回 429（带 Retry-After），
+    不查询用户也不计算 bcrypt。用户名的尝试次数只在密码错误时消耗。
+    限流统计见 /api/system/stats 的 login_throttle。
+    保存的 hash 轮数低于当前 bcrypt 轮数时，在独立的后台任务中重新计算并保存，
+    不增加本次登录的延迟，也不占用本次请求的准入名额。
     
     Args:
         username: 用户名
         password: 密码
-        db: 数据库会话
+        request: 请求对象，用于获取客户端 IP
+        db: 异步数据库会话
         
     Returns:
-        ApiResponse: 包含 access_token 的响应
+        ApiResponse: 包含 access_token 和 refresh_token 的响应
     """
     try:
+        # 在任何 Hash 计算之前限流
+        await login_throttle.check(username, client_ip(request))
+        
         # 查找用户
-        user = db.query(User).filter(User.username == username).first()
-        if not user or not verify_password(password, user.hashed_password):
+        user = (await db.execute(user_by_username_query(username))).scalar_one_or_none()
+        if not user or not await verify_password_async(password, user.hashed_password):
+            # 验证失败：check 预留的用户名令牌不退还
+            await login_throttle.record_failure(username)
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="用户名或密码错误"
             )
+        # 只有验证失败才消耗用户名的尝试次数，成功时退还预留的令牌
+        await login_throttle.record_success(username)
         
-        # 创建 Access Token
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.username},
-            expires_delta=access_token_expires
-        )
+        if password_needs_rehash(user.hashed_password):
+            schedule_rehash(db.bind, user.id, password, user.hashed_password)
+        
+        # 创建 Access Token 和 Refresh Token
+        tokens = Token(**create_token_pair(user.username, user.id, user.token_version))
         
         logger.info(f"用户登录成功: {user.username}")
         
         return ApiResponse(
             success=True,
-            data={
-                "access_token": access_token,
-                "token_type": "bearer"
-            },
+            data=tokens.model_dump(),
             message="登录成功"
         )
     except HTTPException:
@@ -164,32 +362,259 @@ async def login(username: str, password: str, db: Session = Depends(get_db)):
         )
 
 
+@app.post("/api/token/refresh", response_model=ApiResponse, tags=["auth"])
+async def refresh_token(body: RefreshTokenRequest, db: AsyncSession = Depends(get_db)):
+    """
+    刷新 Token
+    
+    用 Refresh Token 换取新的一对 Token，不需要密码也不计算 bcrypt。
+    旧的 Refresh Token 随即被吊销（轮换），不能再次使用：吊销记录的 jti 唯一，
+    并发使用同一个 Refresh Token 时只有第一个请求能成功。
+    
+    Args:
+        body: 包含 refresh_token 的请求体
+        db: 异步数据库会话
+        
+    Returns:
+        ApiResponse: 包含新的 access_token 和 refresh_token 的响应
+        
+    Raises:
+        HTTPException: Refresh Token 无效、已过期或已被吊销，或用户不存在时抛出 401 异常
+    """
+    try:
+        claims = verify_token(body.refresh_token, token_type="refresh")
+        user = (await db.execute(user_by_username_query(claims.get("sub", "")))).scalar_one_or_none()
+        if user is None or user.id != claims.get("uid"):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="用户不存在",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        
+        # 修改密码后旧版本的 Token 失效（数据库中的版本号，不依赖吊销列表的同步）
+        if claims.get("ver", 0) < user.token_version or not await consume_refresh_token(db, claims):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token 已失效",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        tokens = Token(**create_token_pair(user.username, user.id, user.token_version))
+        
+        return ApiResponse(
+            success=True,
+            data=tokens.model_dump(),
+            message="刷新 Token 成功"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"刷新 Token 失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            error=str(e),
+            message="刷新 Token 失败"
+        )
+
+
+@app.post("/api/logout", response_model=ApiResponse, tags=["auth"])
+async def logout(
+    body: Optional[LogoutRequest] = None,
+    claims: dict = Depends(get_token_claims),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    登出
+    
+    立即吊销当前的 Access Token；请求体中带有 Refresh Token 时一并吊销。
+    不属于当前用户或已失效的 Refresh Token 会被忽略。
+    
+    Args:
+        body: 可选的请求体，包含要一并吊销的 refresh_token
+        claims: 当前 Access Token 的 claims
+        db: 异步数据库会话
+        current_user: 当前认证的用户
+        
+    Returns:
+        ApiResponse: 登出结果
+    """
+    try:
+        revocations = []
+        # 没有 jti 的旧 Token 无法单独吊销，只能等待过期
+        if "jti" in claims and "uid" in claims:
+            revocations.append(token_revocation(claims))
+        if body is not None and body.refresh_token:
+            try:
+                refresh_claims = verify_token(body.refresh_token, token_type="refresh")
+            except HTTPException:
+                refresh_claims = None
+            if refresh_claims is not None and refresh_claims.get("uid") == current_user.id:
+                revocations.append(token_revocation(refresh_claims))
+        
+        await revoke_tokens(db, revocations)
+        logger.info(f"用户登出: {current_user.username}")
+        
+        return ApiResponse(
+            success=True,
+            data={"revoked": len(revocations)},
+            message="登出成功"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"登出失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            error=str(e),
+            message="登出失败"
+        )
+
+
+@app.put("/api/users/me/password", response_model=ApiResponse, tags=["auth"])
+async def change_password(
+    body: PasswordChange,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    修改密码
+    
+    验证当前密码后保存新密码，并立即吊销该用户此前签发的所有 Token
+    （包括其他设备上的 Access Token 和 Refresh Token），返回一对新的 Token。
+    与登录共用频率限制，当前密码错误时消耗用户名的尝试次数。
+    
+    Args:
+        body: 当前密码和新密码
+        request: 请求对象，用于获取客户端 IP
+        db: 异步数据库会话
+        current_user: 当前认证的用户
+        
+    Returns:
+        ApiResponse: 包含新的 access_token 和 refresh_token 的响应
+        
+    Raises:
+        HTTPException: 当前密码错误时抛出 400 异常
+    """
+    try:
+        await login_throttle.check(current_user.username, client_ip(request))
+        
+        user = (await db.execute(user_by_username_query(current_user.username))).scalar_one()
+        if not await verify_password_async(body.old_password, user.hashed_password):
+            await login_throttle.record_failure(current_user.username)
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="当前密码错误"
+            )
+        await login_throttle.record_success(current_user.username)
+        
+        # 修改密码会触发认证缓存失效（见 security 中的 after_update 监听）
+        user.hashed_password = await hash_password_async(body.new_password)
+        # 递增 Token 版本号，此前签发的 Token（版本号更小）全部失效
+        token_version = (await db.execute(user_token_version_bump_statement(user.id))).scalar_one()
+        expires_at = datetime.now(timezone.utc).timestamp() + REFRESH_TOKEN_EXPIRE_MINUTES * 60
+        await revoke_tokens(db, [user_revocation(user.id, token_version, expires_at)])
+        tokens = Token(**create_token_pair(current_user.username, user.id, token_version))
+        
+        logger.info(f"用户修改密码: {current_user.username}")
+        
+        return ApiResponse(
+            success=True,
+            data=tokens.model_dump(),
+            message="修改密码成功"
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"修改密码失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            error=str(e),
+            message="修改密码失败"
+        )
+
+
 # ==================== 待办事项 API 路由 ====================
 
 @app.get("/api/todos", response_model=ApiResponse, tags=["todos"])
 async def get_todos(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="每页条数"),
+    completed: Optional[bool] = Query(None, description="按完成状态过滤"),
+    due_after: Optional[date] = Query(None, description="截止日期不早于此日期"),
+    due_before: Optional[date] = Query(None, description="截止日期不晚于此日期"),
+    overdue: Optional[bool] = Query(None, description="是否只返回已逾期的未完成任务"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
-    获取当前用户的所有待办事项
+    分页获取当前用户的待办事项
     
     需要有效的 JWT Token（通过 Authorization: Bearer <token>）
-    只返回属于当前用户的待办事项。
+    只返回属于当前用户的待办事项，按 ID 倒序排列。
+    
+    使用 keyset 分页：响应中的 next_cursor 传回 cursor 参数即可获取下一页，
+    没有更多数据时 next_cursor 为 null。
+    
+    响应带有基于用户版本号的 ETag（使用逾期过滤时还包含当天日期）。
+    请求头 If-None-Match 与当前 ETag 一致时直接返回 304 Not Modified，
+    不查询也不序列化任何待办事项。
+    
+    编码后的响应按用户和查询参数缓存在进程内，版本号未变时直接返回缓存的字节，
+    只需读取版本号这一次主键查询。
     
     Returns:
-        ApiResponse: 包含用户的所有 todo 的响应
+        ApiResponse: data 包含 items（本页 todo）和 next_cursor
     """
     try:
-        # 查询当前用户的所有待办事项
-        todos = db.query(Todo).filter(Todo.user_id == current_user.id).order_by(Todo.id.desc()).all()
-        todos_data = [todo.to_dict() for todo in todos]
+        after_id = decode_cursor(cursor) if cursor else None
         
-        return ApiResponse(
-            success=True,
-            data=todos_data,
-            message="获取待办事项成功"
+        # 逾期条件依赖当天日期，日期变化后使用新的 ETag 和缓存键
+        today = date.today() if overdue is not None else None
+        
+        # 先读版本号再读列表，保证 ETag 不会比内容更新
+        revision = await current_revision(db, current_user.id)
+        etag = make_etag(current_user.id, revision, today)
+        cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+        
+        cache_key = (current_user.id, after_id, limit, completed, due_after, due_before, overdue, today)
+        content = todo_list_cache.get(cache_key, revision)
+        if content is not None:
+            return Response(content=content, media_type="application/json", headers=cache_headers)
+        
+        # 多取一条，用于判断是否还有下一页
+        stmt = todo_list_query(
+            current_user.id,
+            limit=limit + 1,
+            after_id=after_id,
+            completed=completed,
+            due_after=due_after,
+            due_before=due_before,
+            overdue=overdue,
+            today=today,
         )
+        rows = (await db.execute(stmt)).all()
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id) if has_more else None
+        
+        # 按列查询的结果直接编码为 JSON，不构建 ORM 对象，也不再经过 ApiResponse 校验
+        with timed("serialize"):
+            content = encode_api_response(
+                {"items": todo_rows_to_dicts(rows), "next_cursor": next_cursor},
+                "获取待办事项成功"
+            )
+        todo_list_cache.set(current_user.id, cache_key, revision, content)
+        return Response(content=content, media_type="application/json", headers=cache_headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取待办事项失败: {str(e)}")
         return ApiResponse(
@@ -199,11 +624,399 @@ async def get_todos(
         )
 
 
+@app.get("/api/todos/changes", response_model=ApiResponse, tags=["todos"])
+async def get_todo_changes(
+    since: int = Query(..., ge=0, description="客户端已同步到的版本号"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    增量同步：获取某个版本号之后的变化
+    
+    需要有效的 JWT Token。
+    返回版本号 since 之后创建或修改的待办事项，以及被删除的待办事项 ID。
+    客户端应用变化后，把响应中的 revision 作为下一次请求的 since。
+    
+    以下情况返回 reset=true，客户端应通过 GET /api/todos 全量刷新：
+    - since 早于已压缩的删除墓碑（删除记录可能不完整）
+    - since 大于服务端当前版本号
+    - 变化条数超过 MAX_SYNC_CHANGES
+    
+    Args:
+        since: 客户端已同步到的版本号，首次同步传 0 之前应先全量获取
+        db: 异步数据库会话
+        current_user: 当前认证的用户
+        
+    Returns:
+        ApiResponse: data 包含 revision、changes、deleted 和 reset
+    """
+    try:
+        state = (await db.execute(todo_sync_state_query(current_user.id))).first()
+        revision, tombstone_floor = state if state else (0, 0)
+        
+        def reset_response():
+            return ApiResponse(
+                success=True,
+                data={"revision": revision, "changes": [], "deleted": [], "reset": True},
+                message="需要全量刷新"
+            )
+        
+        if since < tombstone_floor or since > revision:
+            return reset_response()
+        
+        changes, deleted = [], []
+        if since < revision:
+            todos = (await db.execute(
+                todo_changes_query(current_user.id, since, revision, MAX_SYNC_CHANGES + 1)
+            )).scalars().all()
+            deleted = (await db.execute(
+                tombstones_query(current_user.id, since, revision, MAX_SYNC_CHANGES + 1)
+            )).scalars().all()
+            if len(todos) + len(deleted) > MAX_SYNC_CHANGES:
+                return reset_response()
+            # SQLite 会把已删除的最大 id 分配给下一条新记录：同一区间内先删除、后新建的
+            # 任务 id 相同，而该 id 当前存在，只作为变化返回；重复的墓碑也只返回一次
+            changed_ids = {todo.id for todo in todos}
+            deleted = [todo_id for todo_id in dict.fromkeys(deleted) if todo_id not in changed_ids]
+            with timed("serialize"):
+                changes = [todo.to_dict() for todo in todos]
+        
+        return ApiResponse(
+            success=True,
+            data={"revision": revision, "changes": changes, "deleted": list(deleted), "reset": False},
+            message="获取增量变化成功"
+        )
+    except Exception as e:
+        logger.error(f"获取增量变化失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            error=str(e),
+            message="获取增量变化失败"
+        )
+
+
+@app.get("/api/todos/search", response_model=ApiResponse, tags=["todos"])
+async def search_todos(
+    q: str = Query(..., min_length=1, max_length=200, description="搜索词，多个词之间为 AND，每个词按前缀匹配"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE, description="最多返回的条数"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    全文搜索当前用户的待办事项
+    
+    需要有效的 JWT Token。
+    SQLite 上使用 FTS5 全文索引，每个词按前缀匹配（输入 "mil" 可匹配 "milk"），
+    结果按相关度（bm25）排序；其他数据库回退为不区分大小写的子串匹配，按 ID 倒序。
+    
+    Args:
+        q: 搜索字符串
+        limit: 最多返回的条数
+        db: 异步数据库会话
+        current_user: 当前认证的用户
+        
+    Returns:
+        ApiResponse: data 包含 items（匹配的 todo）
+    """
+    try:
+        terms = search_terms(q)
+        rows = []
+        if terms:
+            use_fts = database.fts_enabled and db.bind.dialect.name == "sqlite"
+            rows = (await db.execute(
+                todo_search_query(current_user.id, terms, limit, use_fts)
+            )).all()
+        
+        with timed("serialize"):
+            content = encode_api_response({"items": todo_rows_to_dicts(rows)}, "搜索待办事项成功")
+        return Response(content=content, media_type="application/json")
+    except Exception as e:
+        logger.error(f"搜索待办事项失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            error=str(e),
+            message="搜索待办事项失败"
+        )
+
+
+@app.get("/api/todos/stats", response_model=ApiResponse, tags=["todos"])
+async def get_todo_stats_endpoint(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    获取当前用户的待办事项统计
+    
+    需要有效的 JWT Token。
+    总数和已完成数来自随每次修改在同一事务中更新的计数器（单行主键查询），
+    逾期数在 (user_id, completed, due_date) 索引上做范围计数，不读取表数据。
+    
+    Args:
+        db: 异步数据库会话
+        current_user: 当前认证的用户
+        
+    Returns:
+        ApiResponse: data 包含 total、completed、pending 和 overdue
+    """
+    try:
+        stats = await get_todo_stats(db, current_user.id, date.today())
+        return ApiResponse(
+            success=True,
+            data=stats,
+            message="获取统计成功"
+        )
+    except Exception as e:
+        logger.error(f"获取统计失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            error=str(e),
+            message="获取统计失败"
+        )
+
+
+@app.get("/api/todos/events", tags=["todos"])
+async def todo_events(
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    推送当前用户待办事项变化的事件流（Server-Sent Events）
+    
+    需要有效的 JWT Token。连接建立后先发送 ready 事件（data 为当前版本号），
+    之后每次提交的修改推送一条事件，事件 ID 为修改后的版本号：
+    - todo.created / todo.updated：data 为完整的 todo
+    - todo.deleted：data 为 {"id": ...}
+    - todos.imported：data 为 {"count": ...}，客户端通过 GET /api/todos/changes 获取
+    - resync：客户端落后（重连时 Last-Event-ID 小于当前版本号，或推送积压溢出），
+      需要通过 GET /api/todos/changes?since=<本地版本号> 补齐
+    没有事件时每 EVENTS_HEARTBEAT_INTERVAL 秒发送一条心跳注释。
+    
+    Args:
+        db: 异步数据库会话（只用于认证，建立事件流前释放）
+        current_user: 当前认证的用户
+        last_event_id: 重连时浏览器自动带回的最后一个事件 ID
+        
+    Returns:
+        StreamingResponse: text/event-stream 事件流
+    """
+    user_id = current_user.id
+    bind = db.bind
+    # 事件流会保持很久，不能一直占用连接池中的连接
+    await db.close()
+    
+    async def generate():
+        with broker.subscribe(user_id) as subscription:
+            # 先订阅再读取版本号，两者之间提交的修改不会丢失
+            async with AsyncSession(bind) as session:
+                revision = await current_revision(session, user_id)
+            yield format_sse("ready", dumps_json({"revision": revision}), revision)
+            if last_event_id is not None and last_event_id < revision:
+                yield format_sse("resync", dumps_json({"reason": "behind", "since": last_event_id}))
+            
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscription.queue.get(), EVENTS_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": heartbeat\n\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        # 禁止缓存，并关闭 nginx 等反向代理的响应缓冲
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# 导出格式：(媒体类型, 文件扩展名)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+@app.get("/api/todos/export", tags=["todos"])
+async def export_todos(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="导出格式"),
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    流式导出当前用户的全部待办事项
+    
+    需要有效的 JWT Token。
+    按 id 升序输出，每次从数据库读取 EXPORT_BATCH_SIZE 行并立即写出，
+    内存占用与待办事项总数无关。
+    
+    Args:
+        export_format: ndjson（每行一个 JSON 对象，字段同 Todo.to_dict()）或 csv（带表头）
+        db: 异步数据库会话（只用于认证和获取数据库引擎，开始导出前释放）
+        current_user: 当前认证的用户
+        
+    Returns:
+        StreamingResponse: 导出文件内容
+    """
+    media_type, extension = EXPORT_FORMATS[export_format]
+    user_id = current_user.id
+    bind = db.bind
+    # 响应体发送期间不占用请求会话的连接，导出使用下面的独立会话
+    await db.close()
+    
+    async def generate():
+        # 使用独立的会话，生命周期与响应体的发送过程一致
+        async with AsyncSession(bind) as export_db:
+            try:
+                result = await export_db.stream(
+                    todo_export_query(user_id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+                )
+                first = True
+                async for rows in result.partitions():
+                    if export_format == "csv":
+                        yield encode_csv_rows(rows, header=first)
+                    else:
+                        yield encode_ndjson_rows(rows)
+                    first = False
+                if first and export_format == "csv":
+                    yield encode_csv_rows([], header=True)
+            except Exception as e:
+                # 响应头已发送，无法再返回错误状态码，只能中断输出
+                logger.error(f"导出待办事项失败: {str(e)}")
+                raise
+    
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="todos.{extension}"'}
+    )
+
+
+@app.post("/api/todos/import", response_model=ApiResponse, tags=["todos"])
+async def import_todos(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    从 NDJSON 流批量导入待办事项
+    
+    需要有效的 JWT Token。
+    请求体为 NDJSON（每行一个与 POST /api/todos 相同的 JSON 对象），边接收边解析，
+    不会把整个请求体读入内存。有效行每 IMPORT_CHUNK_SIZE 条用一条 executemany
+    语句插入并提交一次，每个分块递增一次版本号。
+    无效行不影响其他行，在结果的 errors 中按行号返回（最多 IMPORT_MAX_ERRORS 条）。
+    中途失败时，之前已提交的分块会保留，结果中给出已导入的条数。
+    
+    Args:
+        request: 请求对象，用于读取流式请求体
+        db: 异步数据库会话
+        current_user: 当前认证的用户
+        
+    Returns:
+        ApiResponse: data 包含 imported、failed、lines、chunks、revision 和 errors
+    """
+    summary = {
+        "imported": 0, "failed": 0, "lines": 0, "chunks": 0, "revision": None,
+        "errors": [], "errors_truncated": False,
+    }
+    
+    def record_error(line_no: int, error: str):
+        summary["failed"] += 1
+        if len(summary["errors"]) < IMPORT_MAX_ERRORS:
+            summary["errors"].append({"line": line_no, "error": error})
+        else:
+            summary["errors_truncated"] = True
+    
+    # 逐行触发器维护全文索引会让导入吞吐下降数倍，改为每个分块建立一次索引。
+    # 代价：每次删除 / 重建触发器都会改变 SQLite 的 schema cookie，连接池中的其他连接
+    # 下次执行语句时要重新准备（每个分块一次，约一次 sqlite3_prepare 的开销）。
+    # 不能改为整个导入只交换一次：触发器的删除和重建必须与分块在同一个事务中，
+    # 否则其他连接在此期间插入的行不会被索引；而分块需要各自提交，长时间导入才不会
+    # 一直持有写锁，中途失败时已提交的分块也能保留。
+    bulk_fts = database.fts_enabled and db.bind.dialect.name == "sqlite"
+    
+    async def flush(rows: list):
+        revision = await bump_revision(db, current_user.id)
+        if bulk_fts:
+            await (await db.connection()).exec_driver_sql(database.DROP_TODO_FTS_INSERT_TRIGGER)
+        await db.execute(todo_bulk_insert_statement(), [{**row, "revision": revision} for row in rows])
+        if bulk_fts:
+            await db.execute(todo_fts_index_statement(current_user.id, revision))
+            await (await db.connection()).exec_driver_sql(database.TODO_FTS_INSERT_TRIGGER)
+        await adjust_todo_stats(
+            db, current_user.id, total=len(rows), completed=sum(1 for row in rows if row["completed"])
+        )
+        await db.commit()
+        summary["imported"] += len(rows)
+        summary["chunks"] += 1
+        summary["revision"] = revision
+        todos_changed(current_user.id)
+        # 导入的行数可能很多，只推送数量，客户端通过增量同步接口获取
+        await broker.publish(current_user.id, "todos.imported", {"count": len(rows)}, revision)
+        logger.info(
+            f"用户 {current_user.username} 导入进度: 已导入 {summary['imported']} 条，"
+            f"失败 {summary['failed']} 条"
+        )
+    
+    try:
+        rows = []
+        async for line_no, line in iter_ndjson_lines(request.stream(), IMPORT_MAX_LINE_BYTES):
+            summary["lines"] = line_no
+            if line is None:
+                record_error(line_no, f"单行超过 {IMPORT_MAX_LINE_BYTES} 字节")
+                continue
+            try:
+                todo_create = TodoCreate.model_validate_json(line)
+            except ValidationError as e:
+                record_error(line_no, "; ".join(
+                    f"{'.'.join(str(part) for part in error['loc']) or 'body'}: {error['msg']}"
+                    for error in e.errors()
+                ))
+                continue
+            
+            text = todo_create.text.strip()
+            if not text:
+                record_error(line_no, "任务文本不能为空")
+                continue
+            
+            rows.append({
+                "user_id": current_user.id,
+                "text": text,
+                "completed": todo_create.completed or False,
+                "due_date": todo_create.due_date,
+            })
+            if len(rows) >= IMPORT_CHUNK_SIZE:
+                await flush(rows)
+                rows = []
+        
+        if rows:
+            await flush(rows)
+        
+        logger.info(
+            f"用户 {current_user.username} 导入完成: 导入 {summary['imported']} 条，"
+            f"失败 {summary['failed']} 条"
+        )
+        
+        return ApiResponse(
+            success=True,
+            data=summary,
+            message="导入待办事项完成"
+        )
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"导入待办事项失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            data=summary,
+            error=str(e),
+            message="导入待办事项失败"
+        )
+
+
 @app.post("/api/todos", response_model=ApiResponse, status_code=status.HTTP_201_CREATED, tags=["todos"])
 async def create_todo(
     todo_create: TodoCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     创建新的待办事项
@@ -213,7 +1026,7 @@ async def create_todo(
     
     Args:
         todo_create: 待办事项创建数据
-        db: 数据库会话
+        db: 异步数据库会话
         current_user: 当前认证的用户
         
     Returns:
@@ -227,28 +1040,37 @@ async def create_todo(
                 detail="任务文本不能为空"
             )
         
-        # 创建新 todo，关联到当前用户
-        db_todo = Todo(
-            user_id=current_user.id,
-            text=todo_create.text.strip(),
-            completed=todo_create.completed or False,
-            due_date=todo_create.due_date
-        )
-        db.add(db_todo)
-        db.commit()
-        db.refresh(db_todo)
+        async def create(session: AsyncSession) -> dict:
+            # 创建新 todo，关联到当前用户
+            db_todo = Todo(
+                user_id=current_user.id,
+                text=todo_create.text.strip(),
+                completed=todo_create.completed or False,
+                due_date=todo_create.due_date,
+                revision=await bump_revision(session, current_user.id)
+            )
+            session.add(db_todo)
+            await adjust_todo_stats(session, current_user.id, total=1, completed=int(db_todo.completed))
+            await session.flush()
+            await session.refresh(db_todo)
+            return db_todo.to_dict()
         
-        logger.info(f"用户 {current_user.username} 创建待办事项: {db_todo.id}")
+        # 启用写入合并时与其他并发写操作一起提交
+        data = await run_write(db, create)
         
+        logger.info(f"用户 {current_user.username} 创建待办事项: {data['id']}")
+        
+        todos_changed(current_user.id)
+        await broker.publish(current_user.id, "todo.created", data, data["revision"])
         return ApiResponse(
             success=True,
-            data=db_todo.to_dict(),
+            data=data,
             message="创建待办事项成功"
         )
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"创建待办事项失败: {str(e)}")
         return ApiResponse(
             success=False,
@@ -257,73 +1079,115 @@ async def create_todo(
         )
 
 
+async def raise_unmatched_todo(db: AsyncSession, todo_id: int, user_id: int, forbidden_detail: str):
+    """
+    条件更新 / 删除没有命中任何行时，查询所属用户以区分 404 和 403
+    
+    Args:
+        db: 异步数据库会话
+        todo_id: 待办事项 ID
+        user_id: 当前用户 ID
+        forbidden_detail: 待办事项属于其他用户时的错误信息
+        
+    Raises:
+        HTTPException: 不存在时为 404，属于其他用户时为 403
+    """
+    owner_id = (await db.execute(todo_owner_query(todo_id))).scalar_one_or_none()
+    if owner_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"待办事项 {todo_id} 不存在"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail=forbidden_detail
+    )
+
+
 @app.put("/api/todos/{todo_id}", response_model=ApiResponse, tags=["todos"])
 async def update_todo(
     todo_id: int,
     todo_update: TodoUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     更新待办事项
     
     需要有效的 JWT Token。
     用户只能更新属于自己的待办事项。
+    没有提供任何要修改的字段时直接返回当前的待办事项，不递增版本号，
+    ETag、列表缓存和增量同步都不受影响，也不推送事件。
     
     Args:
         todo_id: 待办事项 ID
         todo_update: 待办事项更新数据
-        db: 数据库会话
+        db: 异步数据库会话
         current_user: 当前认证的用户
         
     Returns:
         ApiResponse: 包含更新后的 todo 的响应
     """
     try:
-        # 查找待办事项
-        db_todo = db.query(Todo).filter(Todo.id == todo_id).first()
-        if not db_todo:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"待办事项 {todo_id} 不存在"
-            )
-        
-        # 检查所有权：确保用户只能修改自己的任务
-        if db_todo.user_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="无权修改此待办事项"
-            )
-        
-        # 更新字段
+        # 收集要更新的字段
+        values = {}
         if todo_update.text is not None:
             if not todo_update.text.strip():
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="任务文本不能为空"
                 )
-            db_todo.text = todo_update.text.strip()
+            values["text"] = todo_update.text.strip()
         
         if todo_update.completed is not None:
-            db_todo.completed = todo_update.completed
+            values["completed"] = todo_update.completed
         
         if todo_update.due_date is not None:
-            db_todo.due_date = todo_update.due_date
+            values["due_date"] = todo_update.due_date
         
-        db.commit()
-        db.refresh(db_todo)
+        if not values:
+            todo = (await db.execute(todos_by_ids_query(current_user.id, [todo_id]))).scalar_one_or_none()
+            if todo is None:
+                await raise_unmatched_todo(db, todo_id, current_user.id, "无权修改此待办事项")
+            return ApiResponse(
+                success=True,
+                data=todo.to_dict(),
+                message="更新待办事项成功"
+            )
+        
+        async def update(session: AsyncSession) -> dict:
+            # 一条 UPDATE ... WHERE id AND user_id ... RETURNING 完成所有权检查、更新和读取
+            values["revision"] = await bump_revision(session, current_user.id)
+            if "completed" in values:
+                # 已完成数的增量取决于更新前的状态，需在 UPDATE 之前计算
+                await adjust_todo_stats(
+                    session, current_user.id,
+                    completed=completion_delta(current_user.id, [(todo_id, values["completed"])])
+                )
+            row = (await session.execute(
+                todo_update_returning_statement(todo_id, current_user.id, values)
+            )).first()
+            if row is None:
+                # 抛出异常后整个写操作回滚
+                await raise_unmatched_todo(session, todo_id, current_user.id, "无权修改此待办事项")
+            return todo_row_to_dict(row)
+        
+        # 启用写入合并时与其他并发写操作一起提交
+        data = await run_write(db, update)
         
         logger.info(f"用户 {current_user.username} 更新待办事项: {todo_id}")
         
+        todos_changed(current_user.id)
+        await broker.publish(current_user.id, "todo.updated", data, data["revision"])
         return ApiResponse(
             success=True,
-            data=db_todo.to_dict(),
+            data=data,
             message="更新待办事项成功"
         )
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"更新待办事项失败: {str(e)}")
         return ApiResponse(
             success=False,
@@ -335,8 +1199,8 @@ async def update_todo(
 @app.delete("/api/todos/{todo_id}", response_model=ApiResponse, tags=["todos"])
 async def delete_todo(
     todo_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
     """
     删除待办事项
@@ -346,32 +1210,28 @@ async def delete_todo(
     
     Args:
         todo_id: 待办事项 ID
-        db: 数据库会话
+        db: 异步数据库会话
         current_user: 当前认证的用户
         
     Returns:
         ApiResponse: 删除结果
     """
     try:
-        # 查找待办事项
-        db_todo = db.query(Todo).filter(Todo.id == todo_id).first()
-        if not db_todo:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"待办事项 {todo_id} 不存在"
-            )
-        
-        # 检查所有权：确保用户只能删除自己的任务
-        if db_todo.user_id != current_user.id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="无权删除此待办事项"
-            )
-        
-        db.delete(db_todo)
-        db.commit()
+        # 一条 DELETE ... WHERE id AND user_id ... RETURNING 完成所有权检查和删除
+        revision = await bump_revision(db, current_user.id)
+        deleted = (await db.execute(
+            todo_delete_returning_statement(todo_id, current_user.id)
+        )).first()
+        if deleted is None:
+            await db.rollback()
+            await raise_unmatched_todo(db, todo_id, current_user.id, "无权删除此待办事项")
+        await adjust_todo_stats(db, current_user.id, total=-1, completed=-int(bool(deleted.completed)))
+        await add_tombstones(db, current_user.id, [todo_id], revision)
+        await db.commit()
         
         logger.info(f"用户 {current_user.username} 删除待办事项: {todo_id}")
+        todos_changed(current_user.id)
+        await broker.publish(current_user.id, "todo.deleted", {"id": todo_id}, revision)
         
         return ApiResponse(
             success=True,
@@ -381,7 +1241,7 @@ async def delete_todo(
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"删除待办事项失败: {str(e)}")
         return ApiResponse(
             success=False,
@@ -390,15 +1250,224 @@ async def delete_todo(
         )
 
 
+@app.post("/api/todos/batch", response_model=ApiResponse, tags=["todos"])
+async def batch_todos(
+    batch: TodoBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """
+    批量创建、更新和删除待办事项
+    
+    需要有效的 JWT Token。
+    一次查询检查所有目标任务的所有权，随后用批量语句在同一个事务中执行全部有效操作，
+    只提交一次。无效的操作（文本为空、任务不存在、无权操作等）单独返回错误，不影响其他操作。
+    
+    Args:
+        batch: 批量操作请求，包含 create / update / delete 操作列表
+        db: 异步数据库会话
+        current_user: 当前认证的用户
+        
+    Returns:
+        ApiResponse: data.results 按请求顺序包含每个操作的结果
+    """
+    operations = batch.operations
+    results = [None] * len(operations)
+    
+    def fail(index, status_code, error):
+        results[index] = {
+            "index": index,
+            "op": operations[index].op,
+            "success": False,
+            "status": status_code,
+            "data": None,
+            "error": error,
+        }
+    
+    def succeed(index, status_code, data):
+        results[index] = {
+            "index": index,
+            "op": operations[index].op,
+            "success": True,
+            "status": status_code,
+            "data": data,
+            "error": None,
+        }
+    
+    try:
+        # 校验每个操作，按类型分组
+        creates, updates, deletes = [], [], []
+        seen_ids = set()
+        for index, op in enumerate(operations):
+            if op.op == "create":
+                if not op.text or not op.text.strip():
+                    fail(index, status.HTTP_400_BAD_REQUEST, "任务文本不能为空")
+                    continue
+                creates.append((index, {
+                    "user_id": current_user.id,
+                    "text": op.text.strip(),
+                    "completed": op.completed or False,
+                    "due_date": op.due_date,
+                }))
+                continue
+            
+            if op.id is None:
+                fail(index, status.HTTP_400_BAD_REQUEST, "缺少待办事项 ID")
+                continue
+            if op.id in seen_ids:
+                fail(index, status.HTTP_409_CONFLICT, f"同一批次中重复操作待办事项 {op.id}")
+                continue
+            seen_ids.add(op.id)
+            
+            if op.op == "update":
+                values = {}
+                if op.text is not None:
+                    if not op.text.strip():
+                        fail(index, status.HTTP_400_BAD_REQUEST, "任务文本不能为空")
+                        continue
+                    values["text"] = op.text.strip()
+                if op.completed is not None:
+                    values["completed"] = op.completed
+                if op.due_date is not None:
+                    values["due_date"] = op.due_date
+                updates.append((index, op.id, values))
+            else:
+                deletes.append((index, op.id))
+        
+        # 一次查询检查所有更新 / 删除目标的所有权
+        owners = {}
+        target_ids = [todo_id for _, todo_id, _ in updates] + [todo_id for _, todo_id in deletes]
+        if target_ids:
+            owners = dict((await db.execute(todo_owners_query(target_ids))).all())
+        
+        def owned(index, todo_id):
+            if todo_id not in owners:
+                fail(index, status.HTTP_404_NOT_FOUND, f"待办事项 {todo_id} 不存在")
+                return False
+            if owners[todo_id] != current_user.id:
+                fail(index, status.HTTP_403_FORBIDDEN, "无权操作此待办事项")
+                return False
+            return True
+        
+        updates = [item for item in updates if owned(item[0], item[1])]
+        deletes = [item for item in deletes if owned(item[0], item[1])]
+        
+        # 整个批次共用一个新版本号
+        revision = None
+        if creates or any(values for _, _, values in updates) or deletes:
+            revision = await bump_revision(db, current_user.id)
+        
+        # 批量插入，按参数顺序返回新记录
+        created = []
+        if creates:
+            created = (await db.scalars(
+                insert(Todo).returning(Todo, sort_by_parameter_order=True),
+                [{**row, "revision": revision} for _, row in creates]
+            )).all()
+        
+        # 统计计数器：创建直接计数，完成状态的变化在 UPDATE 之前计算
+        await adjust_todo_stats(
+            db, current_user.id,
+            total=len(created),
+            completed=sum(1 for todo in created if todo.completed) + completion_delta(
+                current_user.id,
+                [(todo_id, values["completed"]) for _, todo_id, values in updates if "completed" in values]
+            )
+        )
+        
+        # 按更新的字段组合分组，每组一条 executemany 语句
+        groups = defaultdict(list)
+        for _, todo_id, values in updates:
+            if values:
+                values = {**values, "revision": revision}
+                groups[tuple(sorted(values))].append(
+                    {"b_id": todo_id, **{f"v_{field}": value for field, value in values.items()}}
+                )
+        for fields, params in groups.items():
+            await db.execute(todo_bulk_update_statement(current_user.id, fields), params)
+        
+        # 只为 DELETE 实际返回的行写入墓碑（所有权检查之后可能已被并发删除）
+        deleted_ids = set()
+        if deletes:
+            deleted_rows = (await db.execute(
+                todo_bulk_delete_statement(current_user.id, [todo_id for _, todo_id in deletes])
+            )).all()
+            deleted_ids = {row.id for row in deleted_rows}
+            await adjust_todo_stats(
+                db, current_user.id,
+                total=-len(deleted_rows),
+                completed=-sum(1 for row in deleted_rows if row.completed)
+            )
+            await add_tombstones(db, current_user.id, sorted(deleted_ids), revision)
+        
+        # 一次查询读取更新后的记录
+        updated = {}
+        if updates:
+            rows = await db.scalars(todos_by_ids_query(current_user.id, [todo_id for _, todo_id, _ in updates]))
+            updated = {todo.id: todo.to_dict() for todo in rows}
+        
+        await db.commit()
+        
+        for (index, _), todo in zip(creates, created):
+            succeed(index, status.HTTP_201_CREATED, todo.to_dict())
+        for index, todo_id, _ in updates:
+            if todo_id in updated:
+                succeed(index, status.HTTP_200_OK, updated[todo_id])
+            else:
+                fail(index, status.HTTP_404_NOT_FOUND, f"待办事项 {todo_id} 不存在")
+        for index, todo_id in deletes:
+            if todo_id in deleted_ids:
+                succeed(index, status.HTTP_200_OK, {"id": todo_id})
+            else:
+                fail(index, status.HTTP_404_NOT_FOUND, f"待办事项 {todo_id} 不存在")
+        
+        # 提交后按请求顺序推送每个实际产生修改的操作的事件；没有任何修改时不推送
+        if revision is not None:
+            todos_changed(current_user.id)
+            unchanged = {index for index, _, values in updates if not values}
+            for result in results:
+                if result["success"] and result["index"] not in unchanged:
+                    event = {"create": "todo.created", "update": "todo.updated", "delete": "todo.deleted"}[result["op"]]
+                    await broker.publish(current_user.id, event, result["data"], revision)
+        
+        succeeded = sum(1 for result in results if result["success"])
+        logger.info(
+            f"用户 {current_user.username} 批量操作待办事项: "
+            f"{succeeded} 成功, {len(results) - succeeded} 失败"
+        )
+        
+        return ApiResponse(
+            success=True,
+            data={
+                "results": results,
+                "succeeded": succeeded,
+                "failed": len(results) - succeeded,
+            },
+            message="批量操作完成"
+        )
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"批量操作待办事项失败: {str(e)}")
+        return ApiResponse(
+            success=False,
+            error=str(e),
+            message="批量操作失败"
+        )
+
+
 # ==================== 错误处理 ====================
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
     """处理 HTTP 异常"""
-    return ApiResponse(
-        success=False,
-        error=exc.detail,
-        message="请求失败"
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=ApiResponse(
+            success=False,
+            error=exc.detail,
+            message="请求失败"
+        ).model_dump(),
+        headers=exc.headers
     )
 
 
@@ -406,10 +1475,13 @@ async def http_exception_handler(request, exc):
 async def general_exception_handler(request, exc):
     """处理通用异常"""
     logger.error(f"未处理的异常: {str(exc)}")
-    return ApiResponse(
-        success=False,
-        error="服务器内部错误",
-        message="请求失败"
+    return JSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content=ApiResponse(
+            success=False,
+            error="服务器内部错误",
+            message="请求失败"
+        ).model_dump()
     )
 
 
@@ -0,0 +1,304 @@
+# ==================== 运维命令模块 ====================
+
+"""
+运维命令模块
+通过 `python -m backend.manage <命令>` 执行
+
+包含：
+- check-plans：对各端点的查询执行 EXPLAIN QUERY PLAN，
+  出现全表扫描或临时 B-tree 排序时以非零状态码退出，
+  可作为查询计划回归检查接入 CI
+- compact-tombstones：压缩超过保留期的删除墓碑
+- check-stats：检查统计计数器与待办事项是否一致，不一致时以非零状态码退出
+- rebuild-stats：从待办事项重新计算全部统计计数器
+- calibrate-bcrypt：测出单次验证不超过目标耗时的 bcrypt 轮数，输出 PASSWORD_HASH_ROUNDS 配置
+"""
+
+import argparse
+import asyncio
+import sys
+from datetime import date, datetime, timezone
+from typing import Callable, List, Tuple
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.engine import Engine
+
+from backend.config import (
+    TOMBSTONE_RETENTION_DAYS, PASSWORD_HASH_TARGET_MS, PASSWORD_HASH_MIN_ROUNDS, PASSWORD_HASH_MAX_ROUNDS
+)
+from backend.database import SessionLocal, create_schema, init_db
+from backend.revisions import compact_tombstones
+from backend.security import bcrypt_rounds, calibrate_bcrypt_rounds, measure_bcrypt_ms
+from backend.stats import check_todo_stats, completion_delta, rebuild_todo_stats
+from backend.queries import (
+    todo_list_query, todo_owner_query, user_by_username_query,
+    todo_update_returning_statement, todo_delete_returning_statement,
+    todo_owners_query, todo_bulk_update_statement, todo_bulk_delete_statement,
+    todos_by_ids_query, todo_revision_query,
+    todo_sync_state_query, todo_changes_query, tombstones_query,
+    todo_export_query, todo_search_query, todo_fts_index_statement,
+    todo_stats_query, todo_overdue_count_query,
+    token_revocations_since_query, expired_token_revocations_delete_statement,
+    user_token_version_bump_statement
+)
+
+# ==================== 查询计划检查 ====================
+
+# 需要检查执行计划的端点查询：(名称, 构建查询的函数)
+PLAN_CASES: List[Tuple[str, Callable]] = [
+    ("login / register: user by username",
+     lambda: user_by_username_query("alice")),
+    ("get_todos: revision for ETag",
+     lambda: todo_revision_query(1)),
+    ("get_todos: first page",
+     lambda: todo_list_query(1, limit=51)),
+    ("get_todos: next page",
+     lambda: todo_list_query(1, limit=51, after_id=1000)),
+    ("get_todos: completed filter",
+     lambda: todo_list_query(1, limit=51, after_id=1000, completed=False)),
+    ("get_todos: due date range",
+     lambda: todo_list_query(1, limit=51, due_after=date(2025, 1, 1), due_before=date(2025, 1, 31))),
+    ("get_todos: overdue",
+     lambda: todo_list_query(1, limit=51, overdue=True, today=date(2025, 1, 1))),
+    ("get_todos: not overdue",
+     lambda: todo_list_query(1, limit=51, overdue=False, today=date(2025, 1, 1))),
+    ("update_todo: conditional update",
+     lambda: todo_update_returning_statement(1, 1, {"completed": True, "revision": 2})),
+    ("delete_todo: conditional delete",
+     lambda: todo_delete_returning_statement(1, 1)),
+    ("update_todo / delete_todo: owner of unmatched todo",
+     lambda: todo_owner_query(1)),
+    ("get_todo_changes: sync state",
+     lambda: todo_sync_state_query(1)),
+    ("get_todo_changes: changed todos",
+     lambda: todo_changes_query(1, since=10, until=20, limit=1001)),
+    ("get_todo_changes: tombstones",
+     lambda: tombstones_query(1, since=10, until=20, limit=1001)),
+    ("export_todos: all todos by id",
+     lambda: todo_export_query(1)),
+    ("import_todos: index imported chunk",
+     lambda: todo_fts_index_statement(1, 10)),
+    ("search_todos: FTS5 match",
+     lambda: todo_search_query(1, ["buy", "mil"], limit=20, use_fts=True)),
+    ("search_todos: LIKE fallback",
+     lambda: todo_search_query(1, ["buy", "mil"], limit=20, use_fts=False)),
+    ("batch_todos: ownership check",
+     lambda: todo_owners_query([1, 2, 3])),
+    ("batch_todos: bulk update",
+     lambda: todo_bulk_update_statement(1, ["text", "completed"])),
+    ("batch_todos: bulk delete",
+     lambda: todo_bulk_delete_statement(1, [1, 2, 3])),
+    ("batch_todos: reload updated rows",
+     lambda: todos_by_ids_query(1, [1, 2, 3])),
+    ("get_todo_stats: counters",
+     lambda: todo_stats_query(1)),
+    ("get_todo_stats: overdue count",
+     lambda: todo_overdue_count_query(1, date(2025, 1, 1))),
+    ("update_todo / batch_todos: completion change count",
+     lambda: select(completion_delta(1, [(1, True), (2, False)]))),
+    ("change_password: token version bump",
+     lambda: user_token_version_bump_statement(1)),
+    ("token revocation sync: new revocations",
+     lambda: token_revocations_since_query(100, limit=1000)),
+    ("token revocation purge: expired revocations",
+     lambda: expired_token_revocations_delete_statement(datetime(2025, 1, 1, tzinfo=timezone.utc))),
+]
+
+
+def explain_query_plan(engine: Engine, stmt) -> List[str]:
+    """
+    返回语句在 SQLite 上的 EXPLAIN QUERY PLAN 明细
+
+    Args:
+        engine: SQLite 数据库引擎
+        stmt: SQLAlchemy 语句
+
+    Returns:
+        List[str]: 执行计划中每一步的描述
+    """
+    # 展开 IN 列表等参数；executemany 语句中未赋值的参数按 NULL 解释
+    compiled = stmt.compile(dialect=engine.dialect, compile_kwargs={"render_postcompile": True})
+    values = compiled.construct_params(_check=False)
+    params = tuple(values[name] for name in compiled.positiontup)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def find_plan_problems(plan: List[str]) -> List[str]:
+    """
+    找出执行计划中的全表扫描和临时排序步骤
+
+    `SCAN` 表示遍历整张表（或整个索引），
+    `USE TEMP B-TREE` 表示需要额外排序，二者在热点查询中都不应出现。
+    FTS5 虚拟表在 MATCH 条件下的 `SCAN ... VIRTUAL TABLE INDEX n:M...` 由全文索引驱动，不算全表扫描。
+    没有 FROM 的 SELECT（例如只计算标量子查询）显示为 `SCAN CONSTANT ROW`，也不算全表扫描。
+
+    Args:
+        plan: explain_query_plan 返回的执行计划
+
+    Returns:
+        List[str]: 有问题的步骤，为空表示计划正常
+    """
+    def is_full_scan(step: str) -> bool:
+        if not step.startswith("SCAN ") or step == "SCAN CONSTANT ROW":
+            return False
+        return not ("VIRTUAL TABLE INDEX" in step and ":M" in step)
+
+    return [
+        step for step in plan
+        if is_full_scan(step) or "USE TEMP B-TREE" in step
+    ]
+
+
+def check_plans(engine: Engine = None) -> int:
+    """
+    检查 PLAN_CASES 中所有查询的执行计划
+
+    默认使用内存 SQLite 数据库，按当前模型建表建索引后再检查，
+    因此不依赖、也不会修改实际的数据库文件。
+
+    Args:
+        engine: 用于检查的 SQLite 引擎，默认为内存数据库
+
+    Returns:
+        int: 有问题的查询数量
+    """
+    engine = engine or create_engine("sqlite://")
+    with engine.begin() as conn:
+        create_schema(conn)
+
+    failures = 0
+    for name, build in PLAN_CASES:
+        plan = explain_query_plan(engine, build())
+        problems = find_plan_problems(plan)
+        print(f"[{'FAIL' if problems else ' OK '}] {name}")
+        for step in plan:
+            print(f"         {step}")
+        if problems:
+            failures += 1
+    return failures
+
+
+# ==================== 删除墓碑压缩 ====================
+
+
+async def run_compact_tombstones(retention_days: float) -> int:
+    """
+    压缩超过保留期的删除墓碑
+
+    Args:
+        retention_days: 保留天数
+
+    Returns:
+        int: 删除的墓碑数量
+    """
+    await init_db()
+    async with SessionLocal() as db:
+        return await compact_tombstones(db, retention_days)
+
+
+# ==================== 统计计数器 ====================
+
+
+async def run_check_stats() -> int:
+    """
+    检查统计计数器并输出不一致的用户
+
+    Returns:
+        int: 不一致的用户数量
+    """
+    await init_db()
+    async with SessionLocal() as db:
+        mismatches = await check_todo_stats(db)
+    for mismatch in mismatches:
+        stored_total, stored_completed = mismatch["stored"]
+        actual_total, actual_completed = mismatch["actual"]
+        print(
+            f"用户 {mismatch['user_id']}: 计数器 total={stored_total} completed={stored_completed}，"
+            f"实际 total={actual_total} completed={actual_completed}"
+        )
+    return len(mismatches)
+
+
+async def run_rebuild_stats() -> None:
+    """从待办事项重新计算全部统计计数器"""
+    await init_db()
+    async with SessionLocal() as db:
+        await rebuild_todo_stats(db)
+
+
+# ==================== bcrypt 轮数校准 ====================
+
+
+def run_calibrate_bcrypt(target_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """
+    在当前机器上校准 bcrypt 轮数并输出结果
+
+    Args:
+        target_ms: 目标验证耗时（毫秒）
+        min_rounds: 最小轮数
+        max_rounds: 最大轮数
+
+    Returns:
+        int: 选定的轮数
+    """
+    current = bcrypt_rounds()
+    print(f"当前轮数 {current}：单次验证约 {measure_bcrypt_ms(current):.1f} ms")
+    rounds, measured_ms = calibrate_bcrypt_rounds(target_ms, min_rounds, max_rounds)
+    print(f"选定轮数 {rounds}：单次验证约 {measured_ms:.1f} ms（目标 {target_ms:.0f} ms）")
+    if measured_ms > target_ms:
+        print(f"最小轮数 {min_rounds} 已超出目标耗时，保留最小轮数")
+    print(f"PASSWORD_HASH_ROUNDS={rounds}")
+    return rounds
+
+
+# ==================== 命令行入口 ====================
+
+
+def main(argv=None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(prog="python -m backend.manage")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("check-plans", help="检查端点查询的执行计划")
+    compact_parser = subparsers.add_parser("compact-tombstones", help="压缩超过保留期的删除墓碑")
+    compact_parser.add_argument(
+        "--retention-days", type=float, default=TOMBSTONE_RETENTION_DAYS, help="保留天数"
+    )
+
+    subparsers.add_parser("check-stats", help="检查统计计数器与待办事项是否一致")
+    subparsers.add_parser("rebuild-stats", help="从待办事项重新计算全部统计计数器")
+    calibrate_parser = subparsers.add_parser("calibrate-bcrypt", help="按目标验证耗时校准 bcrypt 轮数")
+    calibrate_parser.add_argument(
+        "--target-ms", type=float, default=PASSWORD_HASH_TARGET_MS, help="目标验证耗时（毫秒）"
+    )
+    calibrate_parser.add_argument("--min-rounds", type=int, default=PASSWORD_HASH_MIN_ROUNDS, help="最小轮数")
+    calibrate_parser.add_argument("--max-rounds", type=int, default=PASSWORD_HASH_MAX_ROUNDS, help="最大轮数")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "check-plans":
+        failures = check_plans()
+        if failures:
+            print(f"{failures} 个查询的执行计划包含全表扫描或临时排序")
+            return 1
+        print("所有查询的执行计划正常")
+    elif args.command == "compact-tombstones":
+        removed = asyncio.run(run_compact_tombstones(args.retention_days))
+        print(f"已删除 {removed} 条删除墓碑")
+    elif args.command == "check-stats":
+        mismatches = asyncio.run(run_check_stats())
+        if mismatches:
+            print(f"{mismatches} 个用户的统计计数器与待办事项不一致，可执行 rebuild-stats 修复")
+            return 1
+        print("统计计数器与待办事项一致")
+    elif args.command == "rebuild-stats":
+        asyncio.run(run_rebuild_stats())
+        print("已重新计算统计计数器")
+    elif args.command == "calibrate-bcrypt":
+        run_calibrate_bcrypt(args.target_ms, args.min_rounds, args.max_rounds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
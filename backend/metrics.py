@@ -0,0 +1,281 @@
+# ==================== 监控指标模块 ====================
+
+"""
+监控指标模块
+以 Prometheus 文本格式（0.0.4）输出运行指标，不依赖 prometheus_client
+
+包含：
+- Counter / Histogram / Gauge：带标签的指标类型
+- MetricsMiddleware：按路由统计请求数和延迟的 ASGI 中间件
+- instrument_engine：通过 SQLAlchemy 引擎事件统计 SQL 语句数和耗时
+- render_metrics：生成 /metrics 的响应内容
+
+所有指标只在事件循环线程中更新（SQLAlchemy 异步引擎的事件也在该线程触发），
+因此不加锁；每次记录只是一次字典查找和几次加法。
+"""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+# 请求和 SQL 延迟直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+# ==================== 指标类型 ====================
+
+
+def _escape_label(value) -> str:
+    """转义标签值中的反斜杠、双引号和换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    """格式化标签，例如 {method="GET",route="/api/todos"}"""
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """格式化数值，整数不带小数点"""
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *labelvalues, amount: float = 1.0) -> None:
+        """按标签值增加计数"""
+        self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        ]
+
+
+class Histogram:
+    """分桶直方图，输出 _bucket / _sum / _count"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # 标签值 -> [各桶计数（不累计）..., +Inf 桶计数, 总和]
+        self._values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, *labelvalues) -> None:
+        """记录一次观测值"""
+        entry = self._values.get(labelvalues)
+        if entry is None:
+            entry = self._values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, entry in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), entry[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _format_value(bound)
+                bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """在抓取时通过回调取值的仪表盘指标"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[Tuple, float]],
+                 labelnames: Tuple[str, ...] = (), kind: str = "gauge"):
+        """
+        Args:
+            callback: 返回 {标签值元组: 数值} 的函数，无标签时键为空元组
+            kind: 输出的类型，已有的累计值（如缓存命中次数）可声明为 counter
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self.callback().items())
+        ]
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        """注册指标并返回它"""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """生成 Prometheus 文本格式的全部指标"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表
+registry = Registry()
+
+# ==================== 内置指标 ====================
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP 请求数", ("method", "route", "status")
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP 请求处理耗时（秒）", ("method", "route")
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL 语句执行耗时（秒），_count 即语句数", ("operation",)
+))
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "请求获取数据库连接的等待时间（秒）"
+))
+password_hash_duration = registry.register(Histogram(
+    "password_hash_duration_seconds", "bcrypt 计算耗时（秒）", ("operation",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0)
+))
+password_hash_queue_wait = registry.register(Histogram(
+    "password_hash_queue_wait_seconds", "bcrypt 任务排队等待工作池的时间（秒）"
+))
+
+
+def render_metrics() -> str:
+    """生成 /metrics 的响应内容"""
+    return registry.render()
+
+
+# ==================== HTTP 中间件 ====================
+
+
+class MetricsMiddleware:
+    """
+    按路由统计请求数和处理耗时的 ASGI 中间件
+
+    路由标签使用路径模板（例如 /api/todos/{todo_id}），不会因路径参数产生大量标签；
+    没有匹配任何路由的请求记为 unmatched。流式响应的耗时包含发送响应体的时间。
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths: Optional[Dict[Callable, str]] = None
+
+    def _route_path(self, scope) -> str:
+        """根据路由匹配后写入 scope 的 endpoint 找到路径模板"""
+        if self._route_paths is None:
+            router = scope["app"].router
+            self._route_paths = {
+                route.endpoint: route.path for route in router.routes if hasattr(route, "endpoint")
+            }
+        endpoint = scope.get("endpoint")
+        return self._route_paths.get(endpoint, "unmatched") if endpoint else "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = self._route_path(scope)
+            method = scope["method"]
+            http_requests.inc(method, route, status_code)
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+
+
+# ==================== 数据库指标 ====================
+
+
+def _statement_operation(statement: str) -> str:
+    """取 SQL 语句的第一个关键字作为操作类型"""
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(engine, pool_name: str = "default") -> None:
+    """
+    为异步引擎注册 SQL 计时事件，并在注册表中加入连接池状态
+
+    Args:
+        engine: AsyncEngine
+        pool_name: 连接池标签
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        db_query_duration.observe(time.perf_counter() - started, _statement_operation(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        # 执行失败时不会触发 after_cursor_execute，丢弃对应的开始时间
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+    pool = sync_engine.pool
+
+    def pool_status():
+        values = {}
+        for state in ("size", "checkedout", "overflow", "checkedin"):
+            method = getattr(pool, state, None)
+            if callable(method):
+                values[(pool_name, state)] = method()
+        return values
+
+    registry.register(Gauge(
+        "db_pool_connections", "连接池状态：size、checkedout、overflow、checkedin",
+        pool_status, ("pool", "state")
+    ))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from backend.database import Base
@@ -22,6 +22,9 @@ class User(Base):
     # 哈希后的密码，不为空
     hashed_password = Column(String(255), nullable=False)
     
+    # Token 版本号，修改密码时递增，版本号小于它的 Token 全部失效
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    
     # 创建时间，自动设置为当前时间
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
@@ -42,11 +45,23 @@ class Todo(Base):
     """
     __tablename__ = "todos"
 
+    # 组合索引：所有热点查询都先按 user_id 过滤，再按 id / completed / due_date 排序或过滤
+    __table_args__ = (
+        # 列表 keyset 分页：WHERE user_id = ? AND id < ? ORDER BY id DESC
+        Index("ix_todos_user_id_id", "user_id", "id"),
+        # 按完成状态过滤的列表分页
+        Index("ix_todos_user_completed_id", "user_id", "completed", "id"),
+        # 截止日期范围和逾期查询
+        Index("ix_todos_user_completed_due", "user_id", "completed", "due_date"),
+        # 增量同步：查询某个版本号之后变化的任务
+        Index("ix_todos_user_revision", "user_id", "revision"),
+    )
+
     # 主键数字段，index=True 改善查询性能
     id = Column(Integer, primary_key=True, index=True)
     
-    # 外键：关联到 User.id
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    # 外键：关联到 User.id（由下方以 user_id 开头的组合索引覆盖）
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # 任务文本，最长 500 个字符，不能为空
     text = Column(String(500), nullable=False)
@@ -63,6 +78,9 @@ class Todo(Base):
     # 更新时间，每次更新记录时自动更新
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     
+    # 最后一次创建或修改时用户的版本号（见 TodoRevision），用于增量同步
+    revision = Column(Integer, nullable=False, default=0, server_default="0")
+    
     # 关系：此任务所属的用户
     owner = relationship("User", back_populates="todos")
 
@@ -88,4 +106,131 @@ class Todo(Base):
             "due_date": self.due_date.isoformat() if self.due_date else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "revision": self.revision,
         }
+
+
+class TodoRevision(Base):
+    """
+    TodoRevision 数据库模型
+    
+    记录每个用户待办事项的版本号。
+    用户的任意待办事项被创建、修改或删除时，版本号在同一个事务中加一，
+    列表接口据此生成 ETag，客户端数据未变化时无需重新下载；
+    增量同步接口据此返回某个版本号之后的变化。
+    """
+    __tablename__ = "todo_revisions"
+
+    # 主键，同时是外键：关联到 User.id
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 当前版本号，从 0 开始递增
+    revision = Column(Integer, nullable=False, default=0)
+    
+    # 已压缩的删除记录的最大版本号：since 小于该值的增量同步请求无法得到完整的删除列表
+    tombstone_floor = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        """模型字符串表示，便于调试"""
+        return f"<TodoRevision(user_id={self.user_id}, revision={self.revision})>"
+
+
+class TodoStats(Base):
+    """
+    TodoStats 数据库模型
+    
+    每个用户待办事项的计数器，在修改待办事项的同一个事务中增减，
+    统计接口直接读取，无需对 todos 做 COUNT 扫描。
+    未完成数 = total - completed；逾期数与当前日期有关，不在此保存。
+    """
+    __tablename__ = "todo_stats"
+
+    # 主键，同时是外键：关联到 User.id
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 待办事项总数
+    total = Column(Integer, nullable=False, default=0, server_default="0")
+    
+    # 已完成的待办事项数
+    completed = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __repr__(self):
+        """模型字符串表示，便于调试"""
+        return f"<TodoStats(user_id={self.user_id}, total={self.total}, completed={self.completed})>"
+
+
+class TokenRevocation(Base):
+    """
+    TokenRevocation 数据库模型
+    
+    Token 吊销记录，每个 worker 按 id 增量同步到内存，验证 Token 时不查询数据库。
+    - jti 不为空：吊销单个 Token（登出、Refresh Token 轮换），jti 唯一，
+      同一个 Refresh Token 只能成功轮换一次
+    - jti 为空：吊销该用户 token_version 小于指定版本号的全部 Token（修改密码）；
+      旧版本的记录使用 revoked_before（按签发时间吊销不带版本号的旧 Token）
+    被吊销的 Token 都过期后（expires_at 之后）记录即可删除。
+    """
+    __tablename__ = "token_revocations"
+
+    __table_args__ = (
+        # 删除已过期的记录
+        Index("ix_token_revocations_expires_at", "expires_at"),
+        # 轮换 Refresh Token 时以插入是否冲突判断是否重复使用（多个 NULL 不冲突）
+        Index("ux_token_revocations_jti", "jti", unique=True),
+    )
+
+    # 主键，同时是增量同步的游标
+    id = Column(Integer, primary_key=True)
+    
+    # Token 所属的用户
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    
+    # 被吊销 Token 的 jti，为空表示吊销该用户的全部 Token
+    jti = Column(String(64), nullable=True)
+    
+    # 吊销全部 Token 时的最小有效版本号
+    token_version = Column(Integer, nullable=True)
+    
+    # 旧版本吊销全部 Token 时的截止签发时间（只对不带版本号的 Token 生效）
+    revoked_before = Column(DateTime(timezone=True), nullable=True)
+    
+    # 被吊销的 Token 最晚的过期时间
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        """模型字符串表示，便于调试"""
+        return f"<TokenRevocation(id={self.id}, user_id={self.user_id}, jti={self.jti})>"
+
+
+class TodoTombstone(Base):
+    """
+    TodoTombstone 数据库模型
+    
+    记录被删除的待办事项（删除墓碑），供增量同步接口告知客户端哪些任务已删除。
+    超过保留期的记录会被定期压缩（删除）。
+    """
+    __tablename__ = "todo_tombstones"
+
+    # 增量同步：查询某个版本号之后的删除记录
+    __table_args__ = (
+        Index("ix_todo_tombstones_user_revision", "user_id", "revision"),
+    )
+
+    # 主键
+    id = Column(Integer, primary_key=True)
+    
+    # 被删除任务所属的用户
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    
+    # 被删除任务的 ID
+    todo_id = Column(Integer, nullable=False)
+    
+    # 删除时用户的版本号
+    revision = Column(Integer, nullable=False)
+    
+    # 删除时间，用于按保留期压缩
+    deleted_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self):
+        """模型字符串表示，便于调试"""
+        return f"<TodoTombstone(user_id={self.user_id}, todo_id={self.todo_id}, revision={self.revision})>"
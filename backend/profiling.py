@@ -0,0 +1,221 @@
+# ==================== 请求剖析模块 ====================
+
+"""
+请求剖析模块
+定位慢请求的耗时分布和慢 SQL
+
+包含：
+- ProfilingMiddleware：按阶段统计每个请求的耗时，通过 Server-Timing 响应头返回
+- timed：在代码中标记一个阶段（例如 auth、serialize）
+- install_query_profiling：通过引擎事件统计每个请求的 SQL 耗时，
+  并记录超过阈值的慢 SQL（参数结构和执行计划）
+
+阶段耗时保存在 contextvars 中，只有启用剖析的请求才会记录。
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的阶段耗时，未启用剖析时为 None
+_current_timings: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+# ==================== 阶段计时 ====================
+
+
+class RequestTimings:
+    """一个请求中各阶段的累计耗时（秒）和 SQL 语句数"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.queries = 0
+
+    def add(self, phase: str, seconds: float) -> None:
+        """累加阶段耗时"""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """
+        生成 Server-Timing 响应头
+
+        包含各阶段耗时、其余应用代码耗时（app）和总耗时（total），单位毫秒。
+        auth 阶段包含其中的数据库查询，因此 db 与 auth 可能重叠。
+        """
+        total = time.perf_counter() - self.started
+        entries = []
+        for phase, seconds in self.phases.items():
+            description = f';desc="{self.queries} queries"' if phase == "db" else ""
+            entries.append(f"{phase};dur={seconds * 1000:.2f}{description}")
+        other = total - sum(seconds for phase, seconds in self.phases.items() if phase != "auth")
+        entries.append(f"app;dur={max(other, 0.0) * 1000:.2f}")
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def timed(phase: str):
+    """
+    统计代码块的耗时并计入当前请求的阶段
+
+    未启用剖析时只有一次 ContextVar 读取的开销。
+
+    Args:
+        phase: 阶段名称，例如 auth、serialize
+    """
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+class ProfilingMiddleware:
+    """
+    为每个请求记录阶段耗时，并在响应头中加入 Server-Timing
+
+    流式响应在发送响应头后产生的耗时不计入。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timings.reset(token)
+
+
+# ==================== SQL 耗时和慢查询日志 ====================
+
+# 各数据库查看执行计划的语句前缀
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+# 只对查询和 DML 执行 EXPLAIN；DDL（CREATE / DROP TRIGGER 等）和事务控制语句不支持
+EXPLAINABLE_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def parameter_shape(parameters, executemany: bool) -> str:
+    """
+    描述 SQL 参数的结构（类型和数量），不输出参数值
+
+    Args:
+        parameters: 驱动参数（元组、字典或 executemany 的列表）
+        executemany: 是否为批量执行
+
+    Returns:
+        str: 例如 "(int, str)" 或 "500 x (int, str, NoneType)"
+    """
+    def describe(params) -> str:
+        if isinstance(params, dict):
+            return "{" + ", ".join(f"{key}: {type(value).__name__}" for key, value in params.items()) + "}"
+        if isinstance(params, (list, tuple)):
+            return "(" + ", ".join(type(value).__name__ for value in params) + ")"
+        return type(params).__name__
+
+    if executemany:
+        rows = list(parameters) if parameters else []
+        return f"{len(rows)} x {describe(rows[0]) if rows else '()'}"
+    return describe(parameters) if parameters else "()"
+
+
+def _explainable(statement: str) -> bool:
+    """语句是否以 EXPLAINABLE_KEYWORDS 中的关键字开头"""
+    words = statement.split(None, 1)
+    return bool(words) and words[0].upper() in EXPLAINABLE_KEYWORDS
+
+
+def _explain(conn, statement: str, parameters) -> str:
+    """
+    在同一连接上获取语句的执行计划，失败时返回错误说明
+
+    EXPLAIN 在 SAVEPOINT 中执行：PostgreSQL 上失败的语句会让整个事务进入 aborted 状态，
+    回滚到 SAVEPOINT 后请求自己的事务可以继续使用。
+    """
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name)
+    if prefix is None:
+        return f"（{conn.dialect.name} 不支持自动 EXPLAIN）"
+    conn.info["explaining"] = True
+    try:
+        with conn.begin_nested():
+            rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+        return "\n".join(str(row[-1]) for row in rows)
+    except Exception as e:
+        return f"（EXPLAIN 失败: {e}）"
+    finally:
+        conn.info["explaining"] = False
+
+
+def install_query_profiling(engine, slow_query_ms: float = 0, explain: bool = True) -> None:
+    """
+    为异步引擎注册 SQL 剖析事件
+
+    - 启用剖析的请求中，每条 SQL 的耗时计入 db 阶段
+    - 耗时超过 slow_query_ms 的语句写入警告日志，附带参数结构和执行计划
+      （只对查询和 DML 执行 EXPLAIN，executemany 语句不执行）
+
+    Args:
+        engine: AsyncEngine
+        slow_query_ms: 慢查询阈值（毫秒），0 表示不记录慢查询
+        explain: 是否为慢查询附带执行计划
+    """
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+        if conn.info.get("explaining"):
+            return
+
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add("db", elapsed)
+            timings.queries += 1
+
+        if slow_query_ms and elapsed * 1000 >= slow_query_ms:
+            plan = ""
+            if explain and not executemany and _explainable(statement):
+                plan = "\n执行计划:\n" + _explain(conn, statement, parameters)
+            logger.warning(
+                f"慢查询 {elapsed * 1000:.1f} ms: {statement}\n"
+                f"参数结构: {parameter_shape(parameters, executemany)}{plan}"
+            )
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("profile_started"):
+            conn.info["profile_started"].pop()
@@ -0,0 +1,708 @@
+# ==================== 查询构建模块 ====================
+
+"""
+查询构建模块
+集中定义各个端点使用的 SQL 查询
+
+包含：
+- 游标（cursor）编码和解码
+- 待办事项列表的 keyset 分页查询和服务端过滤
+- 按主键 / 用户名的单行查询
+- 批量操作使用的所有权检查和批量写入语句
+- 版本号和增量同步查询
+- 导出使用的按列查询和导入使用的批量插入语句
+- 全文搜索（SQLite FTS5，其他数据库使用 LIKE）
+- 统计计数器的读取、逾期计数、一致性检查和重建
+
+新增端点查询时请在 backend/manage.py 的 PLAN_CASES 中登记，
+`python -m backend.manage check-plans` 会检查其执行计划。
+"""
+
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import (
+    Delete, Insert, Select, Update, bindparam, case, column, delete, func, insert, literal_column,
+    or_, select, table, update
+)
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from backend.models import Todo, TodoRevision, TodoStats, TodoTombstone, TokenRevocation, User
+
+# ==================== 配置 ====================
+
+# 按列查询待办事项时选择的列，顺序与 serialization.TODO_FIELDS 一致
+TODO_COLUMNS = (
+    Todo.id, Todo.user_id, Todo.text, Todo.completed, Todo.due_date,
+    Todo.created_at, Todo.updated_at, Todo.revision,
+)
+
+# FTS5 全文索引表（由 database.create_todo_fts 创建，不属于 ORM 模型）
+todos_fts = table("todos_fts", column("rowid"), column("rank"), column("text"), column("user_id"))
+
+# 列表接口默认每页条数
+DEFAULT_PAGE_SIZE = 50
+
+# 列表接口每页条数上限，防止一次请求拉取过多数据
+MAX_PAGE_SIZE = 200
+
+# ==================== 查询辅助表达式 ====================
+
+
+class unindexed(FunctionElement):
+    """
+    禁止 SQLite 使用某列上的索引
+
+    在 SQLite 上渲染为 `+column`（SQLite 约定的写法），
+    其他数据库原样渲染列名，交给各自的优化器决定。
+    """
+    name = "unindexed"
+    inherit_cache = True
+
+    def __init__(self, column):
+        super().__init__(column)
+        self.type = column.type
+
+
+@compiles(unindexed)
+def _compile_unindexed(element, compiler, **kw):
+    return compiler.process(element.clauses, **kw)
+
+
+@compiles(unindexed, "sqlite")
+def _compile_unindexed_sqlite(element, compiler, **kw):
+    return "+" + compiler.process(element.clauses, **kw)
+
+
+# ==================== 游标操作函数 ====================
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    将分页位置编码为不透明的游标字符串
+
+    游标只记录上一页最后一条记录的 id，
+    下一页从该 id 之后继续查询（keyset 分页，不使用 OFFSET）。
+
+    Args:
+        last_id: 上一页最后一条待办事项的 ID
+
+    Returns:
+        str: URL 安全的 base64 游标
+    """
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    解析游标字符串，返回上一页最后一条记录的 ID
+
+    Args:
+        cursor: encode_cursor 生成的游标
+
+    Returns:
+        int: 上一页最后一条待办事项的 ID
+
+    Raises:
+        HTTPException: 游标格式无效时抛出 400 异常
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        last_id = payload["id"]
+        if not isinstance(last_id, int) or isinstance(last_id, bool):
+            raise ValueError("cursor id must be an integer")
+        return last_id
+    except (binascii.Error, ValueError, KeyError, TypeError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
+# ==================== 查询构建函数 ====================
+
+
+def todo_list_query(
+    user_id: int,
+    limit: int,
+    after_id: Optional[int] = None,
+    completed: Optional[bool] = None,
+    due_after: Optional[date] = None,
+    due_before: Optional[date] = None,
+    overdue: Optional[bool] = None,
+    today: Optional[date] = None,
+) -> Select:
+    """
+    构建待办事项列表查询
+
+    按 id 倒序返回当前用户的待办事项，使用 keyset 分页：
+    通过 `id < after_id` 定位下一页，而不是 OFFSET，
+    因此无论翻到第几页，每页的查询代价都相同。
+    只选择 TODO_COLUMNS，结果为元组行，不构建 ORM 对象。
+
+    Args:
+        user_id: 当前用户 ID
+        limit: 本次最多返回的条数
+        after_id: 上一页最后一条记录的 ID，为 None 时从第一页开始
+        completed: 按完成状态过滤
+        due_after: 截止日期下限（包含）
+        due_before: 截止日期上限（包含）
+        overdue: 为 True 时只返回已逾期的未完成任务，为 False 时排除这些任务
+        today: 判断逾期使用的当前日期，默认为 date.today()
+
+    Returns:
+        Select: 可直接执行的 SQLAlchemy 查询
+    """
+    stmt = select(*TODO_COLUMNS).where(Todo.user_id == user_id)
+
+    if after_id is not None:
+        stmt = stmt.where(Todo.id < after_id)
+
+    if completed is not None:
+        stmt = stmt.where(Todo.completed == completed)
+
+    if due_after is not None:
+        stmt = stmt.where(Todo.due_date >= due_after)
+
+    if due_before is not None:
+        stmt = stmt.where(Todo.due_date <= due_before)
+
+    if overdue is not None:
+        today = today or date.today()
+        if overdue:
+            # SQLite 没有统计信息时会选择 (user_id, completed, due_date) 索引再临时排序；
+            # 让 due_date 条件不参与选索引，沿 (user_id, completed, id) 有序扫描，避免排序
+            stmt = stmt.where(
+                Todo.completed == False,  # noqa: E712
+                unindexed(Todo.due_date) < today,
+            )
+        else:
+            stmt = stmt.where(or_(
+                Todo.completed == True,  # noqa: E712
+                Todo.due_date.is_(None),
+                Todo.due_date >= today,
+            ))
+
+    return stmt.order_by(Todo.id.desc()).limit(limit)
+
+
+def todo_owner_query(todo_id: int) -> Select:
+    """
+    构建查询单个待办事项所属用户的语句
+
+    条件更新 / 删除没有命中任何行时使用，用于区分 404 和 403。
+
+    Args:
+        todo_id: 待办事项 ID
+
+    Returns:
+        Select: 返回 user_id 的查询
+    """
+    return select(Todo.user_id).where(Todo.id == todo_id)
+
+
+def todo_update_returning_statement(todo_id: int, user_id: int, values: dict) -> Update:
+    """
+    构建带所有权条件的单条更新语句，并返回更新后的行
+
+    WHERE 同时限定 id 和 user_id，一条语句完成所有权检查、更新和读取，
+    不属于当前用户或不存在时不更新任何行。
+
+    Args:
+        todo_id: 待办事项 ID
+        user_id: 当前用户 ID
+        values: 要更新的字段和值
+
+    Returns:
+        Update: RETURNING TODO_COLUMNS 的更新语句
+    """
+    table = Todo.__table__
+    return (
+        update(table)
+        .where(table.c.id == todo_id, table.c.user_id == user_id)
+        .values(**values)
+        .returning(*TODO_COLUMNS)
+    )
+
+
+def todo_delete_returning_statement(todo_id: int, user_id: int) -> Delete:
+    """
+    构建带所有权条件的单条删除语句，并返回被删除行的 ID 和完成状态
+
+    Args:
+        todo_id: 待办事项 ID
+        user_id: 当前用户 ID
+
+    Returns:
+        Delete: RETURNING id, completed 的删除语句
+    """
+    table = Todo.__table__
+    return (
+        delete(table)
+        .where(table.c.id == todo_id, table.c.user_id == user_id)
+        .returning(table.c.id, table.c.completed)
+    )
+
+
+def user_by_username_query(username: str) -> Select:
+    """
+    构建按用户名查询用户的语句
+
+    Args:
+        username: 用户名
+
+    Returns:
+        Select: 可直接执行的 SQLAlchemy 查询
+    """
+    return select(User).where(User.username == username)
+
+
+def user_token_version_bump_statement(user_id: int) -> Update:
+    """
+    构建递增用户 Token 版本号并返回新值的语句
+
+    单条 UPDATE ... RETURNING，并发修改密码时每次都得到不同的版本号。
+
+    Args:
+        user_id: 用户 ID
+
+    Returns:
+        Update: 返回递增后 token_version 的 SQLAlchemy 更新语句
+    """
+    return (
+        update(User)
+        .where(User.id == user_id)
+        .values(token_version=User.token_version + 1)
+        .returning(User.token_version)
+    )
+
+
+def user_password_rehash_statement(user_id: int, old_hash: str, new_hash: str) -> Update:
+    """
+    构建替换用户密码 hash 的条件更新语句
+
+    只在数据库中仍是旧 hash 时更新，期间密码被修改过则不覆盖。
+
+    Args:
+        user_id: 用户 ID
+        old_hash: 验证时读取到的 hash
+        new_hash: 按当前参数重新计算的 hash
+
+    Returns:
+        Update: 可直接执行的 SQLAlchemy 更新语句
+    """
+    return (
+        update(User)
+        .where(User.id == user_id, User.hashed_password == old_hash)
+        .values(hashed_password=new_hash)
+    )
+
+
+def todo_owners_query(todo_ids: Iterable[int]) -> Select:
+    """
+    构建一次查询多个待办事项所属用户的语句
+
+    Args:
+        todo_ids: 待办事项 ID 列表
+
+    Returns:
+        Select: 返回 (id, user_id) 的查询
+    """
+    return select(Todo.id, Todo.user_id).where(Todo.id.in_(list(todo_ids)))
+
+
+def todo_bulk_update_statement(user_id: int, fields: Iterable[str]) -> Update:
+    """
+    构建按主键批量更新待办事项的语句
+
+    配合参数列表执行（executemany），每组参数包含 `b_id` 和 `v_<字段名>`。
+    WHERE 条件同时限制 user_id，即使所有权检查之后数据发生变化也不会越权修改。
+    updated_at 由列上的 onupdate 自动设置。
+
+    Args:
+        user_id: 当前用户 ID
+        fields: 要更新的字段名，例如 ("text", "completed")
+
+    Returns:
+        Update: Core 层的 UPDATE 语句
+    """
+    table = Todo.__table__
+    return (
+        update(table)
+        .where(table.c.id == bindparam("b_id"), table.c.user_id == user_id)
+        .values({field: bindparam(f"v_{field}") for field in fields})
+    )
+
+
+def todo_bulk_delete_statement(user_id: int, todo_ids: Iterable[int]) -> Delete:
+    """
+    构建批量删除当前用户待办事项的语句
+
+    Args:
+        user_id: 当前用户 ID
+        todo_ids: 要删除的待办事项 ID 列表
+
+    Returns:
+        Delete: 返回被删除行 id 和 completed 的 DELETE 语句（用于写入墓碑和调整统计计数器）
+    """
+    return (
+        delete(Todo)
+        .where(Todo.id.in_(list(todo_ids)), Todo.user_id == user_id)
+        .returning(Todo.id, Todo.completed)
+    )
+
+
+def todos_by_ids_query(user_id: int, todo_ids: Iterable[int]) -> Select:
+    """
+    构建按 ID 列表查询当前用户待办事项的语句
+
+    Args:
+        user_id: 当前用户 ID
+        todo_ids: 待办事项 ID 列表
+
+    Returns:
+        Select: 可直接执行的 SQLAlchemy 查询
+    """
+    return select(Todo).where(Todo.id.in_(list(todo_ids)), Todo.user_id == user_id)
+
+
+def todo_revision_query(user_id: int) -> Select:
+    """
+    构建读取用户待办事项版本号的语句
+
+    Args:
+        user_id: 用户 ID
+
+    Returns:
+        Select: 返回 revision 的查询
+    """
+    return select(TodoRevision.revision).where(TodoRevision.user_id == user_id)
+
+
+def todo_sync_state_query(user_id: int) -> Select:
+    """
+    构建读取用户版本号和墓碑压缩下限的语句
+
+    Args:
+        user_id: 用户 ID
+
+    Returns:
+        Select: 返回 (revision, tombstone_floor) 的查询
+    """
+    return select(TodoRevision.revision, TodoRevision.tombstone_floor).where(
+        TodoRevision.user_id == user_id
+    )
+
+
+def todo_changes_query(user_id: int, since: int, until: int, limit: int) -> Select:
+    """
+    构建查询版本号区间 (since, until] 内创建或修改的待办事项的语句
+
+    Args:
+        user_id: 当前用户 ID
+        since: 客户端已同步到的版本号（不包含）
+        until: 本次同步到的版本号（包含）
+        limit: 最多返回的条数
+
+    Returns:
+        Select: 按版本号升序的查询
+    """
+    return (
+        select(Todo)
+        .where(Todo.user_id == user_id, Todo.revision > since, Todo.revision <= until)
+        .order_by(Todo.revision)
+        .limit(limit)
+    )
+
+
+def tombstones_query(user_id: int, since: int, until: int, limit: int) -> Select:
+    """
+    构建查询版本号区间 (since, until] 内删除的待办事项 ID 的语句
+
+    Args:
+        user_id: 当前用户 ID
+        since: 客户端已同步到的版本号（不包含）
+        until: 本次同步到的版本号（包含）
+        limit: 最多返回的条数
+
+    Returns:
+        Select: 返回 todo_id、按版本号升序的查询
+    """
+    return (
+        select(TodoTombstone.todo_id)
+        .where(
+            TodoTombstone.user_id == user_id,
+            TodoTombstone.revision > since,
+            TodoTombstone.revision <= until,
+        )
+        .order_by(TodoTombstone.revision)
+        .limit(limit)
+    )
+
+
+def todo_export_query(user_id: int) -> Select:
+    """
+    构建导出当前用户全部待办事项的按列查询
+
+    只选择 TODO_COLUMNS，不构建 ORM 对象；按 id 升序，沿 (user_id, id) 索引扫描。
+
+    Args:
+        user_id: 当前用户 ID
+
+    Returns:
+        Select: 可直接执行的 SQLAlchemy 查询
+    """
+    return select(*TODO_COLUMNS).where(Todo.user_id == user_id).order_by(Todo.id)
+
+
+def todo_bulk_insert_statement() -> Insert:
+    """
+    构建批量插入待办事项的 Core 语句
+
+    配合参数列表执行时走 executemany，不构建 ORM 对象。
+    每行参数需包含 user_id、text、completed、due_date 和 revision。
+
+    Returns:
+        Insert: 可直接执行的 SQLAlchemy 插入语句
+    """
+    return insert(Todo.__table__)
+
+
+def todo_fts_index_statement(user_id: int, revision: int) -> Insert:
+    """
+    构建为一个导入分块建立全文索引的语句
+
+    分块中的行共用一个版本号，在 (user_id, revision) 索引上一次读出，
+    用一条 INSERT ... SELECT 写入全文索引，代替逐行触发器。
+
+    Args:
+        user_id: 当前用户 ID
+        revision: 分块的版本号
+
+    Returns:
+        Insert: 写入 todos_fts 的 INSERT ... SELECT 语句
+    """
+    return insert(todos_fts).from_select(
+        ["rowid", "text", "user_id"],
+        select(Todo.id, Todo.text, Todo.user_id).where(Todo.user_id == user_id, Todo.revision == revision)
+    )
+
+
+def search_terms(q: str) -> List[str]:
+    """
+    把搜索字符串拆分为词项，忽略不含字母或数字的片段
+
+    Args:
+        q: 用户输入的搜索字符串
+
+    Returns:
+        List[str]: 词项列表，为空时不应执行搜索
+    """
+    return [term for term in q.split() if any(ch.isalnum() for ch in term)]
+
+
+def fts_match_expression(user_id: int, terms: List[str]) -> str:
+    """
+    构建 FTS5 MATCH 表达式：限定 user_id 列为当前用户，
+    text 列中每个词项作为带引号的前缀查询，词项之间为 AND
+
+    用户输入中的 FTS5 语法字符（引号、星号、括号、NEAR 等）都被当作普通文本。
+
+    Args:
+        user_id: 当前用户 ID
+        terms: search_terms 返回的词项
+
+    Returns:
+        str: 例如 'user_id : "1" AND text : ("buy"* "mil"*)'
+    """
+    phrases = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+    return f'user_id : "{int(user_id)}" AND text : ({phrases})'
+
+
+def todo_search_query(user_id: int, terms: List[str], limit: int, use_fts: bool) -> Select:
+    """
+    构建当前用户的待办事项全文搜索查询
+
+    - use_fts 为 True（SQLite FTS5）：在 MATCH 中限定 user_id，只匹配当前用户的索引项，
+      按 bm25 相关度排序，再按主键关联 todos
+    - use_fts 为 False：每个词项一个不区分大小写的 LIKE 子串匹配，按 id 倒序
+
+    Args:
+        user_id: 当前用户 ID
+        terms: search_terms 返回的词项（不能为空）
+        limit: 最多返回的条数
+        use_fts: 是否使用 FTS5 全文索引
+
+    Returns:
+        Select: 返回 TODO_COLUMNS 的查询
+    """
+    if use_fts:
+        return (
+            select(*TODO_COLUMNS)
+            .select_from(todos_fts)
+            .join(Todo, Todo.id == todos_fts.c.rowid)
+            .where(
+                literal_column("todos_fts").op("MATCH")(fts_match_expression(user_id, terms)),
+                Todo.user_id == user_id,
+            )
+            .order_by(todos_fts.c.rank)
+            .limit(limit)
+        )
+
+    stmt = select(*TODO_COLUMNS).where(Todo.user_id == user_id)
+    for term in terms:
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        stmt = stmt.where(Todo.text.ilike(f"%{escaped}%", escape="\\"))
+    return stmt.order_by(Todo.id.desc()).limit(limit)
+
+
+def todo_stats_query(user_id: int) -> Select:
+    """
+    构建读取用户统计计数器的查询
+
+    Args:
+        user_id: 用户 ID
+
+    Returns:
+        Select: 返回 (total, completed) 的单行主键查询
+    """
+    return select(TodoStats.total, TodoStats.completed).where(TodoStats.user_id == user_id)
+
+
+def todo_overdue_count_query(user_id: int, today: date) -> Select:
+    """
+    构建统计已逾期未完成任务数的查询
+
+    条件与列表接口的 overdue=true 相同，
+    在 (user_id, completed, due_date) 索引上做范围计数，只读索引不回表。
+
+    Args:
+        user_id: 用户 ID
+        today: 判断逾期使用的当前日期
+
+    Returns:
+        Select: 返回逾期数的查询
+    """
+    return select(func.count()).select_from(Todo).where(
+        Todo.user_id == user_id,
+        Todo.completed == False,  # noqa: E712
+        Todo.due_date < today,
+    )
+
+
+def todo_completion_change_count(user_id: int, todo_ids: Iterable[int], completed: bool):
+    """
+    构建标量子查询：将这些待办事项设为 completed 时，实际发生变化的条数
+
+    需要在 UPDATE 之前、同一个事务中执行，用于计算统计计数器的增量。
+    completed 为 NULL 的旧数据按未完成处理。
+
+    Args:
+        user_id: 用户 ID
+        todo_ids: 要更新的待办事项 ID
+        completed: 更新后的完成状态
+
+    Returns:
+        标量子查询
+    """
+    return select(func.count()).select_from(Todo).where(
+        Todo.id.in_(list(todo_ids)),
+        Todo.user_id == user_id,
+        func.coalesce(Todo.completed, False) != completed,
+    ).scalar_subquery()
+
+
+def all_todo_stats_query() -> Select:
+    """
+    构建读取全部统计计数器的查询（只用于一致性检查）
+
+    Returns:
+        Select: 返回 (user_id, total, completed) 的查询
+    """
+    return select(TodoStats.user_id, TodoStats.total, TodoStats.completed)
+
+
+def todo_stats_actual_query() -> Select:
+    """
+    构建按用户实际统计 todos 的聚合查询（全表扫描，只用于检查和重建）
+
+    Returns:
+        Select: 返回 (user_id, total, completed) 的查询
+    """
+    return select(
+        Todo.user_id,
+        func.count().label("total"),
+        func.coalesce(func.sum(case((Todo.completed == True, 1), else_=0)), 0).label("completed"),  # noqa: E712
+    ).group_by(Todo.user_id)
+
+
+def todo_stats_rebuild_statements() -> list:
+    """
+    构建从 todos 重新计算全部统计计数器的语句（需在同一个事务中依次执行）
+
+    Returns:
+        list: [清空计数器的 DELETE, 按用户聚合写入的 INSERT ... SELECT]
+    """
+    return [
+        delete(TodoStats),
+        insert(TodoStats).from_select(["user_id", "total", "completed"], todo_stats_actual_query()),
+    ]
+
+
+def token_revocations_since_query(after_id: int, limit: int) -> Select:
+    """
+    构建按 id 增量读取 Token 吊销记录的查询
+
+    Args:
+        after_id: 已同步的最大记录 ID
+        limit: 最多返回的记录数
+
+    Returns:
+        Select: 按 id 升序的 SQLAlchemy 查询
+    """
+    return (
+        select(TokenRevocation)
+        .where(TokenRevocation.id > after_id)
+        .order_by(TokenRevocation.id)
+        .limit(limit)
+    )
+
+
+def duplicate_token_revocations_delete_statement() -> Delete:
+    """
+    构建删除重复 jti 吊销记录的语句（每个 jti 保留 id 最小的一条）
+
+    为已有数据库创建 jti 唯一索引之前执行一次。
+
+    Returns:
+        Delete: 可直接执行的 SQLAlchemy 删除语句
+    """
+    first_ids = (
+        select(func.min(TokenRevocation.id))
+        .where(TokenRevocation.jti.is_not(None))
+        .group_by(TokenRevocation.jti)
+    )
+    return delete(TokenRevocation).where(
+        TokenRevocation.jti.is_not(None),
+        TokenRevocation.id.not_in(first_ids),
+    )
+
+
+def expired_token_revocations_delete_statement(now: datetime) -> Delete:
+    """
+    构建删除已过期 Token 吊销记录的语句
+
+    Args:
+        now: 当前时间
+
+    Returns:
+        Delete: 可直接执行的 SQLAlchemy 删除语句
+    """
+    return delete(TokenRevocation).where(TokenRevocation.expires_at < now)
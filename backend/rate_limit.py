@@ -0,0 +1,485 @@
+# ==================== 登录限流模块 ====================
+
+"""
+登录限流模块
+在计算 bcrypt 之前按用户名和客户端 IP 限制登录 / 注册的频率
+
+bcrypt 每次计算约消耗数百毫秒 CPU，撞库攻击很容易占满所有核心。
+每个用户名和每个 IP 各有一个令牌桶：桶容量为允许的突发次数，按固定速率补充。
+- IP 桶：每次尝试都扣除一个令牌
+- 用户名桶：计算 bcrypt 之前预留一个令牌，密码验证成功后退还，
+  最终只有失败的尝试消耗令牌；并发的一批错误密码在预留时就被限流，
+  不能趁 bcrypt 还没算完时绕过上限
+任一桶没有令牌时直接返回 429 和 Retry-After，不做任何 Hash 计算。
+
+客户端 IP 取自连接的对端地址；对端属于 TRUSTED_PROXIES 时，
+改为 X-Forwarded-For 中从右往左第一个不属于可信代理的地址。
+
+包含：
+- TokenBucketLimiter：进程内令牌桶，定期清理已补满的桶，并限制跟踪的键数量
+- RedisRateLimitBackend：可选的 Redis 后端，多个 worker 共享令牌桶
+- LoginThrottle：组合用户名和 IP 两个维度的限流
+- client_ip：按可信代理配置解析客户端 IP
+"""
+
+import ipaddress
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from backend.config import (
+    LOGIN_RATE_LIMIT_ENABLED, LOGIN_USERNAME_PER_MINUTE, LOGIN_USERNAME_BURST,
+    LOGIN_IP_PER_MINUTE, LOGIN_IP_BURST, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_SWEEP_INTERVAL,
+    RATE_LIMIT_BACKEND, RATE_LIMIT_REDIS_URL, TRUSTED_PROXIES
+)
+from backend.metrics import Gauge, registry
+
+# redis 为可选依赖，只有 RATE_LIMIT_BACKEND=redis 时需要
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - 取决于运行环境
+    aioredis = None
+
+
+# ==================== 进程内令牌桶 ====================
+
+
+class TokenBucketLimiter:
+    """
+    按键限流的令牌桶
+
+    每个键只保存 [令牌数, 上次更新时间] 两个数；空闲到令牌补满的桶与新桶等价，
+    定期清理时直接删除。键数量达到上限时先清理，仍然不够则淘汰最早加入的键。
+    只在事件循环线程中使用，因此不加锁。
+    """
+
+    def __init__(self, per_minute: float, burst: int, max_keys: int = 100000, sweep_interval: float = 60.0):
+        """
+        Args:
+            per_minute: 每分钟补充的令牌数
+            burst: 桶容量（允许的突发次数）
+            max_keys: 最多跟踪的键数量
+            sweep_interval: 清理已补满的桶的间隔（秒）
+        """
+        self.rate = per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_keys = max(1, max_keys)
+        self.sweep_interval = sweep_interval
+        self._buckets: Dict[str, List[float]] = {}
+        self._last_sweep = time.monotonic()
+
+        # 统计指标
+        self.evictions = 0
+
+    def _tokens(self, key: str, now: float) -> float:
+        """返回键当前的令牌数（不修改状态）"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return float(self.burst)
+        return min(float(self.burst), bucket[0] + (now - bucket[1]) * self.rate)
+
+    def retry_after(self, key: str, now: float) -> float:
+        """
+        返回获得一个令牌需要等待的秒数
+
+        Returns:
+            float: 0 表示当前就有令牌
+        """
+        tokens = self._tokens(key, now)
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.rate if self.rate > 0 else math.inf
+
+    def refund(self, key: str, now: float) -> None:
+        """退还一个令牌（不超过桶容量；桶已被清理时等价于已补满，无需处理）"""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0], bucket[1] = min(float(self.burst), self._tokens(key, now) + 1), now
+
+    def consume(self, key: str, now: float) -> None:
+        """扣除一个令牌（调用前应先确认 retry_after 为 0）"""
+        tokens = self._tokens(key, now) - 1
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0], bucket[1] = tokens, now
+            return
+
+        if len(self._buckets) >= self.max_keys:
+            self.sweep(now)
+            while len(self._buckets) >= self.max_keys:
+                del self._buckets[next(iter(self._buckets))]
+                self.evictions += 1
+        self._buckets[key] = [tokens, now]
+
+    def maybe_sweep(self, now: float) -> None:
+        """距上次清理超过 sweep_interval 时清理一次"""
+        if now - self._last_sweep >= self.sweep_interval:
+            self.sweep(now)
+
+    def sweep(self, now: float) -> int:
+        """
+        删除令牌已补满的桶
+
+        Returns:
+            int: 删除的桶数量
+        """
+        self._last_sweep = now
+        full = [key for key in self._buckets if self._tokens(key, now) >= self.burst]
+        for key in full:
+            del self._buckets[key]
+        return len(full)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+# ==================== Redis 后端 ====================
+
+# 原子地检查并扣除多个令牌桶：任一桶不足一个令牌时不扣除，返回最长的等待毫秒数
+# KEYS: 桶的键；ARGV: 每个桶的 (每毫秒补充的令牌数, 容量, 放行时扣除的令牌数)
+_REDIS_TOKEN_BUCKET_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local burst = tonumber(ARGV[i * 3 - 1])
+    local bucket = redis.call('HMGET', key, 't', 'ts')
+    local current = burst
+    if bucket[1] then
+        current = math.min(burst, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate)
+    end
+    tokens[i] = current
+    if current < 1 then
+        wait = math.max(wait, math.ceil((1 - current) / rate))
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local burst = tonumber(ARGV[i * 3 - 1])
+    local cost = tonumber(ARGV[i * 3])
+    if cost > 0 then
+        redis.call('HSET', key, 't', tokens[i] - cost, 'ts', now)
+        redis.call('PEXPIRE', key, math.ceil(burst / rate))
+    end
+end
+return 0
+"""
+
+# 退还一个令牌：桶不存在（已过期）时等价于已补满，不处理
+# KEYS: 桶的键；ARGV: (每毫秒补充的令牌数, 容量)
+_REDIS_REFUND_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = now_parts[1] * 1000 + math.floor(now_parts[2] / 1000)
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 't', 'ts')
+if bucket[1] then
+    local current = math.min(burst, tonumber(bucket[1]) + (now - tonumber(bucket[2])) * rate + 1)
+    redis.call('HSET', KEYS[1], 't', current, 'ts', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate))
+end
+return 0
+"""
+
+
+class RedisRateLimitBackend:
+    """
+    在 Redis 中保存令牌桶，多个 worker 共享限流状态
+
+    检查和扣除在一个 Lua 脚本中原子完成；桶在补满所需的时间后自动过期，不需要清理。
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "login-limit"):
+        if aioredis is None:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis 需要安装 redis（pip install redis）")
+        self.prefix = prefix
+        self._client = aioredis.from_url(url)
+        self._script = self._client.register_script(_REDIS_TOKEN_BUCKET_SCRIPT)
+        self._refund_script = self._client.register_script(_REDIS_REFUND_SCRIPT)
+
+    async def acquire(self, buckets: List[Tuple[str, TokenBucketLimiter, int]]) -> float:
+        """
+        检查一组令牌桶，全部有令牌时按各自的数量扣除
+
+        Args:
+            buckets: (键, 对应的限流器配置, 扣除的令牌数) 列表，扣除 0 个表示只检查
+
+        Returns:
+            float: 需要等待的秒数，0 表示已放行
+        """
+        keys, args = [], []
+        for key, limiter, cost in buckets:
+            keys.append(f"{self.prefix}:{key}")
+            args.extend([limiter.rate / 1000, limiter.burst, cost])
+        wait_ms = await self._script(keys=keys, args=args)
+        return int(wait_ms) / 1000
+
+    async def refund(self, key: str, limiter: TokenBucketLimiter) -> None:
+        """
+        退还一个令牌
+
+        Args:
+            key: 桶的键
+            limiter: 对应的限流器配置
+        """
+        await self._refund_script(keys=[f"{self.prefix}:{key}"], args=[limiter.rate / 1000, limiter.burst])
+
+    async def close(self) -> None:
+        """关闭连接"""
+        await self._client.close()
+
+
+# ==================== 登录 / 注册限流 ====================
+
+
+class LoginThrottle:
+    """
+    按用户名和客户端 IP 限制登录 / 注册频率
+
+    登录、注册和修改密码共用同一组令牌桶，交替调用不能绕过限制。
+    """
+
+    def __init__(self, username_limiter: TokenBucketLimiter, ip_limiter: TokenBucketLimiter,
+                 enabled: bool = True, backend=None):
+        self.username_limiter = username_limiter
+        self.ip_limiter = ip_limiter
+        self.enabled = enabled
+        self.backend = backend
+
+        # 统计指标
+        self.allowed = 0
+        self.failures = 0
+        self.throttled_username = 0
+        self.throttled_ip = 0
+
+    async def check(self, username: Optional[str], ip: Optional[str]) -> None:
+        """
+        在查询用户和计算 bcrypt 之前调用
+
+        IP 桶和用户名桶各扣除一个令牌。用户名桶的令牌是预留的：
+        密码验证成功后通过 record_success 退还，失败时不退还（record_failure 只计数）。
+        预留在 bcrypt 之前完成，并发的一批请求最多只有 burst 个能进入密码验证。
+
+        Args:
+            username: 请求中的用户名，为 None 时只按 IP 限流（例如注册）
+            ip: 客户端 IP，未知时只按用户名限流
+
+        Raises:
+            HTTPException: 超出频率限制时抛出 429 异常，附带 Retry-After
+        """
+        if not self.enabled:
+            return
+
+        buckets = []
+        if username is not None:
+            buckets.append((f"user:{username}", self.username_limiter, 1))
+        if ip:
+            buckets.append((f"ip:{ip}", self.ip_limiter, 1))
+        if not buckets:
+            return
+
+        wait, limiter = await self._acquire(buckets)
+        if wait > 0:
+            if limiter is self.username_limiter:
+                self.throttled_username += 1
+            else:
+                self.throttled_ip += 1
+            self._reject(wait)
+        self.allowed += 1
+
+    async def record_success(self, username: str) -> None:
+        """
+        密码验证成功后退还 check 预留的用户名令牌
+
+        Args:
+            username: 验证成功的用户名
+        """
+        if not self.enabled:
+            return
+        key = f"user:{username}"
+        if self.backend is not None:
+            await self.backend.refund(key, self.username_limiter)
+        else:
+            self.username_limiter.refund(key, time.monotonic())
+
+    async def record_failure(self, username: str) -> None:
+        """
+        记录一次密码验证失败（check 预留的用户名令牌不退还）
+
+        Args:
+            username: 验证失败的用户名
+        """
+        if not self.enabled:
+            return
+        self.failures += 1
+
+    async def _acquire(self, buckets: List[Tuple[str, TokenBucketLimiter, int]]) -> Tuple[float, object]:
+        """
+        检查一组令牌桶，全部有令牌时按各自的数量扣除
+
+        Args:
+            buckets: (键, 限流器, 扣除的令牌数) 列表，扣除 0 个表示只检查
+
+        Returns:
+            Tuple[float, object]: 需要等待的秒数（0 表示已放行）和触发限流的限流器
+        """
+        if self.backend is not None:
+            # 共享后端不区分是哪个维度触发的限流
+            return await self.backend.acquire(buckets), self.ip_limiter
+
+        now = time.monotonic()
+        wait, limiter = max(
+            ((limiter.retry_after(key, now), limiter) for key, limiter, _ in buckets),
+            key=lambda item: item[0]
+        )
+        if wait > 0:
+            return wait, limiter
+        for key, limiter, cost in buckets:
+            if cost:
+                limiter.consume(key, now)
+            limiter.maybe_sweep(now)
+        return 0.0, None
+
+    @staticmethod
+    def _reject(wait: float) -> None:
+        """抛出 429 异常"""
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="尝试次数过多，请稍后重试",
+            headers={"Retry-After": str(max(1, math.ceil(wait)))},
+        )
+
+    def stats(self) -> dict:
+        """返回限流配置和统计指标"""
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name if self.backend is not None else "memory",
+            "username_per_minute": round(self.username_limiter.rate * 60, 3),
+            "username_burst": self.username_limiter.burst,
+            "ip_per_minute": round(self.ip_limiter.rate * 60, 3),
+            "ip_burst": self.ip_limiter.burst,
+            "tracked_usernames": len(self.username_limiter),
+            "tracked_ips": len(self.ip_limiter),
+            "allowed": self.allowed,
+            "failures": self.failures,
+            "throttled_username": self.throttled_username,
+            "throttled_ip": self.throttled_ip,
+            "evictions": self.username_limiter.evictions + self.ip_limiter.evictions,
+        }
+
+
+# ==================== 客户端 IP ====================
+
+
+def parse_trusted_proxies(value: str) -> List:
+    """
+    解析以逗号分隔的可信代理地址（IP 或 CIDR）
+
+    Args:
+        value: 例如 "127.0.0.1, 10.0.0.0/8"
+
+    Returns:
+        List: ipaddress 网络列表
+
+    Raises:
+        ValueError: 地址格式错误
+    """
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+
+# 可信的反向代理，只有来自它们的 X-Forwarded-For 会被采用
+trusted_proxies = parse_trusted_proxies(TRUSTED_PROXIES)
+
+
+def is_trusted_proxy(address: str) -> bool:
+    """判断地址是否属于可信代理（无法解析的地址不可信）"""
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_ip(request: Request) -> Optional[str]:
+    """
+    返回用于限流的客户端 IP
+
+    对端不是可信代理时直接使用对端地址，忽略客户端自己填写的 X-Forwarded-For；
+    是可信代理时从右往左跳过可信代理，返回第一个外部地址。
+
+    Args:
+        request: 请求对象
+
+    Returns:
+        Optional[str]: 客户端 IP，未知时为 None
+    """
+    if request.client is None:
+        return None
+    peer = request.client.host
+    if not trusted_proxies or not is_trusted_proxy(peer):
+        return peer
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not is_trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+def create_rate_limit_backend(name: str, redis_url: str):
+    """
+    根据配置创建限流后端
+
+    Args:
+        name: memory 或 redis
+        redis_url: Redis 地址
+
+    Returns:
+        限流后端，memory 时为 None
+
+    Raises:
+        ValueError: 不支持的后端
+    """
+    if name == "memory":
+        return None
+    if name == "redis":
+        return RedisRateLimitBackend(redis_url)
+    raise ValueError(f"不支持的限流后端: {name}")
+
+
+# 全局登录限流器
+login_throttle = LoginThrottle(
+    TokenBucketLimiter(LOGIN_USERNAME_PER_MINUTE, LOGIN_USERNAME_BURST, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_SWEEP_INTERVAL),
+    TokenBucketLimiter(LOGIN_IP_PER_MINUTE, LOGIN_IP_BURST, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_SWEEP_INTERVAL),
+    enabled=LOGIN_RATE_LIMIT_ENABLED,
+    backend=create_rate_limit_backend(RATE_LIMIT_BACKEND, RATE_LIMIT_REDIS_URL),
+)
+
+
+# ==================== 监控指标 ====================
+
+registry.register(Gauge(
+    "login_throttle_tracked_keys", "登录限流跟踪的键数量",
+    lambda: {
+        ("username",): len(login_throttle.username_limiter),
+        ("ip",): len(login_throttle.ip_limiter),
+    },
+    ("dimension",)
+))
+registry.register(Gauge(
+    "login_throttle_requests_total", "登录 / 注册限流检查结果",
+    lambda: {
+        ("allowed",): login_throttle.allowed,
+        ("throttled_username",): login_throttle.throttled_username,
+        ("throttled_ip",): login_throttle.throttled_ip,
+    },
+    ("result",), kind="counter"
+))
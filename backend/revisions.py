@@ -0,0 +1,156 @@
+# ==================== 版本号模块 ====================
+
+"""
+版本号模块
+维护每个用户待办事项的版本号，并据此生成 ETag 和支持增量同步
+
+包含：
+- bump_revision：在修改待办事项的事务中递增版本号
+- current_revision：读取当前版本号（单行主键查询）
+- make_etag / etag_matches：生成和比较 ETag
+- add_tombstones / compact_tombstones：记录和压缩删除墓碑
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import upsert_insert
+from backend.models import TodoRevision, TodoTombstone
+from backend.queries import todo_revision_query
+
+
+async def bump_revision(db: AsyncSession, user_id: int) -> int:
+    """
+    递增用户的版本号并返回新值
+
+    使用单条 INSERT ... ON CONFLICT DO UPDATE ... RETURNING，
+    首次修改时自动创建记录。需要在修改待办事项的同一个事务中调用，
+    随事务一起提交或回滚。
+
+    Args:
+        db: 异步数据库会话
+        user_id: 用户 ID
+
+    Returns:
+        int: 递增后的版本号
+    """
+    stmt = upsert_insert(db, TodoRevision).values(user_id=user_id, revision=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TodoRevision.user_id],
+        set_={"revision": TodoRevision.revision + 1},
+    ).returning(TodoRevision.revision)
+    return (await db.execute(stmt)).scalar_one()
+
+
+async def current_revision(db: AsyncSession, user_id: int) -> int:
+    """
+    读取用户当前的版本号
+
+    Args:
+        db: 异步数据库会话
+        user_id: 用户 ID
+
+    Returns:
+        int: 当前版本号，从未修改过时为 0
+    """
+    return (await db.execute(todo_revision_query(user_id))).scalar_one_or_none() or 0
+
+
+def make_etag(user_id: int, revision: int, today: Optional[date] = None) -> str:
+    """
+    根据用户和版本号生成弱 ETag
+
+    结果还依赖当天日期的查询（例如逾期过滤）需要传入 today，
+    日期变化后即使版本号不变，ETag 也会变化。
+
+    Args:
+        user_id: 用户 ID
+        revision: 版本号
+        today: 查询使用的当天日期，与日期无关时为 None
+
+    Returns:
+        str: 形如 W/"1-42" 或 W/"1-42-20250101" 的 ETag
+    """
+    if today is not None:
+        return f'W/"{user_id}-{revision}-{today:%Y%m%d}"'
+    return f'W/"{user_id}-{revision}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    判断请求头 If-None-Match 是否与 ETag 匹配（弱比较）
+
+    Args:
+        if_none_match: If-None-Match 请求头，可以包含多个以逗号分隔的 ETag 或 *
+        etag: 当前 ETag
+
+    Returns:
+        bool: 是否匹配
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return any(opaque(tag) == opaque(etag) for tag in if_none_match.split(","))
+
+
+async def add_tombstones(db: AsyncSession, user_id: int, todo_ids: Iterable[int], revision: int) -> None:
+    """
+    为被删除的待办事项记录删除墓碑
+
+    需要在删除待办事项的同一个事务中调用。
+
+    Args:
+        db: 异步数据库会话
+        user_id: 用户 ID
+        todo_ids: 被删除的待办事项 ID
+        revision: 本次删除对应的版本号（bump_revision 的返回值）
+    """
+    rows = [{"user_id": user_id, "todo_id": todo_id, "revision": revision} for todo_id in todo_ids]
+    if rows:
+        await db.execute(insert(TodoTombstone), rows)
+
+
+async def compact_tombstones(db: AsyncSession, retention_days: float) -> int:
+    """
+    压缩超过保留期的删除墓碑
+
+    删除墓碑前先把每个用户的 tombstone_floor 提高到被删除墓碑的最大版本号，
+    since 低于该值的增量同步请求会被要求全量刷新，不会漏掉删除。
+
+    Args:
+        db: 异步数据库会话
+        retention_days: 保留天数
+
+    Returns:
+        int: 删除的墓碑数量
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=retention_days)
+    expired = (await db.execute(
+        select(TodoTombstone.user_id, func.max(TodoTombstone.revision))
+        .where(TodoTombstone.deleted_at < cutoff)
+        .group_by(TodoTombstone.user_id)
+    )).all()
+
+    removed = 0
+    for user_id, max_revision in expired:
+        await db.execute(
+            update(TodoRevision)
+            .where(TodoRevision.user_id == user_id, TodoRevision.tombstone_floor < max_revision)
+            .values(tombstone_floor=max_revision)
+        )
+        result = await db.execute(
+            delete(TodoTombstone)
+            .where(TodoTombstone.user_id == user_id, TodoTombstone.revision <= max_revision)
+        )
+        removed += result.rowcount
+    await db.commit()
+    return removed
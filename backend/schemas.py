@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, Union
+from typing import List, Literal, Optional, Union
 from datetime import datetime, date
 
 # ==================== Pydantic 数据验证模型 ====================
@@ -53,8 +53,45 @@ class Token(BaseModel):
     # Access Token，用于验证后续请求
     access_token: str = Field(..., description="Access Token")
     
+    # Refresh Token，用于在 Access Token 过期后换取新的 Token，无需重新输入密码
+    refresh_token: str = Field(..., description="Refresh Token")
+    
     # Token 类型，常见值为 Bearer
     token_type: str = Field(..., description="Token 类型")
+    
+    # Access Token 的有效期（秒）
+    expires_in: int = Field(..., description="Access Token 有效期（秒）")
+
+
+class RefreshTokenRequest(BaseModel):
+    """
+    刷新 Token 请求模型
+    
+    POST /api/token/refresh 使用，旧的 Refresh Token 换取新的一对 Token 后即被吊销。
+    """
+    refresh_token: str = Field(..., description="Refresh Token")
+
+
+class LogoutRequest(BaseModel):
+    """
+    登出请求模型
+    
+    同时提交 Refresh Token 时一并吊销，否则只吊销当前的 Access Token。
+    """
+    refresh_token: Optional[str] = Field(None, description="一并吊销的 Refresh Token")
+
+
+class PasswordChange(BaseModel):
+    """
+    修改密码请求模型
+    
+    修改成功后该用户之前签发的所有 Token 立即失效。
+    """
+    # 当前密码
+    old_password: str = Field(..., min_length=1, max_length=255, description="当前密码")
+    
+    # 新密码，至少 6 个字符
+    new_password: str = Field(..., min_length=6, max_length=255, description="新密码")
 
 
 # ==================== Todo 相关模型 ====================
@@ -101,6 +138,37 @@ class TodoUpdate(BaseModel):
     due_date: Optional[date] = Field(None, description="截止日期")
 
 
+# 批量操作接口单次请求最多包含的操作数
+MAX_BATCH_OPERATIONS = 500
+
+
+class TodoBatchOperation(TodoUpdate):
+    """
+    批量操作中的单个操作
+    
+    - create：需要 text，可选 completed、due_date
+    - update：需要 id，其余字段按需提供
+    - delete：只需要 id
+    """
+    # 操作类型
+    op: Literal["create", "update", "delete"] = Field(..., description="操作类型")
+    
+    # 待办事项 ID，update 和 delete 时必填
+    id: Optional[int] = Field(None, description="任务 ID")
+
+
+class TodoBatchRequest(BaseModel):
+    """
+    批量操作请求体模型
+    
+    当客户端 POST /api/todos/batch 时使用，所有操作在同一个事务中执行。
+    """
+    # 操作列表，按顺序返回每个操作的结果
+    operations: List[TodoBatchOperation] = Field(
+        ..., min_length=1, max_length=MAX_BATCH_OPERATIONS, description="操作列表"
+    )
+
+
 class TodoResponse(TodoBase):
     """
     Todo 响应模型
@@ -6,29 +6,54 @@
 
 包含：
 - 密码 hash 和验证（使用 passlib + bcrypt）
-- JWT Token 生成和验证（使用 python-jose）
+- bcrypt 工作池：在线程池/进程池中执行 hash，避免阻塞事件循环
+- bcrypt 轮数校准：按目标耗时选择轮数；登录成功后在后台把旧参数的 hash 升级为当前参数
+- JWT Token 生成和验证（使用 python-jose），Refresh Token 和吊销检查
+- 认证缓存：缓存已解码的 Token 和轻量用户记录，减少每次请求的数据库查询
 - 依赖注入函数：获取当前用户
 """
 
+import asyncio
+import logging
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from passlib.hash import bcrypt
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthCredentials
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from backend.cache import TTLCache
+from backend.config import (
+    PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_TIMEOUT,
+    AUTH_CACHE_TTL, AUTH_CACHE_MAX_ENTRIES, PASSWORD_HASH_ROUNDS, REFRESH_TOKEN_EXPIRE_DAYS
+)
 from backend.database import get_db
+from backend.metrics import Gauge, password_hash_duration, password_hash_queue_wait, registry
+from backend.profiling import timed
 from backend.models import User
-from sqlalchemy.orm import Session
+from backend.queries import user_by_username_query, user_password_rehash_statement
+from backend.token_revocation import revocation_list
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
 
 # ==================== 配置 ====================
 
-# 密码 Hash 配置：使用 bcrypt 算法
+# 密码 Hash 配置：使用 bcrypt 算法，轮数未配置时使用 passlib 默认值
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+if PASSWORD_HASH_ROUNDS > 0:
+    pwd_context.update(bcrypt__rounds=PASSWORD_HASH_ROUNDS)
 
 # JWT 配置
 SECRET_KEY = "your-secret-key-change-this-in-production-env"  # TODO: 改为环境变量
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Token 有效期：30 分钟
+REFRESH_TOKEN_EXPIRE_MINUTES = REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60  # Refresh Token 有效期
 
 # HTTP Bearer 认证
 security = HTTPBearer()
@@ -67,18 +92,328 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    判断 hash 是否需要用当前参数重新计算
+
+    只升级不降级：bcrypt hash 的轮数低于当前配置时才需要重新计算。
+    多个 worker 各自校准出不同轮数时，hash 不会在它们之间来回改写。
+
+    Args:
+        hashed_password: 数据库中保存的密码 hash
+
+    Returns:
+        bool: 是否需要用当前参数重新计算
+    """
+    if not pwd_context.needs_update(hashed_password):
+        return False
+    if pwd_context.identify(hashed_password) != "bcrypt":
+        return True
+    return pwd_context.handler("bcrypt").from_string(hashed_password).rounds < bcrypt_rounds()
+
+
+# ==================== bcrypt 轮数校准 ====================
+
+
+def bcrypt_rounds() -> int:
+    """返回当前用于新 hash 的 bcrypt 轮数"""
+    return pwd_context.handler("bcrypt").default_rounds
+
+
+def configure_bcrypt_rounds(rounds: int) -> None:
+    """
+    设置新 hash 使用的 bcrypt 轮数
+
+    之后 password_needs_rehash 会把轮数更低的 hash 视为需要升级。
+    进程池的子进程在创建时按当时的轮数初始化，因此应在处理请求之前调用。
+
+    Args:
+        rounds: bcrypt 轮数（cost factor），每加 1 耗时翻倍
+    """
+    pwd_context.update(bcrypt__rounds=rounds)
+
+
+def measure_bcrypt_ms(rounds: int, samples: int = 3) -> float:
+    """
+    测量指定轮数下单次验证的耗时
+
+    Args:
+        rounds: bcrypt 轮数
+        samples: 测量次数，取最小值以排除调度抖动
+
+    Returns:
+        float: 单次验证耗时（毫秒）
+    """
+    handler = bcrypt.using(rounds=rounds)
+    hashed = handler.hash("calibration")
+    timings = []
+    for _ in range(max(1, samples)):
+        started = time.perf_counter()
+        handler.verify("calibration", hashed)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int = 10, max_rounds: int = 16) -> Tuple[int, float]:
+    """
+    在当前机器上选择单次验证不超过目标耗时的最大轮数
+
+    先在最小轮数下测量，按每加一轮耗时翻倍推算候选轮数，再实测候选值，
+    超出目标时逐轮下调。结果不会低于 min_rounds，即使它本身已超出目标。
+
+    Args:
+        target_ms: 目标验证耗时（毫秒）
+        min_rounds: 最小轮数（安全下限）
+        max_rounds: 最大轮数
+
+    Returns:
+        Tuple[int, float]: (选定的轮数, 该轮数下实测的验证耗时毫秒数)
+    """
+    base_ms = measure_bcrypt_ms(min_rounds)
+    rounds = min_rounds
+    while rounds < max_rounds and base_ms * 2 ** (rounds + 1 - min_rounds) <= target_ms:
+        rounds += 1
+
+    measured_ms = measure_bcrypt_ms(rounds) if rounds != min_rounds else base_ms
+    while rounds > min_rounds and measured_ms > target_ms:
+        rounds -= 1
+        measured_ms = measure_bcrypt_ms(rounds)
+    return rounds, measured_ms
+
+
+# ==================== bcrypt 工作池 ====================
+
+
+class HashWorkerPool:
+    """
+    bcrypt 工作池
+
+    bcrypt 每次计算约消耗数百毫秒 CPU，直接在 async 路由中调用会阻塞事件循环，
+    使同一 worker 上的其他请求全部停顿。此工作池把计算交给线程池或进程池，
+    并用信号量限制同时执行的任务数；排队超过 queue_timeout 秒的请求返回 503。
+    """
+
+    def __init__(self, executor_kind: str, workers: int, queue_timeout: float):
+        """
+        Args:
+            executor_kind: thread（线程池，bcrypt 计算时会释放 GIL）或 process（进程池）
+            workers: 工作池大小，也是同时执行的最大任务数
+            queue_timeout: 排队等待的最长时间（秒）
+        """
+        if executor_kind not in ("thread", "process"):
+            raise ValueError(f"未知的工作池类型: {executor_kind}")
+        self.executor_kind = executor_kind
+        self.workers = max(1, workers)
+        self.queue_timeout = queue_timeout
+
+        self._executor: Optional[Executor] = None
+        # 信号量与事件循环绑定，按事件循环延迟创建
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # 统计指标
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _get_executor(self) -> Executor:
+        """延迟创建线程池或进程池"""
+        if self._executor is None:
+            if self.executor_kind == "process":
+                # 子进程有自己的 pwd_context，按父进程当前的轮数初始化
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    initializer=configure_bcrypt_rounds, initargs=(bcrypt_rounds(),)
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="bcrypt"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环对应的信号量"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.workers)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, func, *args):
+        """
+        在工作池中执行 func(*args)
+
+        Raises:
+            HTTPException: 排队超时时抛出 503 异常
+        """
+        semaphore = self._get_semaphore()
+        enqueued_at = time.perf_counter()
+
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="服务繁忙，请稍后重试",
+                headers={"Retry-After": str(max(1, round(self.queue_timeout)))},
+            )
+        finally:
+            self.queue_depth -= 1
+
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - enqueued_at
+        password_hash_queue_wait.observe(started_at - enqueued_at)
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            elapsed = time.perf_counter() - started_at
+            self.total_run_seconds += elapsed
+            password_hash_duration.observe(elapsed, getattr(func, "__name__", "other"))
+            semaphore.release()
+
+    def stats(self) -> dict:
+        """返回工作池的统计指标"""
+        return {
+            "executor": self.executor_kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "total_wait_seconds": round(self.total_wait_seconds, 6),
+            "total_run_seconds": round(self.total_run_seconds, 6),
+        }
+
+
+# 全局 bcrypt 工作池
+hash_pool = HashWorkerPool(
+    PASSWORD_HASH_EXECUTOR, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_TIMEOUT
+)
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    在 bcrypt 工作池中对密码进行 Hash 加密
+
+    Args:
+        password: 原始密码
+
+    Returns:
+        str: 加密后的密码 hash
+
+    Raises:
+        HTTPException: 工作池排队超时时抛出 503 异常
+    """
+    return await hash_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    在 bcrypt 工作池中验证密码是否正确
+
+    Args:
+        plain_password: 原始密码
+        hashed_password: 加密后的密码 hash
+
+    Returns:
+        bool: 密码是否匹配
+
+    Raises:
+        HTTPException: 工作池排队超时时抛出 503 异常
+    """
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
+
+# 后台升级 hash 的结果计数
+rehash_counts = {"completed": 0, "skipped": 0, "failed": 0}
+
+# 正在执行的后台升级任务：用户 ID -> 任务（保存强引用，防止任务在完成前被垃圾回收）
+rehash_tasks: Dict[int, asyncio.Task] = {}
+
+
+async def rehash_password(bind, user_id: int, password: str, old_hash: str) -> None:
+    """
+    用当前参数重新计算用户的密码 hash 并保存
+
+    由 schedule_rehash 在登录成功后启动，失败只记录日志。
+    使用独立的会话，只在数据库中仍是 old_hash 时更新，期间密码被修改过则跳过。
+    CurrentUser 缓存不包含 hash，因此不需要使缓存失效。
+
+    Args:
+        bind: 数据库引擎（来自请求会话，测试替换的引擎也能生效）
+        user_id: 用户 ID
+        password: 刚刚验证通过的原始密码
+        old_hash: 验证时读取到的 hash
+    """
+    try:
+        new_hash = await hash_password_async(password)
+        async with AsyncSession(bind) as db:
+            result = await db.execute(user_password_rehash_statement(user_id, old_hash, new_hash))
+            await db.commit()
+        rehash_counts["completed" if result.rowcount else "skipped"] += 1
+    except Exception as e:
+        rehash_counts["failed"] += 1
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"升级用户 {user_id} 的密码 hash 失败: {detail}")
+
+
+def schedule_rehash(bind, user_id: int, password: str, old_hash: str) -> None:
+    """
+    在独立的任务中升级密码 hash
+
+    不使用响应的后台任务：那样会在额外的 bcrypt 计算期间继续占用请求的准入名额。
+    同一用户已有升级任务在执行时不再重复启动。
+
+    Args:
+        bind: 数据库引擎
+        user_id: 用户 ID
+        password: 刚刚验证通过的原始密码
+        old_hash: 验证时读取到的 hash
+    """
+    if user_id in rehash_tasks:
+        return
+    task = asyncio.create_task(rehash_password(bind, user_id, password, old_hash))
+    rehash_tasks[user_id] = task
+    task.add_done_callback(lambda _: rehash_tasks.pop(user_id, None))
+
+
+async def wait_rehash_tasks() -> None:
+    """等待所有正在执行的后台升级任务完成（应用关闭时调用）"""
+    if rehash_tasks:
+        await asyncio.gather(*rehash_tasks.values(), return_exceptions=True)
+
+
+def bcrypt_stats() -> dict:
+    """返回当前 bcrypt 轮数和后台升级 hash 的计数"""
+    return {"rounds": bcrypt_rounds(), "rehashes": dict(rehash_counts)}
+
+
 # ==================== JWT Token 操作函数 ====================
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, token_type: str = "access") -> str:
     """
     生成 JWT Access Token
     
     创建一个包含用户信息的 JWT Token，用于认证后续请求。
+    每个 Token 带有唯一的 jti，用于吊销单个 Token。
     
     Args:
         data: 要编码到 Token 中的数据字典
         expires_delta: Token 过期时间差，默认为 ACCESS_TOKEN_EXPIRE_MINUTES
+        token_type: Token 类型，access 或 refresh
         
     Returns:
         str: JWT Token 字符串
@@ -86,73 +421,274 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode = data.copy()
     
     # 设置过期时间
+    now = datetime.now(timezone.utc)
     if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({
+        "exp": expire,
+        "iat": now.timestamp(),
+        "jti": uuid.uuid4().hex,
+        "type": token_type,
+    })
     
     # 使用 SECRET_KEY 和 ALGORITHM 加密
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def verify_token(token: str) -> dict:
+def create_token_pair(username: str, user_id: int, token_version: int) -> dict:
+    """
+    生成一对 Access Token 和 Refresh Token
+    
+    Args:
+        username: 用户名（Token 的 sub）
+        user_id: 用户 ID（Token 的 uid，按用户吊销时使用）
+        token_version: 用户当前的 Token 版本号（Token 的 ver，修改密码后旧版本失效）
+        
+    Returns:
+        dict: 登录 / 刷新接口返回的 Token 数据
+    """
+    data = {"sub": username, "uid": user_id, "ver": token_version}
+    return {
+        "access_token": create_access_token(data, timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)),
+        "refresh_token": create_access_token(data, timedelta(minutes=REFRESH_TOKEN_EXPIRE_MINUTES), "refresh"),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+def check_token_claims(payload: dict, token_type: str = "access") -> dict:
+    """
+    检查已验证签名的 Token 的类型和吊销状态
+    
+    吊销检查只查询内存中的吊销列表，不访问数据库。
+    没有 type 的旧 Token 视为 Access Token。
+    
+    Args:
+        payload: Token claims
+        token_type: 期望的 Token 类型
+        
+    Returns:
+        dict: 原样返回 payload
+        
+    Raises:
+        HTTPException: 类型不符或已被吊销时抛出 401 异常
+    """
+    if payload.get("type", "access") != token_type:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="无效的 Token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if revocation_list.is_revoked(payload):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token 已失效",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+
+def verify_token(token: str, token_type: str = "access") -> dict:
     """
     验证 JWT Token 并返回其中的数据
     
-    解析和验证 JWT Token，提取其中编码的用户信息。
+    解析和验证 JWT Token，检查类型和吊销状态，提取其中编码的用户信息。
     
     Args:
         token: JWT Token 字符串
+        token_type: 期望的 Token 类型，access 或 refresh
         
     Returns:
         dict: Token 中编码的数据
         
     Raises:
-        HTTPException: Token 无效或已过期时抛出 401 异常
+        HTTPException: Token 无效、已过期或已被吊销时抛出 401 异常
     """
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="无效的 Token",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    return check_token_claims(payload, token_type)
+
+
+# ==================== 认证缓存 ====================
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    当前认证用户的轻量记录
+
+    只包含路由需要的字段，可以安全地跨请求缓存。
+    """
+    id: int
+    username: str
+
+
+# Token -> 已解码的 claims，省去重复的 JWT 解码和签名校验
+token_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL)
+
+# 用户名（Token 的 sub）-> CurrentUser，省去每次请求的用户查询
+principal_cache = TTLCache(maxsize=AUTH_CACHE_MAX_ENTRIES, ttl=AUTH_CACHE_TTL)
+
+
+def invalidate_user(username: str) -> None:
+    """
+    使某个用户的缓存记录失效
+
+    用户被删除或修改密码后调用，下一次请求会重新查询数据库。
+
+    Args:
+        username: 用户名
+    """
+    principal_cache.invalidate(username)
+
+
+@event.listens_for(User, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target):
+    invalidate_user(target.username)
+
+
+@event.listens_for(User, "after_update")
+def _invalidate_updated_user(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.hashed_password.history.has_changes():
+        invalidate_user(target.username)
+    username_history = state.attrs.username.history
+    if username_history.has_changes():
+        for username in username_history.deleted:
+            invalidate_user(username)
+
+
+def auth_cache_stats() -> dict:
+    """返回认证缓存的统计指标"""
+    return {
+        "tokens": token_cache.stats(),
+        "principals": principal_cache.stats(),
+    }
+
+
+# ==================== 监控指标 ====================
+
+registry.register(Gauge(
+    "password_hash_queue_depth", "排队等待 bcrypt 工作池的任务数",
+    lambda: {(): hash_pool.queue_depth}
+))
+registry.register(Gauge(
+    "password_hash_in_flight", "正在执行的 bcrypt 任务数",
+    lambda: {(): hash_pool.in_flight}
+))
+registry.register(Gauge(
+    "password_hash_rejected_total", "排队超时被拒绝（503）的 bcrypt 任务数",
+    lambda: {(): hash_pool.rejected}, kind="counter"
+))
+registry.register(Gauge(
+    "password_hash_rounds", "新密码 hash 使用的 bcrypt 轮数",
+    lambda: {(): bcrypt_rounds()}
+))
+registry.register(Gauge(
+    "password_rehash_total", "登录后在后台升级密码 hash 的结果",
+    lambda: {(result,): count for result, count in rehash_counts.items()},
+    ("result",), kind="counter"
+))
+
+_AUTH_CACHES = {"tokens": token_cache, "principals": principal_cache}
+
+registry.register(Gauge(
+    "auth_cache_entries", "认证缓存当前条目数",
+    lambda: {(name,): len(cache) for name, cache in _AUTH_CACHES.items()}, ("cache",)
+))
+for _field in ("hits", "misses", "evictions", "invalidations"):
+    registry.register(Gauge(
+        f"auth_cache_{_field}_total", f"认证缓存 {_field} 次数",
+        lambda field=_field: {(name,): getattr(cache, field) for name, cache in _AUTH_CACHES.items()},
+        ("cache",), kind="counter"
+    ))
 
 
 # ==================== 依赖注入函数 ====================
 
 
 async def get_current_user(
-    credentials: HTTPAuthCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> CurrentUser:
     """
     依赖注入函数：获取当前认证的用户
     
     从请求的 Authorization header 中提取 Token，
-    验证 Token 并从数据库中获取用户对象。
+    验证 Token 并获取用户记录。
+    已解码的 Token 和用户记录会在进程内缓存 AUTH_CACHE_TTL 秒，
+    缓存命中时不访问数据库。
     
     用于 FastAPI 的依赖注入系统，可直接在路由函数参数中使用。
     
     Args:
         credentials: HTTP Bearer 认证凭证
-        db: 数据库会话
+        db: 异步数据库会话
         
     Returns:
-        User: 当前认证的用户对象
+        CurrentUser: 当前认证的用户记录
         
     Raises:
         HTTPException: Token 无效或用户不存在时抛出异常
     """
-    token = credentials.credentials
+    with timed("auth"):
+        return await authenticate_token(credentials.credentials, db)
+
+
+async def get_token_claims(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    """
+    依赖注入函数：获取当前 Access Token 的 claims
+    
+    登出时用于取得要吊销的 jti；优先使用认证缓存中已解码的结果。
     
-    # 验证 Token
-    payload = verify_token(token)
+    Args:
+        credentials: HTTP Bearer 认证凭证
+        
+    Returns:
+        dict: Token claims
+        
+    Raises:
+        HTTPException: Token 无效、已过期或已被吊销时抛出 401 异常
+    """
+    payload = token_cache.get(credentials.credentials)
+    if payload is None:
+        return verify_token(credentials.credentials)
+    return check_token_claims(payload)
+
+
+async def authenticate_token(token: str, db: AsyncSession) -> CurrentUser:
+    """
+    验证 Token 并返回对应的用户（优先使用缓存）
+    
+    Args:
+        token: JWT Token 字符串
+        db: 异步数据库会话
+        
+    Returns:
+        CurrentUser: Token 对应的用户
+        
+    Raises:
+        HTTPException: Token 无效或用户不存在时抛出异常
+    """
+    # 验证 Token（缓存的条目不会超过 Token 自身的过期时间）
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        expires_in = payload.get("exp", 0) - datetime.now(timezone.utc).timestamp()
+        token_cache.set(token, payload, ttl=expires_in)
+    else:
+        # 缓存之后可能已被吊销，每次都检查（只查内存）
+        check_token_claims(payload)
     username: str = payload.get("sub")
     
     if username is None:
@@ -162,8 +698,12 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    principal = principal_cache.get(username)
+    if principal is not None:
+        return principal
+    
     # 从数据库查找用户
-    user = db.query(User).filter(User.username == username).first()
+    user = (await db.execute(user_by_username_query(username))).scalar_one_or_none()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -171,4 +711,6 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    return user
+    principal = CurrentUser(id=user.id, username=user.username)
+    principal_cache.set(username, principal)
+    return principal
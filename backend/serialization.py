@@ -0,0 +1,193 @@
+# ==================== 序列化模块 ====================
+
+"""
+序列化模块
+把按列查询得到的待办事项行直接转换为响应内容，不经过 ORM 对象
+
+包含：
+- todo_row_to_dict：单行转换为与 Todo.to_dict() 相同结构的字典
+- dumps_json / encode_api_response：把结果直接编码为 JSON 字节，
+  跳过 ORM 对象构建和 ApiResponse 的二次校验
+- encode_ndjson_rows / encode_csv_rows：批量编码为 NDJSON / CSV 文本
+- iter_ndjson_lines：从流式请求体中逐行读取 NDJSON
+"""
+
+import csv
+import io
+import json
+from datetime import date
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, List, Optional, Sequence, Tuple
+
+# orjson 为可选依赖，安装后 JSON 编码更快，未安装时使用标准库 json
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 取决于运行环境
+    orjson = None
+
+# 按列查询待办事项时的列顺序，与 queries.TODO_COLUMNS 一致
+TODO_FIELDS = (
+    "id", "user_id", "text", "completed", "due_date",
+    "created_at", "updated_at", "revision",
+)
+
+# 需要转换为 ISO 格式字符串的字段下标
+_DATE_FIELD_INDEXES = tuple(TODO_FIELDS.index(name) for name in ("due_date", "created_at", "updated_at"))
+
+
+def todo_row_to_dict(row: Sequence) -> dict:
+    """
+    将按 TODO_FIELDS 顺序查询的一行转换为字典
+
+    Args:
+        row: 查询结果行
+
+    Returns:
+        dict: 与 Todo.to_dict() 结构相同的字典
+    """
+    values = list(row)
+    for index in _DATE_FIELD_INDEXES:
+        if values[index] is not None:
+            values[index] = values[index].isoformat()
+    return dict(zip(TODO_FIELDS, values))
+
+
+def todo_rows_to_dicts(rows: Iterable[Sequence]) -> List[dict]:
+    """
+    将多行转换为字典列表，日期时间字段保持原样，由 dumps_json 负责编码
+
+    Args:
+        rows: 按 TODO_FIELDS 顺序查询的结果行
+
+    Returns:
+        List[dict]: 与 Todo.to_dict() 结构相同的字典列表
+    """
+    return [dict(zip(TODO_FIELDS, row)) for row in rows]
+
+
+def _json_default(value: Any) -> str:
+    """标准库 json 无法编码的类型：日期时间转换为 ISO 格式字符串"""
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_json(value: Any) -> bytes:
+    """
+    将对象编码为 JSON 字节
+
+    日期时间编码为 ISO 格式字符串；输出与 FastAPI JSONResponse 一致
+    （不转义非 ASCII 字符，不含多余空格）。
+
+    Args:
+        value: 要编码的对象
+
+    Returns:
+        bytes: UTF-8 编码的 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), default=_json_default
+    ).encode("utf-8")
+
+
+def encode_api_response(data: Any, message: str) -> bytes:
+    """
+    编码成功的 ApiResponse 响应体
+
+    字段和顺序与 ApiResponse 模型相同，但不经过 Pydantic 校验，
+    用于结果已经由查询保证结构的热点接口。
+
+    Args:
+        data: 响应数据
+        message: 响应消息
+
+    Returns:
+        bytes: UTF-8 编码的 JSON
+    """
+    return dumps_json({"success": True, "data": data, "message": message, "error": None})
+
+
+def encode_ndjson_rows(rows: Iterable[Sequence]) -> str:
+    """
+    将一批行编码为 NDJSON（每行一个 JSON 对象）
+
+    Args:
+        rows: 查询结果行
+
+    Returns:
+        str: NDJSON 文本，每条记录以换行结尾
+    """
+    return "".join(
+        json.dumps(todo_row_to_dict(row), ensure_ascii=False) + "\n" for row in rows
+    )
+
+
+def encode_csv_rows(rows: Iterable[Sequence], header: bool = False) -> str:
+    """
+    将一批行编码为 CSV
+
+    Args:
+        rows: 查询结果行
+        header: 是否在开头输出表头
+
+    Returns:
+        str: CSV 文本
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(TODO_FIELDS)
+    for row in rows:
+        record = todo_row_to_dict(row)
+        writer.writerow([record[name] for name in TODO_FIELDS])
+    return buffer.getvalue()
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterable[bytes], max_line_bytes: int
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    从字节流中逐行读取 NDJSON，跳过空行
+
+    超过 max_line_bytes 的行不会被完整缓存，而是丢弃剩余内容直到下一个换行，
+    并以 None 代替该行内容。
+
+    Args:
+        chunks: 字节块流（例如 Request.stream()）
+        max_line_bytes: 单行最大字节数
+
+    Yields:
+        Tuple[int, Optional[bytes]]: (从 1 开始的行号, 行内容或 None)
+    """
+    buffer = b""
+    line_no = 0
+    too_long = False
+    async for chunk in chunks:
+        buffer += chunk
+        # 按偏移量逐行扫描，避免对大块数据反复切片
+        start = 0
+        while True:
+            newline = buffer.find(b"\n", start)
+            if newline < 0:
+                break
+            line_no += 1
+            if too_long or newline - start > max_line_bytes:
+                too_long = False
+                yield line_no, None
+            else:
+                line = buffer[start:newline]
+                if line.strip():
+                    yield line_no, line
+            start = newline + 1
+        buffer = buffer[start:]
+        if len(buffer) > max_line_bytes:
+            # 当前行已经超长，丢弃已缓存的部分，继续读到换行为止
+            too_long = True
+        if too_long:
+            buffer = b""
+
+    if too_long or len(buffer) > max_line_bytes:
+        yield line_no + 1, None
+    elif buffer.strip():
+        yield line_no + 1, buffer
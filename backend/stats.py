@@ -0,0 +1,132 @@
+# ==================== 统计计数器模块 ====================
+
+"""
+统计计数器模块
+维护每个用户待办事项的总数和已完成数
+
+包含：
+- adjust_todo_stats：在修改待办事项的事务中增减计数器
+- completion_delta：更新完成状态时已完成数的增量（SQL 表达式）
+- check_todo_stats / rebuild_todo_stats：一致性检查和重建
+"""
+
+from datetime import date
+from typing import Dict, Iterable, List, Tuple, Union
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from backend.database import upsert_insert
+from backend.models import TodoStats
+from backend.queries import (
+    all_todo_stats_query, todo_completion_change_count, todo_overdue_count_query,
+    todo_stats_actual_query, todo_stats_query, todo_stats_rebuild_statements
+)
+
+# 计数器增量：整数，或在同一语句中计算的 SQL 表达式
+Delta = Union[int, ColumnElement]
+
+
+async def adjust_todo_stats(db: AsyncSession, user_id: int, total: Delta = 0, completed: Delta = 0) -> None:
+    """
+    增减用户的统计计数器
+
+    使用单条 INSERT ... ON CONFLICT DO UPDATE，首次修改时自动创建记录。
+    需要在修改待办事项的同一个事务中调用，随事务一起提交或回滚；
+    两个增量都为 0 时不执行任何语句。
+
+    Args:
+        db: 异步数据库会话
+        user_id: 用户 ID
+        total: 总数的增量
+        completed: 已完成数的增量
+    """
+    if isinstance(total, int) and isinstance(completed, int) and not total and not completed:
+        return
+    stmt = upsert_insert(db, TodoStats).values(user_id=user_id, total=total, completed=completed)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TodoStats.user_id],
+        set_={
+            "total": TodoStats.total + stmt.excluded.total,
+            "completed": TodoStats.completed + stmt.excluded.completed,
+        },
+    )
+    await db.execute(stmt)
+
+
+def completion_delta(user_id: int, changes: Iterable[Tuple[int, bool]]) -> Delta:
+    """
+    计算一组完成状态更新对已完成数的增量
+
+    增量由 UPDATE 之前的行决定，返回的 SQL 表达式需在 UPDATE 之前执行
+    （即先调用 adjust_todo_stats，再执行更新）。
+
+    Args:
+        user_id: 用户 ID
+        changes: (待办事项 ID, 更新后的完成状态) 列表
+
+    Returns:
+        Delta: 没有完成状态更新时为 0，否则为 SQL 表达式
+    """
+    to_completed = [todo_id for todo_id, completed in changes if completed]
+    to_pending = [todo_id for todo_id, completed in changes if not completed]
+    delta = 0
+    if to_completed:
+        delta = todo_completion_change_count(user_id, to_completed, True)
+    if to_pending:
+        delta = delta - todo_completion_change_count(user_id, to_pending, False)
+    return delta
+
+
+async def get_todo_stats(db: AsyncSession, user_id: int, today: date) -> dict:
+    """
+    读取用户的待办事项统计
+
+    Args:
+        db: 异步数据库会话
+        user_id: 用户 ID
+        today: 判断逾期使用的当前日期
+
+    Returns:
+        dict: total、completed、pending、overdue
+    """
+    row = (await db.execute(todo_stats_query(user_id))).first()
+    total, completed = row if row else (0, 0)
+    overdue = (await db.execute(todo_overdue_count_query(user_id, today))).scalar_one()
+    return {
+        "total": total,
+        "completed": completed,
+        "pending": total - completed,
+        "overdue": overdue,
+    }
+
+
+async def check_todo_stats(db: AsyncSession) -> List[dict]:
+    """
+    对比计数器与 todos 的实际统计
+
+    Returns:
+        List[dict]: 不一致的用户，包含 user_id、stored 和 actual；为空表示一致
+    """
+    actual: Dict[int, Tuple[int, int]] = {
+        row.user_id: (row.total, row.completed)
+        for row in await db.execute(todo_stats_actual_query())
+    }
+    stored: Dict[int, Tuple[int, int]] = {
+        row.user_id: (row.total, row.completed)
+        for row in await db.execute(all_todo_stats_query())
+    }
+    mismatches = []
+    for user_id in sorted(set(actual) | set(stored)):
+        expected = actual.get(user_id, (0, 0))
+        current = stored.get(user_id, (0, 0))
+        if expected != current:
+            mismatches.append({"user_id": user_id, "stored": current, "actual": expected})
+    return mismatches
+
+
+async def rebuild_todo_stats(db: AsyncSession) -> None:
+    """从 todos 重新计算全部计数器并提交"""
+    for stmt in todo_stats_rebuild_statements():
+        await db.execute(stmt)
+    await db.commit()
@@ -0,0 +1,302 @@
+# ==================== Token 吊销模块 ====================
+
+"""
+Token 吊销模块
+登出、Refresh Token 轮换和修改密码时吊销 JWT
+
+吊销记录保存在 token_revocations 表中，每个 worker 在内存中保存一份副本：
+- 按 jti 吊销的单个 Token 保存在字典中
+- 按用户吊销的全部 Token 只保存最小有效版本号（Token 的 ver 小于它即无效）；
+  版本号在修改密码时由数据库原子递增，不依赖各服务器的时钟
+验证 Token 时只做字典查找，耗时与吊销记录数量无关，也不查询数据库。
+
+Refresh Token 轮换时以插入吊销记录（jti 唯一）作为唯一的判断步骤：
+插入冲突说明已被使用过，并发重复使用同一个 Refresh Token 只有一次能成功。
+
+本进程的吊销在提交后立即生效；其他 worker 的吊销通过定期按 id 增量同步，
+最迟 TOKEN_REVOCATION_SYNC_INTERVAL 秒后生效。被吊销的 Token 过期后，
+内存中的条目在同步时清理，数据库中的记录每 TOKEN_REVOCATION_PURGE_INTERVAL 秒删除一次。
+"""
+
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.database import upsert_insert
+from backend.metrics import Gauge, registry
+from backend.models import TokenRevocation
+from backend.queries import expired_token_revocations_delete_statement, token_revocations_since_query
+
+# 每次增量同步最多读取的记录数（读满时继续读取下一批）
+SYNC_BATCH_SIZE = 1000
+
+
+def _timestamp(value: datetime) -> float:
+    """把数据库中的时间转换为 Unix 时间戳（SQLite 读出的时间不带时区，按 UTC 处理）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class RevocationList:
+    """
+    内存中的 Token 吊销列表
+
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self):
+        # jti -> 被吊销 Token 的过期时间
+        self._jtis: Dict[str, float] = {}
+        # 用户 ID -> (最小有效版本号, 该用户已签发 Token 最晚的过期时间)
+        self._versions: Dict[int, Tuple[int, float]] = {}
+        # 用户 ID -> (截止签发时间, 过期时间)，旧版本的吊销记录，只对不带 ver 的 Token 生效
+        self._cutoffs: Dict[int, Tuple[float, float]] = {}
+        # 已同步的最大记录 ID
+        self.last_id = 0
+
+        # 统计指标
+        self.syncs = 0
+        self.rejected = 0
+
+    def is_revoked(self, claims: dict) -> bool:
+        """
+        判断 Token 是否已被吊销
+
+        Args:
+            claims: 已验证签名的 Token claims
+
+        Returns:
+            bool: 是否已被吊销
+        """
+        jti = claims.get("jti")
+        if jti is not None and jti in self._jtis:
+            self.rejected += 1
+            return True
+        user_id = claims.get("uid")
+        # 不带 ver 的旧 Token 视为版本 0
+        version = self._versions.get(user_id)
+        if version is not None and claims.get("ver", 0) < version[0]:
+            self.rejected += 1
+            return True
+        cutoff = self._cutoffs.get(user_id)
+        if cutoff is not None and "ver" not in claims and claims.get("iat", 0) <= cutoff[0]:
+            self.rejected += 1
+            return True
+        return False
+
+    def add(
+        self,
+        user_id: int,
+        jti: Optional[str],
+        expires_at: float,
+        token_version: Optional[int] = None,
+        revoked_before: Optional[float] = None
+    ) -> None:
+        """
+        加入一条吊销记录（重复加入没有影响）
+
+        Args:
+            user_id: 用户 ID
+            jti: 单个 Token 的 jti，为 None 表示吊销用户的全部 Token
+            expires_at: 被吊销的 Token 最晚的过期时间
+            token_version: 吊销全部 Token 时的最小有效版本号
+            revoked_before: 旧版本记录的截止签发时间
+        """
+        if jti is not None:
+            self._jtis[jti] = expires_at
+            return
+        if token_version is not None:
+            self._versions[user_id] = self._merge(self._versions.get(user_id), token_version, expires_at)
+        elif revoked_before is not None:
+            self._cutoffs[user_id] = self._merge(self._cutoffs.get(user_id), revoked_before, expires_at)
+
+    @staticmethod
+    def _merge(current: Optional[tuple], value, expires_at: float) -> tuple:
+        """合并同一用户的两条吊销记录，都取较大值"""
+        if current is None:
+            return value, expires_at
+        return max(current[0], value), max(current[1], expires_at)
+
+    async def sync(self, db: AsyncSession) -> int:
+        """
+        从数据库读取上次同步之后新增的吊销记录
+
+        Args:
+            db: 异步数据库会话
+
+        Returns:
+            int: 新读取的记录数
+        """
+        loaded = 0
+        while True:
+            rows = (await db.execute(token_revocations_since_query(self.last_id, SYNC_BATCH_SIZE))).scalars().all()
+            for row in rows:
+                self.add(
+                    row.user_id, row.jti, _timestamp(row.expires_at), row.token_version,
+                    _timestamp(row.revoked_before) if row.revoked_before is not None else None
+                )
+                self.last_id = max(self.last_id, row.id)
+            loaded += len(rows)
+            if len(rows) < SYNC_BATCH_SIZE:
+                break
+        self.syncs += 1
+        self.prune()
+        return loaded
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        删除被吊销的 Token 都已过期的条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        now = time.time() if now is None else now
+        expired_jtis = [jti for jti, expires_at in self._jtis.items() if expires_at < now]
+        for jti in expired_jtis:
+            del self._jtis[jti]
+        removed = len(expired_jtis)
+        for entries in (self._versions, self._cutoffs):
+            expired_users = [user_id for user_id, (_, expires_at) in entries.items() if expires_at < now]
+            for user_id in expired_users:
+                del entries[user_id]
+            removed += len(expired_users)
+        return removed
+
+    def stats(self) -> dict:
+        """返回吊销列表的大小和统计指标"""
+        return {
+            "revoked_tokens": len(self._jtis),
+            "revoked_users": len(self._versions.keys() | self._cutoffs.keys()),
+            "last_id": self.last_id,
+            "syncs": self.syncs,
+            "rejected": self.rejected,
+        }
+
+
+# 全局吊销列表
+revocation_list = RevocationList()
+
+
+def token_revocation(claims: dict) -> dict:
+    """
+    构建吊销单个 Token 的记录
+
+    Args:
+        claims: Token claims（需包含 uid、jti 和 exp）
+
+    Returns:
+        dict: token_revocations 表的一行
+    """
+    return {
+        "user_id": claims["uid"],
+        "jti": claims["jti"],
+        "token_version": None,
+        "expires_at": datetime.fromtimestamp(claims["exp"], timezone.utc),
+    }
+
+
+def user_revocation(user_id: int, token_version: int, expires_at: float) -> dict:
+    """
+    构建吊销用户全部 Token 的记录
+
+    Args:
+        user_id: 用户 ID
+        token_version: 最小有效版本号，ver 小于它的 Token 全部失效
+        expires_at: 此前签发的 Token 最晚的过期时间
+
+    Returns:
+        dict: token_revocations 表的一行
+    """
+    return {
+        "user_id": user_id,
+        "jti": None,
+        "token_version": token_version,
+        "expires_at": datetime.fromtimestamp(expires_at, timezone.utc),
+    }
+
+
+def _apply_locally(row: dict) -> None:
+    """已提交的吊销记录在本进程立即生效"""
+    revocation_list.add(row["user_id"], row["jti"], row["expires_at"].timestamp(), row["token_version"])
+
+
+def _insert_ignoring_duplicates(db: AsyncSession):
+    """构建插入吊销记录的语句，jti 已存在时不插入"""
+    return upsert_insert(db, TokenRevocation).on_conflict_do_nothing(index_elements=[TokenRevocation.jti])
+
+
+async def revoke_tokens(db: AsyncSession, revocations: Iterable[dict]) -> None:
+    """
+    保存吊销记录并提交，提交后立即在本进程生效
+
+    会话中其他未提交的修改（例如新的密码 hash）一并提交。
+    已被吊销的 jti 直接跳过（例如同一个 Token 并发登出两次）。
+
+    Args:
+        db: 异步数据库会话
+        revocations: token_revocation / user_revocation 构建的记录
+    """
+    revocations = list(revocations)
+    if revocations:
+        await db.execute(_insert_ignoring_duplicates(db), revocations)
+    await db.commit()
+    for row in revocations:
+        _apply_locally(row)
+
+
+async def consume_refresh_token(db: AsyncSession, claims: dict) -> bool:
+    """
+    吊销正在轮换的 Refresh Token，并判断它是否是第一次使用
+
+    插入吊销记录是唯一的判断步骤：jti 唯一，插入冲突说明已经被吊销或轮换过，
+    并发使用同一个 Refresh Token 时只有一个请求能插入成功。
+
+    Args:
+        db: 异步数据库会话
+        claims: Refresh Token 的 claims
+
+    Returns:
+        bool: 插入成功（第一次使用）时为 True，已被使用过时为 False
+    """
+    row = token_revocation(claims)
+    result = await db.execute(_insert_ignoring_duplicates(db).values(**row))
+    if result.rowcount == 0:
+        await db.rollback()
+        return False
+    await db.commit()
+    _apply_locally(row)
+    return True
+
+
+async def purge_expired_revocations(db: AsyncSession) -> int:
+    """
+    删除已过期的吊销记录
+
+    Args:
+        db: 异步数据库会话
+
+    Returns:
+        int: 删除的记录数
+    """
+    result = await db.execute(expired_token_revocations_delete_statement(datetime.now(timezone.utc)))
+    await db.commit()
+    return result.rowcount
+
+
+# ==================== 监控指标 ====================
+
+registry.register(Gauge(
+    "token_revocations", "内存中的 Token 吊销条目数",
+    lambda: {
+        ("token",): revocation_list.stats()["revoked_tokens"],
+        ("user",): revocation_list.stats()["revoked_users"],
+    },
+    ("kind",)
+))
+registry.register(Gauge(
+    "token_revocation_rejected_total", "因已被吊销而拒绝的 Token 数",
+    lambda: {(): revocation_list.rejected}, kind="counter"
+))
@@ -0,0 +1,228 @@
+# ==================== 写入合并模块 ====================
+
+"""
+写入合并模块（group commit）
+把短时间内并发到达的写操作合并到一个事务中提交
+
+SQLite 上每次提交都要写 WAL（synchronous=FULL 时还要 fsync），
+并发写入时每条单独提交会让吞吐受限于提交次数。启用后：
+- 写操作进入队列，最早的操作最多等待 WRITE_BATCH_WINDOW_MS 毫秒，
+  或凑满 WRITE_BATCH_MAX_SIZE 个后立即执行
+- 每个操作在独立的 SAVEPOINT 中执行，失败只回滚它自己，其他操作不受影响
+- 整批只提交一次，之后每个调用方各自拿到自己的结果或异常
+
+包含：
+- WriteBatcher：单个引擎的写入合并器
+- run_write：在请求处理函数中执行写操作（未启用时直接在请求会话中执行并提交）
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from backend.config import WRITE_BATCHING_ENABLED, WRITE_BATCH_MAX_SIZE, WRITE_BATCH_WINDOW_MS
+from backend.metrics import Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 写操作：接收数据库会话，在其中执行语句并返回结果（不要提交或回滚）
+Operation = Callable[[AsyncSession], Awaitable[T]]
+
+# 是否启用写入合并（基准测试可在运行时切换）
+enabled = WRITE_BATCHING_ENABLED
+
+
+class WriteBatcher:
+    """
+    单个引擎的写入合并器
+
+    同一时刻只有一个批次在执行，执行期间到达的操作进入下一批。
+    只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self, engine: AsyncEngine, max_batch_size: int = 64, window_ms: float = 2.0):
+        self.engine = engine
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000
+        # 待执行的操作：(操作, Future, 入队时间)
+        self._queue: List[tuple] = []
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.operations = 0
+        self.failed = 0
+        self.largest_batch = 0
+
+    async def submit(self, operation: Operation) -> T:
+        """
+        提交一个写操作，等待所在批次提交后返回它的结果
+
+        Args:
+            operation: 写操作
+
+        Returns:
+            操作的返回值
+
+        Raises:
+            操作抛出的异常，或批次提交失败时的异常
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((operation, future, time.perf_counter()))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        elif len(self._queue) >= self.max_batch_size:
+            self._full.set()
+        return await future
+
+    async def _run(self) -> None:
+        """按批次执行队列中的操作，队列为空时退出"""
+        while self._queue:
+            # 从最早的操作入队开始最多等待一个窗口，凑满一批时提前开始
+            delay = self._queue[0][2] + self.window - time.perf_counter()
+            if delay > 0 and len(self._queue) < self.max_batch_size:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._queue[:self.max_batch_size]
+            del self._queue[:self.max_batch_size]
+            try:
+                await self._apply(batch)
+            except Exception as e:
+                logger.error(f"写入合并批次失败: {str(e)}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _apply(self, batch: List[tuple]) -> None:
+        """在一个事务中执行一批操作并提交"""
+        outcomes = []
+        async with AsyncSession(self.engine, autoflush=False, expire_on_commit=False) as db:
+            conn = await db.connection()
+            if conn.dialect.name == "sqlite":
+                # pysqlite 在第一条 DML 之前才发出 BEGIN；若事务由 SAVEPOINT 开启，
+                # 释放它就会直接提交，因此先显式开始事务
+                await conn.exec_driver_sql("BEGIN")
+
+            for operation, future, _ in batch:
+                # 调用方已取消（例如客户端断开）的操作不再执行
+                if future.done():
+                    continue
+                try:
+                    async with db.begin_nested():
+                        result = await operation(db)
+                    outcomes.append((future, result, None))
+                except Exception as e:
+                    outcomes.append((future, None, e))
+
+            try:
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                outcomes = [(future, None, error or e) for future, _, error in outcomes]
+
+        self.batches += 1
+        self.operations += len(outcomes)
+        self.largest_batch = max(self.largest_batch, len(outcomes))
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is not None:
+                self.failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    @property
+    def pending(self) -> int:
+        """等待执行的操作数"""
+        return len(self._queue)
+
+    async def close(self) -> None:
+        """执行完队列中剩余的操作"""
+        if self._task is not None and not self._task.done():
+            self._full.set()
+            await self._task
+
+
+# 每个引擎一个合并器（get_db 可能被替换为绑定到其他引擎的会话）
+_batchers: Dict[AsyncEngine, WriteBatcher] = {}
+
+
+def get_write_batcher(engine: AsyncEngine) -> WriteBatcher:
+    """返回引擎对应的合并器，不存在时创建"""
+    batcher = _batchers.get(engine)
+    if batcher is None:
+        batcher = _batchers[engine] = WriteBatcher(engine, WRITE_BATCH_MAX_SIZE, WRITE_BATCH_WINDOW_MS)
+    return batcher
+
+
+async def run_write(db: AsyncSession, operation: Operation) -> T:
+    """
+    执行一个写操作并提交
+
+    未启用写入合并时，在请求会话中执行并立即提交，失败时回滚；
+    启用时先释放请求会话占用的连接，再交给合并器与其他并发写操作一起提交。
+
+    Args:
+        db: 请求的数据库会话
+        operation: 写操作
+
+    Returns:
+        操作的返回值（已提交）
+    """
+    if not enabled:
+        try:
+            result = await operation(db)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return result
+
+    # 等待批次期间不占用连接池中的连接
+    engine = db.bind
+    await db.close()
+    return await get_write_batcher(engine).submit(operation)
+
+
+async def close_write_batchers() -> None:
+    """应用关闭时执行完所有合并器中剩余的操作"""
+    for batcher in list(_batchers.values()):
+        await batcher.close()
+
+
+def write_batching_stats() -> dict:
+    """返回写入合并的配置和统计（多个引擎时合计）"""
+    batchers = list(_batchers.values())
+    batches = sum(batcher.batches for batcher in batchers)
+    operations = sum(batcher.operations for batcher in batchers)
+    return {
+        "enabled": enabled,
+        "max_batch_size": WRITE_BATCH_MAX_SIZE,
+        "window_ms": WRITE_BATCH_WINDOW_MS,
+        "batches": batches,
+        "operations": operations,
+        "failed": sum(batcher.failed for batcher in batchers),
+        "pending": sum(batcher.pending for batcher in batchers),
+        "average_batch": round(operations / batches, 2) if batches else 0,
+        "largest_batch": max((batcher.largest_batch for batcher in batchers), default=0),
+    }
+
+
+# ==================== 监控指标 ====================
+
+registry.register(Gauge(
+    "write_batches_total", "写入合并提交的批次数",
+    lambda: {(): write_batching_stats()["batches"]}, kind="counter"
+))
+registry.register(Gauge(
+    "write_batch_operations_total", "写入合并执行的操作数",
+    lambda: {(): write_batching_stats()["operations"]}, kind="counter"
+))
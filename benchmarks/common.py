@@ -0,0 +1,140 @@
+# ==================== 基准测试公共工具 ====================
+
+"""
+基准测试公共工具
+
+包含：
+- 临时数据库：基准测试使用独立的 SQLite 文件，不影响 todos.db
+- 进程内 HTTP 客户端：通过 ASGI 直接调用 backend.main:app（需要 httpx）
+- 本地 uvicorn 服务：在当前事件循环中启动真实的 HTTP 服务（需要 uvicorn）
+- SQL 计数：统计引擎执行的语句数量
+- 延迟统计：百分位数计算
+"""
+
+import asyncio
+import os
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+
+from backend.config import SQLITE_PRAGMAS
+from backend.database import build_engine, create_schema, get_db
+from backend.main import app
+
+
+@asynccontextmanager
+async def temp_database():
+    """
+    创建临时 SQLite 数据库，并让应用的 get_db 依赖使用它
+
+    Yields:
+        async_sessionmaker: 绑定到临时数据库的会话工厂
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = build_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}", SQLITE_PRAGMAS)
+        async with engine.begin() as conn:
+            await conn.run_sync(create_schema)
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async def override_get_db():
+            async with session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            yield session_factory
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            await engine.dispose()
+
+
+def make_client(base_url: Optional[str] = None, max_connections: int = 100) -> httpx.AsyncClient:
+    """
+    创建异步 HTTP 客户端
+
+    Args:
+        base_url: 服务地址；为 None 时通过 ASGI 直接调用应用
+        max_connections: 最大连接数（仅对真实 HTTP 有效）
+    """
+    if base_url is None:
+        return httpx.AsyncClient(app=app, base_url="http://bench")
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0)
+
+
+@asynccontextmanager
+async def local_server(host: str = "127.0.0.1"):
+    """
+    在当前事件循环中启动 uvicorn，监听随机端口
+
+    关闭了 lifespan，启动事件（初始化 todos.db、后台任务）不会执行，
+    应配合 temp_database() 使用。
+
+    Yields:
+        str: 服务地址，例如 http://127.0.0.1:54321
+    """
+    import uvicorn
+
+    config = uvicorn.Config(app, host=host, port=0, log_level="warning", lifespan="off", access_log=False)
+    server = uvicorn.Server(config)
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.should_exit = True
+        await task
+
+
+class QueryCounter:
+    """统计引擎执行的 SQL 语句数量（executemany 计为一条）"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+@contextmanager
+def count_queries(engine: AsyncEngine):
+    """
+    在上下文内统计引擎执行的 SQL 语句数量
+
+    Yields:
+        QueryCounter: 计数器，count 为已执行的语句数
+    """
+    counter = QueryCounter()
+    event.listen(engine.sync_engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", counter)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """计算样本的百分位数（最近秩法）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """汇总延迟样本（单位：毫秒）"""
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+    }
@@ -0,0 +1,88 @@
+# ==================== 并发写入基准测试 ====================
+
+"""
+并发写入基准测试
+
+多个协程同时插入待办事项（每条单独提交），对比两种引擎配置的写入吞吐：
+- default：调优前的配置（aiosqlite 默认的 NullPool，journal_mode=DELETE，synchronous=FULL）
+- tuned：backend.database.build_engine 按环境变量配置（连接池 + WAL 等 PRAGMA）
+
+用法：
+    python -m benchmarks.concurrent_writes --writers 16 --inserts 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.config import SQLITE_PRAGMAS
+from backend.database import build_engine, create_schema, to_async_url
+from backend.models import Todo, User
+from benchmarks.common import summarize
+
+
+async def writer(session_factory, user_id: int, inserts: int, latencies: list):
+    """逐条插入并提交待办事项"""
+    for i in range(inserts):
+        started = time.perf_counter()
+        async with session_factory() as db:
+            db.add(Todo(user_id=user_id, text=f"todo {i}", completed=False))
+            await db.commit()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_config(name: str, writers: int, inserts: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        url = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+        if name == "default":
+            engine = create_async_engine(to_async_url(url))
+        else:
+            engine = build_engine(url, SQLITE_PRAGMAS)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(create_schema)
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async with session_factory() as db:
+            user = User(username="writer", hashed_password="x")
+            db.add(user)
+            await db.commit()
+
+        latencies = []
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            writer(session_factory, user.id, inserts, latencies) for _ in range(writers)
+        ])
+        elapsed = time.perf_counter() - started
+        await engine.dispose()
+
+    total = writers * inserts
+    return {
+        "config": name,
+        "inserts": total,
+        "seconds": round(elapsed, 3),
+        "inserts_per_second": round(total / elapsed, 1),
+        "commit_latency": summarize(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=16, help="并发写入协程数")
+    parser.add_argument("--inserts", type=int, default=100, help="每个协程插入的条数")
+    args = parser.parse_args()
+
+    results = [
+        asyncio.run(run_config(name, args.writers, args.inserts))
+        for name in ("default", "tuned")
+    ]
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# ==================== 登录风暴基准测试 ====================
+
+"""
+登录风暴基准测试
+
+在一批并发登录（每次登录执行一次 bcrypt）进行的同时，
+持续请求 GET /api/todos，对比登录风暴前后该端点的延迟。
+bcrypt 在工作池中执行时，其他端点的延迟应基本保持不变。
+
+用法：
+    python -m benchmarks.login_burst --logins 50
+    python -m benchmarks.login_burst --logins 50 --inline   # 对照组：在事件循环上直接执行 bcrypt
+    python -m benchmarks.login_burst --logins 50 --throttle # 开启登录限流，超出的请求直接返回 429
+    python -m benchmarks.login_burst --logins 50 --admission # 开启准入控制，排不上的登录直接返回 503
+
+默认关闭登录限流（所有请求来自同一 IP、同一用户名）和准入控制，以测量 bcrypt 工作池本身的效果。
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from backend import admission, rate_limit, security
+from benchmarks.common import make_client, summarize, temp_database
+
+
+async def probe(client, headers, stop: asyncio.Event, samples: list):
+    """持续请求列表端点并记录延迟，直到 stop 被设置"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/api/todos", headers=headers)
+        response.raise_for_status()
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+
+
+async def run(logins: int, baseline_seconds: float) -> dict:
+    async with temp_database(), make_client() as client:
+        await client.post("/api/users", json={"username": "probe", "password": "probe-pass"})
+        await client.post("/api/users", json={"username": "burst", "password": "burst-pass"})
+        response = await client.post("/api/token", params={"username": "probe", "password": "probe-pass"})
+        headers = {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
+
+        # 基线：没有登录请求时的列表延迟
+        baseline = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, headers, stop, baseline))
+        await asyncio.sleep(baseline_seconds)
+        stop.set()
+        await task
+
+        # 登录风暴期间的列表延迟
+        during = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, headers, stop, during))
+        started = time.perf_counter()
+        results = await asyncio.gather(*[
+            client.post("/api/token", params={"username": "burst", "password": "burst-pass"})
+            for _ in range(logins)
+        ])
+        burst_seconds = time.perf_counter() - started
+        stop.set()
+        await task
+
+    return {
+        "logins": logins,
+        "login_status": {str(code): sum(1 for r in results if r.status_code == code)
+                         for code in sorted({r.status_code for r in results})},
+        "burst_seconds": round(burst_seconds, 3),
+        "list_latency_baseline": summarize(baseline),
+        "list_latency_during_burst": summarize(during),
+        "hash_pool": security.hash_pool.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=50, help="并发登录次数")
+    parser.add_argument("--baseline-seconds", type=float, default=2.0, help="基线采样时长（秒）")
+    parser.add_argument("--inline", action="store_true", help="在事件循环上直接执行 bcrypt（旧行为）")
+    parser.add_argument("--throttle", action="store_true", help="保持登录限流开启")
+    parser.add_argument("--admission", action="store_true", help="保持准入控制开启")
+    args = parser.parse_args()
+
+    rate_limit.login_throttle.enabled = args.throttle
+    admission.admission_controller.enabled = args.admission
+
+    if args.inline:
+        async def run_inline(func, *func_args):
+            return func(*func_args)
+        security.hash_pool.run = run_inline
+
+    result = asyncio.run(run(args.logins, args.baseline_seconds))
+    result["mode"] = "inline" if args.inline else security.hash_pool.executor_kind
+    result["login_throttle"] = rate_limit.login_throttle.stats()
+    result["admission"] = admission.admission_controller.stats()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# ==================== 列表序列化基准测试 ====================
+
+"""
+列表序列化基准测试
+
+对比待办事项列表的两种读取 + 序列化路径（不含 HTTP 开销）：
+- orm：查询 ORM 对象，Todo.to_dict()，构建 ApiResponse，
+  再按 FastAPI 处理 response_model 的方式校验一次并编码为 JSON
+- fast：按列查询元组，直接用 serialization.encode_api_response 编码为 JSON 字节
+- fast-json：同 fast，但强制使用标准库 json（未安装 orjson 时的表现）
+
+用法：
+    python -m benchmarks.serialization --rows 1000 10000 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend import serialization
+from backend.config import SQLITE_PRAGMAS
+from backend.database import build_engine, create_schema
+from backend.models import Todo, User
+from backend.queries import TODO_COLUMNS
+from backend.schemas import ApiResponse
+
+
+async def orm_path(db, user_id: int, rows: int) -> bytes:
+    """调整前的路径：ORM 对象 -> to_dict -> ApiResponse -> 校验 -> JSONResponse"""
+    todos = (await db.execute(
+        select(Todo).where(Todo.user_id == user_id).order_by(Todo.id.desc()).limit(rows)
+    )).scalars().all()
+    result = ApiResponse(
+        success=True,
+        data={"items": [todo.to_dict() for todo in todos], "next_cursor": None},
+        message="获取待办事项成功"
+    )
+    validated = ApiResponse.model_validate(result.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+async def fast_path(db, user_id: int, rows: int) -> bytes:
+    """按列查询元组并直接编码为 JSON 字节"""
+    result = (await db.execute(
+        select(*TODO_COLUMNS).where(Todo.user_id == user_id).order_by(Todo.id.desc()).limit(rows)
+    )).all()
+    return serialization.encode_api_response(
+        {"items": serialization.todo_rows_to_dicts(result), "next_cursor": None},
+        "获取待办事项成功"
+    )
+
+
+async def run(row_counts: list, repeat: int) -> list:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = build_engine(f"sqlite:///{os.path.join(tmpdir, 'bench.db')}", SQLITE_PRAGMAS)
+        async with engine.begin() as conn:
+            await conn.run_sync(create_schema)
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async with session_factory() as db:
+            user = User(username="reader", hashed_password="x")
+            db.add(user)
+            await db.flush()
+            await db.execute(insert(Todo.__table__), [
+                {"user_id": user.id, "text": f"todo {i}", "completed": i % 3 == 0,
+                 "due_date": None, "revision": 1}
+                for i in range(max(row_counts))
+            ])
+            await db.commit()
+
+        orjson = serialization.orjson
+        paths = [("orm", orm_path, orjson), ("fast", fast_path, orjson), ("fast-json", fast_path, None)]
+        results = []
+        for rows in row_counts:
+            for name, path, encoder in paths:
+                if name == "fast" and encoder is None:
+                    continue
+                serialization.orjson = encoder
+                timings = []
+                for _ in range(repeat):
+                    async with session_factory() as db:
+                        started = time.perf_counter()
+                        body = await path(db, user.id, rows)
+                        timings.append(time.perf_counter() - started)
+                results.append({
+                    "rows": rows,
+                    "path": name,
+                    "median_ms": round(statistics.median(timings) * 1000, 2),
+                    "min_ms": round(min(timings) * 1000, 2),
+                    "bytes": len(body),
+                })
+        serialization.orjson = orjson
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000], help="每次读取的行数")
+    parser.add_argument("--repeat", type=int, default=5, help="每种路径重复次数")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.rows, args.repeat))
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+# ==================== API 基准测试套件 ====================
+
+"""
+API 基准测试套件
+
+在临时数据库上预置数据，按场景并发请求 backend.main:app，
+报告吞吐、p50/p95/p99 延迟和每个请求的 SQL 语句数，结果可保存为 JSON，
+并与之前的结果对比，超过阈值的退化以非零状态码退出（可接入 CI）。
+
+场景：
+- auth_storm：并发注册和登录（每次一次 bcrypt）
+- list_reads：多用户分页读取列表，部分请求带 If-None-Match
+- mixed_crud：列表、创建、更新、删除、批量操作混合
+- big_user：单个用户拥有大量待办事项（默认 10 万条）时的分页、过滤、增量同步和导出
+
+传输方式：
+- asgi：通过 httpx ASGI 传输在进程内调用应用，没有网络开销
+- uvicorn：在本进程内启动 uvicorn，经本地回环 HTTP 请求
+
+用法：
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --transport uvicorn --scenarios list_reads mixed_crud
+    python -m benchmarks.suite --compare results.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import sqlite3
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+from sqlalchemy import insert, select
+
+from backend.models import Todo, User
+from backend.rate_limit import login_throttle
+from backend.security import create_access_token, hash_password
+from benchmarks.common import count_queries, local_server, make_client, summarize, temp_database
+
+# 预置用户统一使用的密码（只计算一次 bcrypt）
+SEED_PASSWORD = "bench-pass"
+
+
+# ==================== 请求记录 ====================
+
+
+class Recorder:
+    """记录一个场景中每个请求的延迟、状态码和失败次数，按标签分组"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Counter = Counter()
+        self.errors = 0
+
+    async def request(self, client, label: str, method: str, url: str, **kwargs):
+        """发送请求并记录结果；状态码 >= 400 或 success=false 计为失败"""
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.samples[label].append(time.perf_counter() - started)
+        self.statuses[response.status_code] += 1
+        if response.status_code >= 400:
+            self.errors += 1
+        elif response.headers.get("content-type", "").startswith("application/json"):
+            if response.json().get("success") is False:
+                self.errors += 1
+        return response
+
+    @property
+    def requests(self) -> int:
+        return sum(len(samples) for samples in self.samples.values())
+
+    def report(self, seconds: float, queries: int) -> dict:
+        """汇总为场景结果"""
+        all_samples = [sample for samples in self.samples.values() for sample in samples]
+        requests = len(all_samples)
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "seconds": round(seconds, 3),
+            "throughput_rps": round(requests / seconds, 1) if seconds else 0.0,
+            "latency": summarize(all_samples),
+            "queries": queries,
+            "queries_per_request": round(queries / requests, 2) if requests else 0.0,
+            "status": {str(code): count for code, count in sorted(self.statuses.items())},
+            "endpoints": {label: summarize(samples) for label, samples in sorted(self.samples.items())},
+        }
+
+
+async def run_workers(concurrency: int, total: int, work: Callable):
+    """启动 concurrency 个协程，共执行 total 次 work(worker_index)"""
+    remaining = total
+
+    async def worker(index: int):
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await work(index)
+
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+
+
+# ==================== 数据预置 ====================
+
+
+async def seed_users(session_factory, prefix: str, users: int, todos_per_user: int,
+                     hashed_password: str) -> List[dict]:
+    """
+    直接写数据库预置用户和待办事项（不经过 API，不计入结果）
+
+    Returns:
+        List[dict]: 每个用户的 id、username、请求头和待办事项 ID 列表
+    """
+    today = date.today()
+    async with session_factory() as db:
+        result = await db.execute(
+            insert(User.__table__).returning(User.id, User.username, sort_by_parameter_order=True),
+            [{"username": f"{prefix}{i}", "hashed_password": hashed_password} for i in range(users)]
+        )
+        accounts = [{"id": row.id, "username": row.username, "todo_ids": []} for row in result]
+
+        chunk = []
+        for account in accounts:
+            for i in range(todos_per_user):
+                chunk.append({
+                    "user_id": account["id"],
+                    "text": f"todo {i}",
+                    "completed": i % 3 == 0,
+                    "due_date": today + timedelta(days=i % 60 - 30) if i % 2 else None,
+                    "revision": 0,
+                })
+                if len(chunk) >= 5000:
+                    await db.execute(insert(Todo.__table__), chunk)
+                    chunk = []
+        if chunk:
+            await db.execute(insert(Todo.__table__), chunk)
+        await db.commit()
+
+        for account in accounts:
+            ids = (await db.execute(
+                select(Todo.id).where(Todo.user_id == account["id"])
+            )).scalars().all()
+            account["todo_ids"] = list(ids)
+            token = create_access_token({"sub": account["username"]})
+            account["headers"] = {"Authorization": f"Bearer {token}"}
+    return accounts
+
+
+# ==================== 场景 ====================
+
+
+async def scenario_auth_storm(client, ctx: dict, args) -> Recorder:
+    """并发注册 auth_users 个新用户，再并发登录同样次数"""
+    recorder = Recorder()
+    usernames = [f"storm{i}" for i in range(args.auth_users)]
+    await asyncio.gather(*[
+        recorder.request(client, "register", "POST", "/api/users",
+                         json={"username": name, "password": SEED_PASSWORD})
+        for name in usernames
+    ])
+    await asyncio.gather(*[
+        recorder.request(client, "login", "POST", "/api/token",
+                         params={"username": name, "password": SEED_PASSWORD})
+        for name in usernames
+    ])
+    return recorder
+
+
+async def scenario_list_reads(client, ctx: dict, args) -> Recorder:
+    """随机用户分页读取列表（最多 3 页），约一半请求带上次的 ETag"""
+    recorder = Recorder()
+    accounts = ctx["accounts"]
+    etags: Dict[int, str] = {}
+    rng = random.Random(1)
+
+    async def work(_):
+        account = rng.choice(accounts)
+        headers = dict(account["headers"])
+        if account["id"] in etags and rng.random() < 0.5:
+            headers["If-None-Match"] = etags[account["id"]]
+        params = {"limit": 50}
+        if rng.random() < 0.3:
+            params["completed"] = "false"
+        response = await recorder.request(client, "list", "GET", "/api/todos", params=params, headers=headers)
+        if response.status_code != 200:
+            return
+        etags[account["id"]] = response.headers.get("etag")
+        cursor = response.json()["data"]["next_cursor"]
+        for _ in range(2):
+            if not cursor:
+                break
+            response = await recorder.request(
+                client, "list_next_page", "GET", "/api/todos",
+                params={**params, "cursor": cursor}, headers=account["headers"]
+            )
+            cursor = response.json()["data"]["next_cursor"]
+
+    await run_workers(args.concurrency, args.requests, work)
+    return recorder
+
+
+async def scenario_mixed_crud(client, ctx: dict, args) -> Recorder:
+    """列表 40%、创建 25%、更新 20%、删除 10%、批量 5%"""
+    recorder = Recorder()
+    accounts = ctx["accounts"]
+    rng = random.Random(2)
+
+    async def work(_):
+        account = rng.choice(accounts)
+        headers = account["headers"]
+        ids = account["todo_ids"]
+        roll = rng.random()
+        if roll < 0.40 or not ids:
+            await recorder.request(client, "list", "GET", "/api/todos", headers=headers)
+        elif roll < 0.65:
+            response = await recorder.request(client, "create", "POST", "/api/todos",
+                                              json={"text": "bench todo"}, headers=headers)
+            if response.status_code < 400 and response.json()["success"]:
+                ids.append(response.json()["data"]["id"])
+        elif roll < 0.85:
+            await recorder.request(client, "update", "PUT", f"/api/todos/{rng.choice(ids)}",
+                                   json={"completed": rng.random() < 0.5}, headers=headers)
+        elif roll < 0.95:
+            todo_id = ids.pop(rng.randrange(len(ids)))
+            await recorder.request(client, "delete", "DELETE", f"/api/todos/{todo_id}", headers=headers)
+        else:
+            operations = [{"op": "create", "text": f"batch {i}"} for i in range(5)]
+            operations += [{"op": "update", "id": todo_id, "completed": True}
+                           for todo_id in rng.sample(ids, min(5, len(ids)))]
+            response = await recorder.request(client, "batch", "POST", "/api/todos/batch",
+                                              json={"operations": operations}, headers=headers)
+            if response.status_code < 400 and response.json()["success"]:
+                ids.extend(result["data"]["id"] for result in response.json()["data"]["results"]
+                           if result["op"] == "create" and result["success"])
+
+    await run_workers(args.concurrency, args.requests, work)
+    return recorder
+
+
+async def scenario_big_user(client, ctx: dict, args) -> Recorder:
+    """单个用户拥有 big_user_todos 条待办事项：深翻页、过滤、增量同步、导出"""
+    recorder = Recorder()
+    account = ctx["big_user"]
+    headers = account["headers"]
+    rng = random.Random(3)
+
+    async def work(_):
+        roll = rng.random()
+        if roll < 0.4:
+            # 从第一页开始连续翻 10 页
+            cursor = None
+            for _ in range(10):
+                params = {"limit": 100}
+                if cursor:
+                    params["cursor"] = cursor
+                response = await recorder.request(client, "page_walk", "GET", "/api/todos",
+                                                  params=params, headers=headers)
+                cursor = response.json()["data"]["next_cursor"]
+                if not cursor:
+                    break
+        elif roll < 0.6:
+            await recorder.request(client, "overdue", "GET", "/api/todos",
+                                   params={"overdue": "true"}, headers=headers)
+        elif roll < 0.8:
+            await recorder.request(client, "completed", "GET", "/api/todos",
+                                   params={"completed": "true", "limit": 200}, headers=headers)
+        else:
+            await recorder.request(client, "changes", "GET", "/api/todos/changes",
+                                   params={"since": 0}, headers=headers)
+
+    await run_workers(args.concurrency, args.requests, work)
+
+    # 全量导出一次
+    await recorder.request(client, "export", "GET", "/api/todos/export", headers=headers)
+    return recorder
+
+
+SCENARIOS = {
+    "auth_storm": scenario_auth_storm,
+    "list_reads": scenario_list_reads,
+    "mixed_crud": scenario_mixed_crud,
+    "big_user": scenario_big_user,
+}
+
+
+# ==================== 执行与对比 ====================
+
+
+async def run_suite(args) -> dict:
+    """预置数据并依次执行选中的场景"""
+    hashed_password = hash_password(SEED_PASSWORD)
+    results = {}
+
+    async with temp_database() as session_factory:
+        engine = session_factory.kw["bind"]
+        ctx = {"accounts": await seed_users(session_factory, "user", args.users,
+                                            args.todos_per_user, hashed_password)}
+        if "big_user" in args.scenarios:
+            ctx["big_user"] = (await seed_users(session_factory, "big", 1,
+                                                args.big_user_todos, hashed_password))[0]
+
+        async def run_scenarios(base_url):
+            async with make_client(base_url, args.concurrency) as client:
+                for name in args.scenarios:
+                    with count_queries(engine) as counter:
+                        started = time.perf_counter()
+                        recorder = await SCENARIOS[name](client, ctx, args)
+                        seconds = time.perf_counter() - started
+                    results[name] = recorder.report(seconds, counter.count)
+                    print(f"{name}: {results[name]['throughput_rps']} req/s, "
+                          f"p95 {results[name]['latency']['p95_ms']} ms, "
+                          f"{results[name]['queries_per_request']} queries/req, "
+                          f"{results[name]['errors']} errors", file=sys.stderr)
+
+        if args.transport == "uvicorn":
+            async with local_server() as base_url:
+                await run_scenarios(base_url)
+        else:
+            await run_scenarios(None)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "transport": args.transport,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "settings": {
+                "concurrency": args.concurrency,
+                "requests": args.requests,
+                "users": args.users,
+                "todos_per_user": args.todos_per_user,
+                "big_user_todos": args.big_user_todos,
+                "auth_users": args.auth_users,
+            },
+        },
+        "scenarios": results,
+    }
+
+
+def find_regressions(baseline: dict, current: dict, max_regression: float) -> List[str]:
+    """
+    对比两次结果，找出超过阈值的退化
+
+    吞吐下降、p95 延迟上升或每请求 SQL 数上升超过 max_regression（比例）时视为退化；
+    只对比两次结果中都存在的场景。
+
+    Returns:
+        List[str]: 退化说明，为空表示没有退化
+    """
+    problems = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        checks = [
+            ("throughput_rps", before["throughput_rps"], now["throughput_rps"], False),
+            ("p95_ms", before["latency"]["p95_ms"], now["latency"]["p95_ms"], True),
+            ("queries_per_request", before["queries_per_request"], now["queries_per_request"], True),
+        ]
+        for metric, old, new, higher_is_worse in checks:
+            if not old:
+                continue
+            change = (new - old) / old
+            if (change > max_regression) if higher_is_worse else (-change > max_regression):
+                problems.append(f"{name}.{metric}: {old} -> {new} ({change:+.1%})")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--transport", choices=["asgi", "uvicorn"], default="asgi", help="请求方式")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help="要执行的场景")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发协程数")
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的迭代次数")
+    parser.add_argument("--users", type=int, default=50, help="预置用户数")
+    parser.add_argument("--todos-per-user", type=int, default=200, help="每个预置用户的待办事项数")
+    parser.add_argument("--big-user-todos", type=int, default=100000, help="big_user 场景的待办事项数")
+    parser.add_argument("--auth-users", type=int, default=10, help="auth_storm 场景注册和登录的用户数")
+    parser.add_argument("--output", help="保存结果的 JSON 文件")
+    parser.add_argument("--compare", help="作为基线对比的结果 JSON 文件")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="允许的最大退化比例")
+    args = parser.parse_args()
+
+    # 逐请求的日志会显著影响结果，只保留警告以上
+    for name in ("httpx", "backend.main"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    # auth_storm 从同一 IP 并发注册和登录，关闭登录限流以测量 bcrypt 本身的吞吐
+    login_throttle.enabled = False
+
+    result = asyncio.run(run_suite(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("settings") != result["meta"]["settings"] or \
+                baseline.get("meta", {}).get("transport") != result["meta"]["transport"]:
+            print("注意：基线的传输方式或数据规模与本次不同，对比结果仅供参考", file=sys.stderr)
+        problems = find_regressions(baseline, result, args.max_regression)
+        for problem in problems:
+            print(f"[REGRESSION] {problem}", file=sys.stderr)
+        if problems:
+            return 1
+        print("没有超过阈值的退化", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
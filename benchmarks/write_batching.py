@@ -0,0 +1,113 @@
+# ==================== 写入合并基准测试 ====================
+
+"""
+写入合并基准测试
+
+多个客户端并发调用 POST /api/todos（以及可选的 PUT），
+对比关闭和开启写入合并（WRITE_BATCHING_ENABLED）时的吞吐和延迟。
+开启时每个请求增加的延迟不超过 WRITE_BATCH_WINDOW_MS 加上所在批次的执行时间，
+结果中同时给出平均批次大小。
+
+用法：
+    python -m benchmarks.write_batching --concurrency 32 --requests 2000
+    python -m benchmarks.write_batching --synchronous FULL --window-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from backend import write_batcher
+from backend.config import SQLITE_PRAGMAS
+from benchmarks.common import make_client, summarize, temp_database
+
+
+async def register(client) -> dict:
+    """注册并登录基准测试用户，返回认证请求头"""
+    await client.post("/api/users", json={"username": "writer", "password": "secret1"})
+    response = await client.post("/api/token", params={"username": "writer", "password": "secret1"})
+    return {"Authorization": f"Bearer {response.json()['data']['access_token']}"}
+
+
+async def run_mode(batching: bool, concurrency: int, requests: int, update_ratio: float) -> dict:
+    """在新的临时数据库上执行一轮并发写入"""
+    write_batcher.enabled = batching
+    write_batcher._batchers.clear()
+    async with temp_database():
+        async with make_client() as client:
+            headers = await register(client)
+            # 先创建一批供更新的待办事项
+            seed = [(await client.post("/api/todos", json={"text": "seed"}, headers=headers)).json()
+                    for _ in range(concurrency)]
+            seed_ids = [item["data"]["id"] for item in seed]
+
+            latencies, errors = [], 0
+            remaining = iter(range(requests))
+
+            async def worker(worker_id: int):
+                nonlocal errors
+                for i in remaining:
+                    started = time.perf_counter()
+                    if i % 100 < update_ratio * 100:
+                        response = await client.put(
+                            f"/api/todos/{seed_ids[worker_id]}",
+                            json={"text": f"update {i}", "completed": i % 2 == 0}, headers=headers
+                        )
+                    else:
+                        response = await client.post("/api/todos", json={"text": f"todo {i}"}, headers=headers)
+                    latencies.append(time.perf_counter() - started)
+                    if not response.json().get("success"):
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*[worker(n) for n in range(concurrency)])
+            elapsed = time.perf_counter() - started
+
+    stats = write_batcher.write_batching_stats()
+    return {
+        "mode": "batched" if batching else "per-request commit",
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "latency": summarize(latencies),
+        "batches": stats["batches"] if batching else requests,
+        "average_batch": stats["average_batch"] if batching else 1,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=32, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=2000, help="总请求数")
+    parser.add_argument("--update-ratio", type=float, default=0.25, help="更新请求所占比例")
+    parser.add_argument("--window-ms", type=float, default=None, help="覆盖 WRITE_BATCH_WINDOW_MS")
+    parser.add_argument("--max-batch", type=int, default=None, help="覆盖 WRITE_BATCH_MAX_SIZE")
+    parser.add_argument("--synchronous", default=None, help="覆盖 SQLite synchronous（如 FULL）")
+    args = parser.parse_args()
+
+    for name in ("httpx", "backend.main"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    if args.window_ms is not None:
+        write_batcher.WRITE_BATCH_WINDOW_MS = args.window_ms
+    if args.max_batch is not None:
+        write_batcher.WRITE_BATCH_MAX_SIZE = args.max_batch
+    if args.synchronous is not None:
+        SQLITE_PRAGMAS["synchronous"] = args.synchronous
+
+    results = [
+        asyncio.run(run_mode(batching, args.concurrency, args.requests, args.update_ratio))
+        for batching in (False, True)
+    ]
+    print(json.dumps({
+        "window_ms": write_batcher.WRITE_BATCH_WINDOW_MS,
+        "max_batch_size": write_batcher.WRITE_BATCH_MAX_SIZE,
+        "synchronous": SQLITE_PRAGMAS["synchronous"],
+        "results": results,
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
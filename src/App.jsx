@@ -46,17 +46,25 @@ function App() {
   // ==================== API 请求函数 ====================
   
   /**
-   * 从服务器获取所有待办事项
+   * 从服务器获取所有待办事项（逐页拉取）
    * 成功时更新 todos 状态，失败时显示错误信息
    */
   const fetchTodos = async () => {
     try {
       setLoading(true)
       setError(null)
-      const response = await fetch(`${API_BASE_URL}/todos`)
-      if (!response.ok) throw new Error('Failed to fetch todos')
-      const result = await response.json()
-      setTodos(result.data || [])
+      // 列表接口为游标分页，依次拉取所有页
+      const items = []
+      let cursor = null
+      do {
+        const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''
+        const response = await fetch(`${API_BASE_URL}/todos${query}`)
+        if (!response.ok) throw new Error('Failed to fetch todos')
+        const result = await response.json()
+        items.push(...(result.data?.items || []))
+        cursor = result.data?.next_cursor
+      } while (cursor)
+      setTodos(items)
     } catch (err) {
       console.error('Error fetching todos:', err)
       setError('无法加载待办事项')
@@ -0,0 +1,114 @@
+# ==================== 测试公共夹具 ====================
+
+"""
+测试公共夹具
+
+每个测试使用独立的临时 SQLite 数据库，通过 httpx 的 ASGI 传输直接调用
+backend.main:app（不启动 HTTP 服务，也不执行应用的启动事件）。
+进程内的全局状态（认证缓存、列表缓存、吊销列表、限流和准入控制）在每个测试前重置。
+"""
+
+import os
+import tempfile
+
+# 必须在导入 backend 之前设置：引擎和各项配置在导入时读取环境变量
+_tmpdir = tempfile.mkdtemp(prefix="todo-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'unused.db')}")
+os.environ.setdefault("PASSWORD_HASH_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_HASH_EXECUTOR", "thread")
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend import write_batcher
+from backend.admission import admission_controller
+from backend.config import SQLITE_PRAGMAS
+from backend.database import build_engine, create_schema, get_db
+from backend.events import broker
+from backend.main import app, todo_list_cache
+from backend.rate_limit import login_throttle
+from backend.security import principal_cache, token_cache
+from backend.token_revocation import revocation_list
+
+PASSWORD = "secret1"
+
+
+@pytest.fixture
+def anyio_backend():
+    """异步测试只在 asyncio 上运行"""
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def reset_state(monkeypatch):
+    """重置进程内的全局状态；限流和准入控制默认关闭，由需要的测试单独开启"""
+    token_cache.clear()
+    principal_cache.clear()
+    todo_list_cache.clear()
+    revocation_list.__init__()
+    broker.__init__(broker.queue_size)
+    monkeypatch.setattr(login_throttle, "enabled", False)
+    for limiter in (login_throttle.username_limiter, login_throttle.ip_limiter):
+        limiter._buckets.clear()
+    monkeypatch.setattr(admission_controller, "enabled", False)
+    for limiter in admission_controller.limiters.values():
+        limiter.__init__(limiter.name, limiter.max_concurrent, limiter.max_queue, limiter.queue_timeout)
+    monkeypatch.setattr(write_batcher, "enabled", False)
+    write_batcher._batchers.clear()
+    yield
+
+
+@pytest.fixture
+async def engine():
+    """绑定到临时 SQLite 文件的引擎，并让 get_db 依赖使用它"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        engine = build_engine(f"sqlite:///{os.path.join(tmpdir, 'test.db')}", SQLITE_PRAGMAS)
+        async with engine.begin() as conn:
+            await conn.run_sync(create_schema)
+        session_factory = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+        async def override_get_db():
+            async with session_factory() as db:
+                yield db
+
+        app.dependency_overrides[get_db] = override_get_db
+        try:
+            yield engine
+        finally:
+            app.dependency_overrides.pop(get_db, None)
+            await write_batcher.close_write_batchers()
+            await engine.dispose()
+
+
+@pytest.fixture
+async def client(engine):
+    """通过 ASGI 直接调用应用的 HTTP 客户端"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+async def register(client: httpx.AsyncClient, username: str, password: str = PASSWORD) -> dict:
+    """注册用户并登录，返回登录响应的 data（包含 access_token 和 refresh_token）"""
+    response = await client.post("/api/users", json={"username": username, "password": password})
+    assert response.status_code in (200, 201), response.text
+    response = await client.post("/api/token", params={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+def bearer(tokens: dict) -> dict:
+    """返回带 Access Token 的请求头"""
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+@pytest.fixture
+async def alice(client) -> dict:
+    """已登录用户 alice 的请求头"""
+    return bearer(await register(client, "alice"))
+
+
+@pytest.fixture
+async def bob(client) -> dict:
+    """已登录用户 bob 的请求头"""
+    return bearer(await register(client, "bob"))
@@ -0,0 +1,177 @@
+# ==================== 准入控制测试 ====================
+
+"""
+准入控制测试：路由分类、按到达顺序交接名额、取消时归还名额、过载时返回 503
+"""
+
+import asyncio
+
+import pytest
+
+from backend.admission import (
+    AdmissionController, AdmissionControlMiddleware, AdmissionLimiter, AdmissionRejected, route_class
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def test_route_class():
+    assert route_class("POST", "/api/token") == "auth"
+    assert route_class("PUT", "/api/users/me/password") == "auth"
+    assert route_class("GET", "/api/todos") == "read"
+    assert route_class("GET", "/api/todos/stats") == "read"
+    assert route_class("POST", "/api/todos/batch") == "write"
+    assert route_class("GET", "/api/todos/export") == "transfer"
+    assert route_class("POST", "/api/todos/import") == "transfer"
+    assert route_class("GET", "/api/todos/events") is None
+    assert route_class("OPTIONS", "/api/todos") is None
+    assert route_class("GET", "/metrics") is None
+
+
+async def test_release_hands_slot_to_waiters_in_order():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=4, queue_timeout=1.0)
+    await limiter.acquire()
+    order = []
+
+    async def wait(name):
+        await limiter.acquire()
+        order.append(name)
+
+    waiters = [asyncio.create_task(wait(name)) for name in ("first", "second")]
+    await asyncio.sleep(0)
+    assert limiter.queue_depth == 2
+
+    limiter.release()
+    await asyncio.sleep(0)
+    # 名额直接交给队首，新到达的请求不能插队
+    late = asyncio.create_task(wait("late"))
+    await asyncio.sleep(0)
+    limiter.release()
+    limiter.release()
+    await asyncio.gather(*waiters, late)
+    assert order == ["first", "second", "late"]
+    assert limiter.in_flight == 1
+
+
+async def test_cancelled_waiter_gives_up_its_place():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=4, queue_timeout=1.0)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert limiter.queue_depth == 0
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+async def test_cancelled_after_hand_off_returns_slot():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=4, queue_timeout=1.0)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    # 名额已经交给等待者，但它在恢复运行之前被取消
+    limiter.release()
+    waiter.cancel()
+    try:
+        await waiter
+    except asyncio.CancelledError:
+        pass
+    else:
+        # Python 3.11 的 wait_for 在结果已就绪时吞掉取消，此时调用方正常持有名额
+        limiter.release()
+    assert limiter.in_flight == 0
+    assert limiter.queue_depth == 0
+
+
+async def test_shedding_reasons():
+    limiter = AdmissionLimiter("test", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+    await limiter.acquire()
+
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire()
+    assert limiter.shed["timeout"] == 1
+
+    queued = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected):
+        await limiter.acquire()
+    assert limiter.shed["queue_full"] == 1
+    with pytest.raises(AdmissionRejected):
+        await queued
+
+    # 按平均处理耗时估算的等待超过排队上限时立即拒绝
+    limiter.observe(1.0)
+    with pytest.raises(AdmissionRejected) as excinfo:
+        await limiter.acquire()
+    assert limiter.shed["deadline"] == 1
+    assert excinfo.value.retry_after == pytest.approx(1.0)
+
+
+async def test_middleware_rejects_with_retry_after():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    controller = AdmissionController({"read": AdmissionLimiter("read", 1, 0, 1.0)})
+    middleware = AdmissionControlMiddleware(app, controller)
+    scope = {"type": "http", "method": "GET", "path": "/api/todos"}
+
+    def collector():
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+        return messages, send
+
+    first_messages, first_send = collector()
+    first = asyncio.create_task(middleware(scope, None, first_send))
+    await asyncio.sleep(0)
+
+    rejected_messages, rejected_send = collector()
+    await middleware(scope, None, rejected_send)
+    assert rejected_messages[0]["status"] == 503
+    assert (b"retry-after", b"1") in rejected_messages[0]["headers"]
+
+    release.set()
+    await first
+    assert first_messages[0]["status"] == 200
+    assert controller.limiters["read"].in_flight == 0
+
+
+async def test_transfer_does_not_hold_read_slot_or_skew_service_time():
+    release = asyncio.Event()
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/api/todos/export":
+            await release.wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    controller = AdmissionController({
+        "read": AdmissionLimiter("read", 1, 0, 1.0),
+        "transfer": AdmissionLimiter("transfer", 1, 0, 1.0),
+    })
+    middleware = AdmissionControlMiddleware(app, controller)
+
+    async def send(message):
+        pass
+
+    export = asyncio.create_task(middleware({"type": "http", "method": "GET", "path": "/api/todos/export"}, None, send))
+    await asyncio.sleep(0)
+    assert controller.limiters["transfer"].in_flight == 1
+
+    # 导出进行中，普通读取仍有名额
+    await middleware({"type": "http", "method": "GET", "path": "/api/todos"}, None, send)
+    assert controller.limiters["read"].admitted == 1
+
+    await asyncio.sleep(0.05)
+    release.set()
+    await export
+    assert controller.limiters["read"].service_time < 0.05 <= controller.limiters["transfer"].service_time
@@ -0,0 +1,198 @@
+# ==================== 认证接口测试 ====================
+
+"""
+认证接口测试：登录、Refresh Token 轮换、登出和修改密码时吊销 Token、登录限流和密码 hash 升级
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import security
+from backend.admission import admission_controller
+from backend.models import User
+from backend.rate_limit import login_throttle
+from backend.security import bcrypt_rounds, configure_bcrypt_rounds, password_needs_rehash, wait_rehash_tasks
+from backend.token_revocation import revocation_list
+from tests.conftest import PASSWORD, bearer, register
+
+pytestmark = pytest.mark.anyio
+
+
+async def login(client, username, password=PASSWORD):
+    return await client.post("/api/token", params={"username": username, "password": password})
+
+
+async def test_login_rejects_wrong_password(client):
+    await register(client, "alice")
+    assert (await login(client, "alice", "wrong")).status_code == 401
+    assert (await login(client, "nobody")).status_code == 401
+
+
+async def test_refresh_rotates_and_old_refresh_token_is_single_use(client):
+    tokens = await register(client, "alice")
+
+    response = await client.post("/api/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()["data"]
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert (await client.get("/api/todos", headers=bearer(rotated))).status_code == 200
+
+    response = await client.post("/api/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+
+async def test_refresh_token_reuse_is_rejected_without_local_revocation(client):
+    tokens = await register(client, "alice")
+    refresh = {"refresh_token": tokens["refresh_token"]}
+
+    # 并发使用同一个 Refresh Token 只有一个请求成功
+    responses = await asyncio.gather(*[client.post("/api/token/refresh", json=refresh) for _ in range(5)])
+    assert sorted(response.status_code for response in responses) == [200, 401, 401, 401, 401]
+
+    # 其他 worker 的内存吊销列表还没有同步，重复使用仍由数据库拒绝
+    revocation_list.__init__()
+    response = await client.post("/api/token/refresh", json=refresh)
+    assert response.status_code == 401
+    assert response.json()["error"] == "Token 已失效"
+
+
+async def test_tokens_are_not_interchangeable(client):
+    tokens = await register(client, "alice")
+    response = await client.get("/api/todos", headers={"Authorization": f"Bearer {tokens['refresh_token']}"})
+    assert response.status_code == 401
+    response = await client.post("/api/token/refresh", json={"refresh_token": tokens["access_token"]})
+    assert response.status_code == 401
+
+
+async def test_logout_revokes_access_and_refresh_tokens(client):
+    tokens = await register(client, "alice")
+    other = (await login(client, "alice")).json()["data"]
+
+    response = await client.post(
+        "/api/logout", json={"refresh_token": tokens["refresh_token"]}, headers=bearer(tokens)
+    )
+    assert response.json()["data"] == {"revoked": 2}
+    assert (await client.get("/api/todos", headers=bearer(tokens))).status_code == 401
+    response = await client.post("/api/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    # 其他会话不受影响
+    assert (await client.get("/api/todos", headers=bearer(other))).status_code == 200
+
+
+async def test_change_password_revokes_existing_sessions(client):
+    tokens = await register(client, "alice")
+    other = (await login(client, "alice")).json()["data"]
+
+    response = await client.put(
+        "/api/users/me/password", json={"old_password": "wrong!", "new_password": "changed1"},
+        headers=bearer(tokens)
+    )
+    assert response.status_code == 400
+
+    response = await client.put(
+        "/api/users/me/password", json={"old_password": PASSWORD, "new_password": "changed1"},
+        headers=bearer(tokens)
+    )
+    fresh = response.json()["data"]
+    for old in (tokens, other):
+        assert (await client.get("/api/todos", headers=bearer(old))).status_code == 401
+    response = await client.post("/api/token/refresh", json={"refresh_token": other["refresh_token"]})
+    assert response.status_code == 401
+    assert (await client.get("/api/todos", headers=bearer(fresh))).status_code == 200
+    assert (await login(client, "alice", "changed1")).status_code == 200
+
+
+async def test_change_password_revokes_by_token_version(client, engine):
+    tokens = await register(client, "alice")
+    response = await client.put(
+        "/api/users/me/password", json={"old_password": PASSWORD, "new_password": "changed1"},
+        headers=bearer(tokens)
+    )
+    fresh = response.json()["data"]
+
+    # 模拟其他 worker：从数据库同步吊销记录，按版本号判断，与签发时间无关
+    revocation_list.__init__()
+    async with AsyncSession(engine) as db:
+        await revocation_list.sync(db)
+        user = (await db.execute(select(User).where(User.username == "alice"))).scalar_one()
+    assert user.token_version == 1
+    assert (await client.get("/api/todos", headers=bearer(tokens))).status_code == 401
+    assert (await client.get("/api/todos", headers=bearer(fresh))).status_code == 200
+
+    # 吊销列表为空时，刷新接口仍按数据库中的版本号拒绝旧的 Refresh Token
+    revocation_list.__init__()
+    response = await client.post("/api/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    response = await client.post("/api/token/refresh", json={"refresh_token": fresh["refresh_token"]})
+    assert response.status_code == 200
+
+
+async def test_login_throttle(client, monkeypatch):
+    await register(client, "alice")
+    monkeypatch.setattr(login_throttle, "enabled", True)
+
+    statuses = [(await login(client, "alice", "wrong")).status_code for _ in range(login_throttle.username_limiter.burst + 1)]
+    assert statuses[-1] == 429
+    response = await login(client, "alice")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+async def test_login_upgrades_password_hash(client, engine):
+    await register(client, "alice")
+    rounds = bcrypt_rounds()
+    configure_bcrypt_rounds(rounds + 1)
+    try:
+        assert (await login(client, "alice")).status_code == 200
+        await wait_rehash_tasks()
+    finally:
+        configure_bcrypt_rounds(rounds)
+
+    async with AsyncSession(engine) as session:
+        hashed = (await session.execute(select(User.hashed_password))).scalar_one()
+    assert hashed.startswith(f"$2b${rounds + 1:02d}$")
+
+
+async def test_higher_rounds_are_not_downgraded(client, engine):
+    rounds = bcrypt_rounds()
+    configure_bcrypt_rounds(rounds + 1)
+    try:
+        await register(client, "alice")
+    finally:
+        configure_bcrypt_rounds(rounds)
+
+    async with AsyncSession(engine) as session:
+        hashed = (await session.execute(select(User.hashed_password))).scalar_one()
+    assert not password_needs_rehash(hashed)
+    assert (await login(client, "alice")).status_code == 200
+    await wait_rehash_tasks()
+    async with AsyncSession(engine) as session:
+        assert (await session.execute(select(User.hashed_password))).scalar_one() == hashed
+
+
+async def test_rehash_does_not_hold_admission_slot(client, monkeypatch):
+    await register(client, "alice")
+    release = asyncio.Event()
+
+    async def slow_rehash(bind, user_id, password, old_hash):
+        await release.wait()
+
+    monkeypatch.setattr(security, "rehash_password", slow_rehash)
+    monkeypatch.setattr(admission_controller, "enabled", True)
+    rounds = bcrypt_rounds()
+    configure_bcrypt_rounds(rounds + 1)
+    try:
+        assert (await login(client, "alice")).status_code == 200
+        # 响应返回时升级仍在进行，但准入名额已经归还
+        assert admission_controller.limiters["auth"].in_flight == 0
+        assert len(security.rehash_tasks) == 1
+        # 同一用户的升级不会重复启动
+        assert (await login(client, "alice")).status_code == 200
+        assert len(security.rehash_tasks) == 1
+    finally:
+        configure_bcrypt_rounds(rounds)
+        release.set()
+        await wait_rehash_tasks()
@@ -0,0 +1,100 @@
+# ==================== 认证缓存测试 ====================
+
+"""
+认证缓存测试：TTL 和 LRU 淘汰、缓存命中时不查询数据库、用户修改后失效
+"""
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import cache
+from backend.cache import TTLCache
+from backend.models import User
+from backend.security import principal_cache, token_cache
+from tests.conftest import register
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_per_entry_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    ttl_cache = TTLCache(maxsize=10, ttl=60)
+    ttl_cache.set("long", 1)
+    # 单个条目的存活时间（例如 Token 剩余有效期）不能超过缓存的 ttl
+    ttl_cache.set("short", 2, ttl=5)
+    ttl_cache.set("capped", 3, ttl=3600)
+
+    clock.now += 10
+    assert ttl_cache.get("short") is None
+    assert ttl_cache.get("long") == 1
+    clock.now += 60
+    assert ttl_cache.get("capped") is None
+    assert ttl_cache.stats()["hits"] == 1
+
+
+def test_lru_eviction_and_disabled_cache():
+    ttl_cache = TTLCache(maxsize=2, ttl=60)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert (ttl_cache.get("a"), ttl_cache.get("c")) == (1, 3)
+    assert ttl_cache.evictions == 1
+
+    disabled = TTLCache(maxsize=0, ttl=60)
+    disabled.set("a", 1)
+    assert len(disabled) == 0
+    # 已过期的 Token 不缓存
+    ttl_cache.set("expired", 1, ttl=-1)
+    assert ttl_cache.get("expired") is None
+
+
+async def test_warm_request_skips_token_decode_and_user_query(client, engine):
+    headers = {"Authorization": f"Bearer {(await register(client, 'alice'))['access_token']}"}
+    assert (await client.get("/api/todos", headers=headers)).status_code == 200
+
+    users_queries = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            users_queries.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        token_hits, principal_hits = token_cache.hits, principal_cache.hits
+        assert (await client.get("/api/todos", headers=headers)).status_code == 200
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    assert users_queries == []
+    assert (token_cache.hits, principal_cache.hits) == (token_hits + 1, principal_hits + 1)
+
+
+async def test_password_change_and_delete_invalidate_cached_user(client, engine):
+    headers = {"Authorization": f"Bearer {(await register(client, 'alice'))['access_token']}"}
+    await client.get("/api/todos", headers=headers)
+    assert principal_cache.get("alice") is not None
+
+    async with AsyncSession(engine) as session:
+        user = (await session.execute(select(User).where(User.username == "alice"))).scalar_one()
+        user.hashed_password = "changed"
+        await session.commit()
+    assert principal_cache.get("alice") is None
+
+    await client.get("/api/todos", headers=headers)
+    async with AsyncSession(engine) as session:
+        user = (await session.execute(select(User).where(User.username == "alice"))).scalar_one()
+        await session.delete(user)
+        await session.commit()
+    # 被删除的用户不能继续使用缓存中的记录
+    assert (await client.get("/api/todos", headers=headers)).status_code == 401
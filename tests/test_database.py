@@ -0,0 +1,84 @@
+# ==================== 数据库引擎测试 ====================
+
+"""
+数据库引擎测试：异步驱动选择、SQLite PRAGMA、连接池配置和按方言构建的 INSERT ... ON CONFLICT
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import pool, text
+from sqlalchemy.dialects import postgresql, sqlite
+
+from backend.config import SQLITE_PRAGMAS
+from backend import database
+from backend.database import build_engine, to_async_url, upsert_insert
+from backend.models import TodoStats
+
+pytestmark = pytest.mark.anyio
+
+
+def test_to_async_url_picks_async_driver():
+    assert to_async_url("sqlite:///./todos.db").drivername == "sqlite+aiosqlite"
+    assert to_async_url("sqlite+aiosqlite:///./todos.db").drivername == "sqlite+aiosqlite"
+    assert to_async_url("postgresql://u:p@db/todos").drivername == "postgresql+asyncpg"
+    with pytest.raises(ValueError):
+        to_async_url("mysql://u:p@db/todos")
+
+
+async def test_sqlite_pragmas_apply_to_every_pooled_connection(tmp_path):
+    engine = build_engine(f"sqlite:///{tmp_path / 'pragmas.db'}", SQLITE_PRAGMAS, pool_size=2)
+    try:
+        assert isinstance(engine.pool, pool.AsyncAdaptedQueuePool)
+        assert engine.pool.size() == 2
+
+        async with engine.connect() as first, engine.connect() as second:
+            for conn in (first, second):
+                assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+                # synchronous=NORMAL 读出来是 1
+                assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+                assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == SQLITE_PRAGMAS["busy_timeout"]
+    finally:
+        await engine.dispose()
+
+
+async def test_memory_sqlite_does_not_use_queue_pool():
+    engine = build_engine("sqlite://", SQLITE_PRAGMAS)
+    try:
+        assert not isinstance(engine.pool, pool.AsyncAdaptedQueuePool)
+    finally:
+        await engine.dispose()
+
+
+def test_invalid_pragma_value_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build_engine(f"sqlite:///{tmp_path / 'bad.db'}", {"journal_mode": "WAL; DROP TABLE users"})
+
+
+def test_postgres_pool_and_statement_timeout(monkeypatch):
+    # 只检查传给 create_async_engine 的参数，不需要安装 asyncpg
+    captured = {}
+
+    def fake_create_async_engine(url, **options):
+        captured.update(url=url, **options)
+        return object()
+
+    monkeypatch.setattr(database, "create_async_engine", fake_create_async_engine)
+    build_engine("postgresql://u:p@db/todos", pool_size=7, max_overflow=3, statement_timeout_ms=1500)
+
+    assert captured["url"].drivername == "postgresql+asyncpg"
+    assert captured["poolclass"] is pool.AsyncAdaptedQueuePool
+    assert (captured["pool_size"], captured["max_overflow"]) == (7, 3)
+    assert captured["connect_args"] == {"server_settings": {"statement_timeout": "1500"}}
+
+
+def test_upsert_insert_follows_session_dialect():
+    def session(dialect):
+        return SimpleNamespace(bind=SimpleNamespace(dialect=dialect))
+
+    for dialect in (sqlite.dialect(), postgresql.dialect()):
+        stmt = upsert_insert(session(dialect), TodoStats).values(user_id=1, total=1, completed=0)
+        stmt = stmt.on_conflict_do_nothing(index_elements=[TodoStats.user_id])
+        assert "ON CONFLICT (user_id) DO NOTHING" in str(stmt.compile(dialect=dialect))
+    with pytest.raises(ValueError):
+        upsert_insert(session(SimpleNamespace(name="mysql")), TodoStats)
@@ -0,0 +1,44 @@
+# ==================== 事件推送测试 ====================
+
+"""
+事件分发测试：写操作提交后推送事件，积压溢出时改为 resync
+"""
+
+import pytest
+
+from backend.events import RESYNC_FRAME, EventBroker, broker
+
+pytestmark = pytest.mark.anyio
+
+
+def drain(subscription):
+    frames = []
+    while not subscription.queue.empty():
+        frames.append(subscription.queue.get_nowait())
+    return frames
+
+
+async def test_writes_publish_events_to_owner_only(client, alice, bob):
+    created = await client.post("/api/todos", json={"text": "x"}, headers=alice)
+    user_id = created.json()["data"]["user_id"]
+
+    with broker.subscribe(user_id) as mine, broker.subscribe(user_id + 1) as other:
+        todo_id = created.json()["data"]["id"]
+        await client.put(f"/api/todos/{todo_id}", json={"completed": True}, headers=alice)
+        await client.delete(f"/api/todos/{todo_id}", headers=alice)
+        frames = drain(mine)
+        assert drain(other) == []
+
+    assert len(frames) == 2
+    assert b"event: todo.updated" in frames[0]
+    assert b"event: todo.deleted" in frames[1]
+    assert broker.stats()["connections"] == 0
+
+
+async def test_overflow_replaces_backlog_with_resync():
+    local = EventBroker(queue_size=2)
+    with local.subscribe(1) as subscription:
+        for i in range(3):
+            await local.publish(1, "todo.created", {"id": i}, i)
+        assert drain(subscription) == [RESYNC_FRAME]
+    assert local.stats()["overflows"] == 1
@@ -0,0 +1,44 @@
+# ==================== bcrypt 工作池测试 ====================
+
+"""
+bcrypt 工作池测试：计算不阻塞事件循环，排队超时返回 503
+"""
+
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from backend.security import HashWorkerPool
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_run_does_not_block_event_loop():
+    pool = HashWorkerPool("thread", workers=1, queue_timeout=1.0)
+    release = threading.Event()
+    task = asyncio.create_task(pool.run(release.wait))
+    await asyncio.sleep(0.01)
+
+    # 任务在工作线程中阻塞时，事件循环仍能运行其他协程
+    assert pool.stats()["in_flight"] == 1
+    release.set()
+    assert await task is True
+    assert pool.stats()["completed"] == 1
+
+
+async def test_queue_timeout_returns_503():
+    pool = HashWorkerPool("thread", workers=1, queue_timeout=0.05)
+    release = threading.Event()
+    running = asyncio.create_task(pool.run(release.wait))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(HTTPException) as excinfo:
+        await pool.run(release.wait)
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers["Retry-After"] == "1"
+    assert pool.stats()["rejected"] == 1
+
+    release.set()
+    await running
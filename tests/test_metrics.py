@@ -0,0 +1,83 @@
+# ==================== 监控指标测试 ====================
+
+"""
+监控指标测试：Prometheus 文本格式、按路由模板统计请求、SQL 语句按操作类型计时
+"""
+
+import pytest
+from sqlalchemy import text
+
+from backend.metrics import Counter, Gauge, Histogram, Registry, instrument_engine, registry
+
+pytestmark = pytest.mark.anyio
+
+
+def sample(body: str, prefix: str) -> float:
+    """返回指标文本中以 prefix 开头的样本值，不存在时为 0"""
+    for line in body.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_text_format():
+    local = Registry()
+    counter = local.register(Counter("requests_total", "请求数", ("route",)))
+    histogram = local.register(Histogram("latency_seconds", "耗时", ("op",), buckets=(0.1, 1.0)))
+    local.register(Gauge("queue_depth", "排队数", lambda: {(): 3}))
+
+    counter.inc('/a"b\\c')
+    counter.inc('/a"b\\c', amount=2)
+    histogram.observe(0.05, "read")
+    histogram.observe(0.5, "read")
+    histogram.observe(5, "read")
+
+    assert local.render().splitlines() == [
+        "# HELP requests_total 请求数",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a\\"b\\\\c"} 3',
+        "# HELP latency_seconds 耗时",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{op="read",le="0.1"} 1',
+        'latency_seconds_bucket{op="read",le="1"} 2',
+        'latency_seconds_bucket{op="read",le="+Inf"} 3',
+        'latency_seconds_sum{op="read"} 5.55',
+        'latency_seconds_count{op="read"} 3',
+        "# HELP queue_depth 排队数",
+        "# TYPE queue_depth gauge",
+        "queue_depth 3",
+    ]
+
+
+async def test_requests_are_labelled_by_route_template(client, alice):
+    response = await client.post("/api/todos", json={"text": "x"}, headers=alice)
+    todo_id = response.json()["data"]["id"]
+    await client.put(f"/api/todos/{todo_id}", json={"completed": True}, headers=alice)
+    await client.get("/no/such/path")
+
+    response = await client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    # 路径参数不会产生新的标签值
+    assert sample(body, 'http_requests_total{method="PUT",route="/api/todos/{todo_id}",status="200"}') >= 1
+    assert f"/api/todos/{todo_id}\"" not in body
+    assert sample(body, 'http_requests_total{method="GET",route="unmatched",status="404"}') >= 1
+    assert sample(body, 'http_request_duration_seconds_count{method="POST",route="/api/todos"}') >= 1
+
+
+async def test_sql_statements_are_timed_by_operation(engine, monkeypatch):
+    # 测试引擎的连接池指标不留在全局注册表中
+    monkeypatch.setattr(registry, "_metrics", list(registry._metrics))
+    instrument_engine(engine, pool_name="test")
+
+    before = registry.render()
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+        await conn.execute(text("SELECT 2"))
+        await conn.execute(text("PRAGMA user_version"))
+    after = registry.render()
+
+    prefix = 'db_query_duration_seconds_count{operation="%s"}'
+    assert sample(after, prefix % "SELECT") - sample(before, prefix % "SELECT") == 2
+    assert sample(after, prefix % "OTHER") - sample(before, prefix % "OTHER") == 1
+    assert 'db_pool_connections{pool="test",state="size"}' in after
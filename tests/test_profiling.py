@@ -0,0 +1,108 @@
+# ==================== 请求剖析测试 ====================
+
+"""
+请求剖析测试：Server-Timing 响应头，慢查询日志的参数结构、执行计划、EXPLAIN 的语句范围和 SAVEPOINT
+"""
+
+import logging
+
+import httpx
+import pytest
+from sqlalchemy import event, text
+
+from backend import profiling
+from backend.main import app
+from backend.profiling import ProfilingMiddleware, install_query_profiling, parameter_shape
+from tests.conftest import bearer, register
+
+pytestmark = pytest.mark.anyio
+
+
+def server_timing(header: str) -> dict:
+    """把 Server-Timing 头解析为 {阶段: 参数列表}"""
+    phases = {}
+    for entry in header.split(", "):
+        name, *params = entry.split(";")
+        phases[name] = params
+    return phases
+
+
+def test_parameter_shape_has_no_values():
+    assert parameter_shape((1, "secret", None), False) == "(int, str, NoneType)"
+    assert parameter_shape({"id": 1, "text": "secret"}, False) == "{id: int, text: str}"
+    assert parameter_shape([(1, "a"), (2, "b")], True) == "2 x (int, str)"
+    assert parameter_shape((), False) == "()"
+
+
+async def test_server_timing_header(engine, client):
+    install_query_profiling(engine)
+    headers = bearer(await register(client, "alice"))
+    await client.post("/api/todos", json={"text": "x"}, headers=headers)
+
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as profiled:
+        response = await profiled.get("/api/todos", headers=headers)
+    assert response.status_code == 200
+
+    phases = server_timing(response.headers["server-timing"])
+    assert {"auth", "db", "serialize", "app", "total"} <= set(phases)
+    assert phases["db"][1].startswith('desc="') and phases["db"][1] != 'desc="0 queries"'
+    for params in phases.values():
+        assert float(params[0].removeprefix("dur=")) >= 0
+
+
+async def test_requests_without_profiling_have_no_header(client):
+    response = await client.get("/")
+    assert "server-timing" not in response.headers
+
+
+async def test_slow_query_log_has_shape_and_plan(engine, caplog):
+    # 阈值极小，所有语句都算慢查询
+    install_query_profiling(engine, slow_query_ms=1e-9, explain=True)
+    caplog.set_level(logging.WARNING, logger="backend.profiling")
+
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT id FROM todos WHERE user_id = :user_id"), {"user_id": 424242})
+
+    messages = [record.getMessage() for record in caplog.records if "慢查询" in record.getMessage()]
+    assert len(messages) == 1
+    assert "SELECT id FROM todos WHERE user_id = ?" in messages[0]
+    assert "参数结构: (int)" in messages[0]
+    assert "执行计划:" in messages[0] and "todos" in messages[0].split("执行计划:")[1]
+    # 日志中不包含参数值，EXPLAIN 本身也不会被记录为慢查询
+    assert "424242" not in messages[0]
+
+
+async def test_slow_ddl_is_logged_without_explain(engine, caplog):
+    install_query_profiling(engine, slow_query_ms=1e-9, explain=True)
+    caplog.set_level(logging.WARNING, logger="backend.profiling")
+
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE scratch (id INTEGER)"))
+        await conn.execute(text("DROP TABLE scratch"))
+
+    messages = [record.getMessage() for record in caplog.records if "慢查询" in record.getMessage()]
+    assert [message.split(": ", 1)[1] for message in messages] == [
+        "CREATE TABLE scratch (id INTEGER)\n参数结构: ()",
+        "DROP TABLE scratch\n参数结构: ()",
+    ]
+
+
+async def test_failed_explain_rolls_back_to_savepoint(engine, caplog, monkeypatch):
+    monkeypatch.setitem(profiling.EXPLAIN_PREFIXES, "sqlite", "EXPLAIN NOT VALID ")
+    install_query_profiling(engine, slow_query_ms=1e-9, explain=True)
+    caplog.set_level(logging.WARNING, logger="backend.profiling")
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    async with engine.begin() as conn:
+        await conn.execute(text("INSERT INTO users (username, hashed_password) VALUES ('alice', 'x')"))
+        # 失败的 EXPLAIN 只回滚它自己的 SAVEPOINT，事务中之前的写入仍然提交
+        await conn.execute(text("SELECT id FROM users"))
+    async with engine.connect() as conn:
+        assert (await conn.execute(text("SELECT count(*) FROM users"))).scalar_one() == 1
+
+    assert "EXPLAIN 失败" in caplog.text
+    assert any(statement.startswith("SAVEPOINT") for statement in statements)
+    assert any(statement.startswith("ROLLBACK TO SAVEPOINT") for statement in statements)
@@ -0,0 +1,89 @@
+# ==================== 查询计划测试 ====================
+
+"""
+查询计划回归测试：PLAN_CASES 中的查询不能出现全表扫描或临时排序，
+todos 表上的每个组合索引都至少被一个查询使用
+"""
+
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+from backend.database import create_schema
+from backend.manage import PLAN_CASES, explain_query_plan, find_plan_problems
+from backend.models import Todo
+
+
+@pytest.fixture(scope="module")
+def plan_engine():
+    """按当前模型建表建索引的内存数据库"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        create_schema(conn)
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("name, build", PLAN_CASES, ids=[name for name, _ in PLAN_CASES])
+def test_plan_has_no_full_scan(plan_engine, name, build):
+    plan = explain_query_plan(plan_engine, build())
+    assert find_plan_problems(plan) == [], plan
+
+
+def test_every_todo_index_is_used(plan_engine):
+    plans = "\n".join(
+        step for _, build in PLAN_CASES for step in explain_query_plan(plan_engine, build())
+    )
+    unused = [
+        index.name for index in Todo.__table__.indexes
+        if len(index.columns) > 1 and f"INDEX {index.name}" not in plans
+    ]
+    assert unused == []
+
+
+def test_find_plan_problems():
+    assert find_plan_problems(["SEARCH todos USING INDEX ix_todos_user_id_id (user_id=? AND id<?)"]) == []
+    assert find_plan_problems(["SCAN CONSTANT ROW"]) == []
+    assert find_plan_problems(["SCAN todos", "USE TEMP B-TREE FOR ORDER BY"]) == [
+        "SCAN todos", "USE TEMP B-TREE FOR ORDER BY"
+    ]
+
+
+def test_obsolete_index_is_dropped(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE todos (id INTEGER PRIMARY KEY, user_id INTEGER, updated_at DATETIME)")
+        conn.execute("CREATE INDEX ix_todos_user_updated ON todos (user_id, updated_at)")
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        create_schema(conn)
+    with engine.connect() as conn:
+        names = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    engine.dispose()
+    assert "ix_todos_user_updated" not in names
+    assert "ix_todos_user_revision" in names
+
+
+def test_duplicate_revocations_are_removed_before_unique_index(tmp_path):
+    path = tmp_path / "old.db"
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE token_revocations (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, "
+            "jti VARCHAR(64), revoked_before DATETIME, expires_at DATETIME NOT NULL)"
+        )
+        conn.executemany(
+            "INSERT INTO token_revocations (user_id, jti, expires_at) VALUES (1, ?, '2030-01-01')",
+            [("a",), ("a",), ("b",), (None,), (None,)]
+        )
+
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        create_schema(conn)
+    with engine.connect() as conn:
+        jtis = [row[0] for row in conn.exec_driver_sql("SELECT jti FROM token_revocations ORDER BY id")]
+        names = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    engine.dispose()
+    assert jtis == ["a", "b", None, None]
+    assert "ux_token_revocations_jti" in names
@@ -0,0 +1,152 @@
+# ==================== 登录限流测试 ====================
+
+"""
+登录限流测试：令牌桶的补充、清理和淘汰，用户名令牌在验证前预留、成功时退还，可信代理的客户端 IP 解析
+"""
+
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+from backend import rate_limit
+from backend.rate_limit import LoginThrottle, TokenBucketLimiter, client_ip, login_throttle, parse_trusted_proxies
+from tests.conftest import PASSWORD, register
+
+pytestmark = pytest.mark.anyio
+
+
+# ==================== 令牌桶 ====================
+
+def test_bucket_refills_at_configured_rate():
+    limiter = TokenBucketLimiter(per_minute=60, burst=2)
+    for _ in range(2):
+        assert limiter.retry_after("k", 100.0) == 0
+        limiter.consume("k", 100.0)
+    assert limiter.retry_after("k", 100.0) == pytest.approx(1.0)
+    assert limiter.retry_after("k", 100.5) == pytest.approx(0.5)
+    assert limiter.retry_after("k", 101.0) == 0
+    # 补充不会超过桶容量
+    assert limiter._tokens("k", 1000.0) == 2
+
+
+def test_sweep_drops_only_full_buckets():
+    limiter = TokenBucketLimiter(per_minute=60, burst=2, sweep_interval=10)
+    limiter._last_sweep = 0.0
+    limiter.consume("old", 0.0)
+    limiter.consume("recent", 0.5)
+
+    # 未到清理间隔时不清理
+    limiter.maybe_sweep(5.0)
+    assert len(limiter) == 2
+    # old 在第 1 秒补满，recent 在第 1.5 秒补满
+    assert limiter.sweep(1.2) == 1
+    assert len(limiter) == 1
+    limiter.maybe_sweep(11.2)
+    assert len(limiter) == 0
+
+
+def test_eviction_when_key_limit_reached():
+    limiter = TokenBucketLimiter(per_minute=1, burst=1, max_keys=2)
+    for key in ("a", "b", "c"):
+        limiter.consume(key, 0.0)
+    assert len(limiter) == 2
+    assert limiter.evictions == 1
+    # 最早加入的键被淘汰，重新计为满桶
+    assert limiter.retry_after("a", 0.0) == 0
+    assert limiter.retry_after("c", 0.0) > 0
+
+
+# ==================== 用户名和 IP 维度 ====================
+
+async def test_username_token_reserved_and_refunded_on_success():
+    throttle = LoginThrottle(TokenBucketLimiter(1, 2), TokenBucketLimiter(60, 100))
+    for _ in range(5):
+        await throttle.check("alice", "10.0.0.1")
+        await throttle.record_success("alice")
+
+    # 两次尚未验证完的尝试预留了全部令牌，第三次在验证密码之前被拒绝
+    await throttle.check("alice", "10.0.0.1")
+    await throttle.check("alice", "10.0.0.1")
+    with pytest.raises(Exception) as excinfo:
+        await throttle.check("alice", "10.0.0.2")
+    assert excinfo.value.status_code == 429
+    assert throttle.stats()["throttled_username"] == 1
+
+    # 失败的尝试不退还令牌，成功的尝试退还
+    await throttle.record_failure("alice")
+    await throttle.record_success("alice")
+    await throttle.check("alice", "10.0.0.2")
+    # 其他用户名不受影响
+    await throttle.check("bob", "10.0.0.2")
+
+
+async def test_ip_bucket_charged_on_every_attempt():
+    throttle = LoginThrottle(TokenBucketLimiter(60, 100), TokenBucketLimiter(1, 3))
+    for name in ("a", "b", "c"):
+        await throttle.check(name, "10.0.0.1")
+    with pytest.raises(Exception) as excinfo:
+        await throttle.check(None, "10.0.0.1")
+    assert excinfo.value.status_code == 429
+    assert throttle.stats()["throttled_ip"] == 1
+
+
+async def test_successful_logins_do_not_lock_out(client, monkeypatch):
+    await register(client, "alice")
+    monkeypatch.setattr(login_throttle, "enabled", True)
+    attempts = login_throttle.username_limiter.burst + 2
+
+    for _ in range(attempts):
+        response = await client.post("/api/token", params={"username": "alice", "password": PASSWORD})
+        assert response.status_code == 200
+    # 用已存在的用户名注册也不消耗该用户名的尝试次数
+    for _ in range(attempts):
+        response = await client.post("/api/users", json={"username": "alice", "password": PASSWORD})
+        assert response.status_code == 400
+
+    for _ in range(login_throttle.username_limiter.burst):
+        response = await client.post("/api/token", params={"username": "alice", "password": "wrong!"})
+        assert response.status_code == 401
+    response = await client.post("/api/token", params={"username": "alice", "password": PASSWORD})
+    assert response.status_code == 429
+
+
+async def test_parallel_failures_cannot_exceed_burst(client, monkeypatch):
+    await register(client, "alice")
+    monkeypatch.setattr(login_throttle, "enabled", True)
+    burst = login_throttle.username_limiter.burst
+
+    # 并发请求都在 bcrypt 完成之前通过检查，令牌必须在检查时就扣除
+    responses = await asyncio.gather(*(
+        client.post("/api/token", params={"username": "alice", "password": "wrong!"})
+        for _ in range(burst + 3)
+    ))
+    assert sorted(response.status_code for response in responses) == [401] * burst + [429] * 3
+
+
+# ==================== 客户端 IP ====================
+
+def make_request(peer: str, forwarded_for: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "client": (peer, 12345), "headers": headers})
+
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", [])
+    assert client_ip(make_request("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+
+
+def test_client_ip_through_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit, "trusted_proxies", parse_trusted_proxies("127.0.0.1, 10.0.0.0/8"))
+
+    # 客户端伪造的最左侧地址被忽略，取最右侧的非可信地址
+    assert client_ip(make_request("127.0.0.1", "6.6.6.6, 198.51.100.7, 10.1.2.3")) == "198.51.100.7"
+    assert client_ip(make_request("127.0.0.1")) == "127.0.0.1"
+    assert client_ip(make_request("10.0.0.5", "10.0.0.9")) == "10.0.0.9"
+    # 对端不是可信代理时不采用 X-Forwarded-For
+    assert client_ip(make_request("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+
+
+def test_parse_trusted_proxies_rejects_garbage():
+    with pytest.raises(ValueError):
+        parse_trusted_proxies("not-an-ip")
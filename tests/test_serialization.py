@@ -0,0 +1,63 @@
+# ==================== 序列化测试 ====================
+
+"""
+序列化测试：按列编码的列表响应与 ORM + ApiResponse 的输出逐字节一致，
+未安装 orjson 时标准库回退的输出相同
+"""
+
+from datetime import date, datetime
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import serialization
+from backend.models import Todo
+from backend.schemas import ApiResponse
+from backend.serialization import dumps_json, todo_row_to_dict, todo_rows_to_dicts
+
+pytestmark = pytest.mark.anyio
+
+
+def orm_response_body(todos, message: str, next_cursor=None) -> bytes:
+    """旧的序列化路径：ORM 对象 -> to_dict() -> ApiResponse -> JSONResponse"""
+    response = ApiResponse(
+        success=True,
+        data={"items": [todo.to_dict() for todo in todos], "next_cursor": next_cursor},
+        message=message
+    )
+    return JSONResponse(content=jsonable_encoder(response)).body
+
+
+async def test_list_body_matches_orm_path(client, engine, alice):
+    await client.post("/api/todos", json={"text": "买牛奶", "due_date": "2030-01-02"}, headers=alice)
+    await client.post("/api/todos", json={"text": 'quote " and \\\\ slash', "completed": True}, headers=alice)
+
+    response = await client.get("/api/todos", headers=alice)
+    async with AsyncSession(engine) as session:
+        todos = (await session.execute(select(Todo).order_by(Todo.id.desc()))).scalars().all()
+    assert response.content == orm_response_body(todos, response.json()["message"])
+
+
+async def test_row_dicts_match_to_dict(client, engine, alice):
+    await client.post("/api/todos", json={"text": "a", "due_date": "2030-01-02"}, headers=alice)
+    async with AsyncSession(engine) as session:
+        todo = (await session.execute(select(Todo))).scalar_one()
+        row = (await session.execute(select(*[getattr(Todo, name) for name in serialization.TODO_FIELDS]))).one()
+    assert todo_row_to_dict(row) == todo.to_dict()
+    assert dumps_json(todo_rows_to_dicts([row])) == dumps_json([todo.to_dict()])
+
+
+def test_stdlib_fallback_matches_orjson(monkeypatch):
+    value = {
+        "text": "中文 \"quoted\"",
+        "due_date": date(2030, 1, 2),
+        "created_at": datetime(2030, 1, 2, 3, 4, 5, 678901),
+        "items": [1, None, True],
+    }
+    encoded = dumps_json(value)
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert dumps_json(value) == encoded
+    assert encoded.decode("utf-8").startswith('{"text":"中文')
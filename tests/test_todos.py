@@ -0,0 +1,313 @@
+# ==================== 待办事项接口测试 ====================
+
+"""
+待办事项接口测试：增删改、分页和过滤、ETag、列表缓存、增量同步、批量操作和统计
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import main
+from backend.events import broker
+from backend.main import todo_list_cache
+from backend.models import Todo, TodoRevision
+from backend.stats import check_todo_stats
+
+pytestmark = pytest.mark.anyio
+
+
+async def create(client, headers, text, **fields):
+    response = await client.post("/api/todos", json={"text": text, **fields}, headers=headers)
+    assert response.status_code == 201, response.text
+    return response.json()["data"]
+
+
+async def list_items(client, headers, **params):
+    response = await client.get("/api/todos", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["data"]
+
+
+# ==================== 增删改 ====================
+
+async def test_create_update_delete(client, alice):
+    todo = await create(client, alice, "  buy milk  ")
+    assert todo["text"] == "buy milk"
+    assert todo["completed"] is False
+
+    response = await client.put(f"/api/todos/{todo['id']}", json={"completed": True}, headers=alice)
+    assert response.json()["data"]["completed"] is True
+    assert response.json()["data"]["revision"] > todo["revision"]
+
+    response = await client.delete(f"/api/todos/{todo['id']}", headers=alice)
+    assert response.json()["data"] == {"id": todo["id"]}
+    assert (await list_items(client, alice))["items"] == []
+
+
+async def test_other_users_todo_is_forbidden(client, alice, bob):
+    todo = await create(client, alice, "private")
+
+    response = await client.put(f"/api/todos/{todo['id']}", json={"text": "mine"}, headers=bob)
+    assert response.status_code == 403
+    response = await client.delete(f"/api/todos/{todo['id']}", headers=bob)
+    assert response.status_code == 403
+    response = await client.delete("/api/todos/9999", headers=bob)
+    assert response.status_code == 404
+
+
+async def test_empty_text_is_rejected(client, alice):
+    response = await client.post("/api/todos", json={"text": "   "}, headers=alice)
+    assert response.status_code == 400
+
+
+async def test_empty_update_changes_nothing(client, alice, bob):
+    todo = await create(client, alice, "unchanged")
+    response = await client.get("/api/todos", headers=alice)
+    etag = response.headers["etag"]
+
+    response = await client.put(f"/api/todos/{todo['id']}", json={}, headers=alice)
+    assert response.status_code == 200
+    assert response.json()["data"] == todo
+    # 版本号不变：ETag 仍然有效，增量同步没有变化
+    response = await client.get("/api/todos", headers={**alice, "If-None-Match": etag})
+    assert response.status_code == 304
+    response = await client.get("/api/todos/changes", params={"since": todo["revision"]}, headers=alice)
+    assert response.json()["data"]["changes"] == []
+
+    response = await client.put(f"/api/todos/{todo['id']}", json={}, headers=bob)
+    assert response.status_code == 403
+    response = await client.put("/api/todos/9999", json={}, headers=alice)
+    assert response.status_code == 404
+
+
+# ==================== 分页和过滤 ====================
+
+async def test_keyset_pagination(client, alice):
+    ids = [(await create(client, alice, f"todo {i}"))["id"] for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = await list_items(client, alice, **params)
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == sorted(ids, reverse=True)
+
+
+async def test_filters(client, alice):
+    today = date.today()
+    late = await create(client, alice, "late", due_date=str(today - timedelta(days=1)))
+    done = await create(client, alice, "done", completed=True, due_date=str(today - timedelta(days=1)))
+    future = await create(client, alice, "future", due_date=str(today + timedelta(days=3)))
+
+    def ids(page):
+        return {item["id"] for item in page["items"]}
+
+    assert ids(await list_items(client, alice, completed="true")) == {done["id"]}
+    assert ids(await list_items(client, alice, overdue="true")) == {late["id"]}
+    assert ids(await list_items(client, alice, due_after=str(today))) == {future["id"]}
+    assert ids(await list_items(client, alice, due_before=str(today))) == {late["id"], done["id"]}
+
+
+# ==================== ETag 和列表缓存 ====================
+
+async def test_etag_not_modified_until_write(client, alice):
+    await create(client, alice, "first")
+    response = await client.get("/api/todos", headers=alice)
+    etag = response.headers["etag"]
+
+    response = await client.get("/api/todos", headers={**alice, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    await create(client, alice, "second")
+    response = await client.get("/api/todos", headers={**alice, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+async def test_overdue_etag_changes_across_date_boundary(client, alice, monkeypatch):
+    tomorrow = date.today() + timedelta(days=1)
+    todo = await create(client, alice, "due tomorrow", due_date=str(tomorrow))
+    response = await client.get("/api/todos", params={"overdue": "true"}, headers=alice)
+    assert response.json()["data"]["items"] == []
+    etag = response.headers["etag"]
+
+    class DayAfterTomorrow(date):
+        @classmethod
+        def today(cls):
+            return tomorrow + timedelta(days=1)
+
+    # 版本号没有变化，但日期变化后任务已逾期，不能返回 304 或缓存的旧列表
+    monkeypatch.setattr(main, "date", DayAfterTomorrow)
+    response = await client.get("/api/todos", params={"overdue": "true"}, headers={**alice, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()["data"]["items"]] == [todo["id"]]
+    assert response.headers["etag"] != etag
+
+
+async def test_list_cache_hit_and_invalidation(client, alice):
+    await create(client, alice, "first")
+    first = await client.get("/api/todos", headers=alice)
+    hits = todo_list_cache.hits
+    second = await client.get("/api/todos", headers=alice)
+    assert todo_list_cache.hits == hits + 1
+    assert second.content == first.content
+
+    # 本进程的写入直接删除该用户的缓存
+    await create(client, alice, "second")
+    assert len((await list_items(client, alice))["items"]) == 2
+
+
+async def test_list_cache_is_validated_by_revision(client, engine, alice):
+    todo = await create(client, alice, "first")
+    await list_items(client, alice)
+
+    # 模拟另一个 worker 的提交：版本号变化，但本进程的缓存没有被删除
+    async with AsyncSession(engine) as session:
+        await session.execute(
+            update(TodoRevision).where(TodoRevision.user_id == todo["user_id"]).values(revision=TodoRevision.revision + 1)
+        )
+        await session.commit()
+    misses = todo_list_cache.misses
+    await list_items(client, alice)
+    assert todo_list_cache.misses == misses + 1
+
+
+# ==================== 增量同步 ====================
+
+async def test_changes_since_revision(client, alice):
+    kept = await create(client, alice, "kept")
+    removed = await create(client, alice, "removed")
+    since = removed["revision"]
+
+    await client.put(f"/api/todos/{kept['id']}", json={"text": "kept v2"}, headers=alice)
+    await client.delete(f"/api/todos/{removed['id']}", headers=alice)
+
+    response = await client.get("/api/todos/changes", params={"since": since}, headers=alice)
+    data = response.json()["data"]
+    assert data["reset"] is False
+    assert [todo["text"] for todo in data["changes"]] == ["kept v2"]
+    assert data["deleted"] == [removed["id"]]
+
+    response = await client.get("/api/todos/changes", params={"since": data["revision"]}, headers=alice)
+    assert response.json()["data"]["changes"] == []
+
+    response = await client.get("/api/todos/changes", params={"since": data["revision"] + 1}, headers=alice)
+    assert response.json()["data"]["reset"] is True
+
+
+async def test_changes_when_deleted_id_is_reused(client, alice):
+    first = await create(client, alice, "first")
+    second = await create(client, alice, "second")
+    since = second["revision"]
+
+    # SQLite 会把已删除的最大 id 分配给下一条新记录
+    await client.delete(f"/api/todos/{second['id']}", headers=alice)
+    reused = await create(client, alice, "reused")
+    assert reused["id"] == second["id"]
+
+    response = await client.get("/api/todos/changes", params={"since": since}, headers=alice)
+    data = response.json()["data"]
+    assert [todo["id"] for todo in data["changes"]] == [reused["id"]]
+    assert data["deleted"] == []
+
+    response = await client.get("/api/todos/changes", params={"since": first["revision"]}, headers=alice)
+    assert response.json()["data"]["deleted"] == []
+
+
+# ==================== 批量操作 ====================
+
+async def test_batch_mixed_results(client, alice, bob):
+    mine = await create(client, alice, "mine")
+    gone = await create(client, alice, "gone")
+    theirs = await create(client, bob, "theirs")
+
+    response = await client.post("/api/todos/batch", json={"operations": [
+        {"op": "create", "text": "new"},
+        {"op": "create", "text": " "},
+        {"op": "update", "id": mine["id"], "completed": True},
+        {"op": "update", "id": theirs["id"], "text": "stolen"},
+        {"op": "delete", "id": gone["id"]},
+        {"op": "delete", "id": gone["id"]},
+        {"op": "delete", "id": 9999},
+    ]}, headers=alice)
+    data = response.json()["data"]
+    assert [result["status"] for result in data["results"]] == [201, 400, 200, 403, 200, 409, 404]
+    assert data["succeeded"] == 3
+
+    texts = {item["text"]: item for item in (await list_items(client, alice))["items"]}
+    assert set(texts) == {"new", "mine"}
+    assert texts["mine"]["completed"] is True
+
+
+async def test_batch_without_changes_publishes_nothing(client, alice):
+    todo = await create(client, alice, "x")
+    before = await client.get("/api/todos", headers=alice)
+
+    with broker.subscribe(todo["user_id"]) as subscription:
+        response = await client.post("/api/todos/batch", json={"operations": [
+            {"op": "create", "text": " "},
+            {"op": "update", "id": 9999, "text": "missing"},
+        ]}, headers=alice)
+        assert response.json()["data"]["succeeded"] == 0
+        assert subscription.queue.empty()
+
+    after = await client.get("/api/todos", headers={**alice, "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 304
+
+
+async def test_batch_only_tombstones_rows_actually_deleted(client, engine, alice, monkeypatch):
+    todo = await create(client, alice, "vanishing")
+    # 保留一个更大的 ID，避免 SQLite 把被删除的 ID 分配给批次中新建的任务
+    await create(client, alice, "anchor")
+    # 模拟所有权检查之后、DELETE 之前被并发删除的行
+    async with AsyncSession(engine) as session:
+        await session.execute(delete(Todo).where(Todo.id == todo["id"]))
+        await session.commit()
+    monkeypatch.setattr(main, "todo_owners_query", lambda ids: select(literal(todo["id"]), literal(todo["user_id"])))
+
+    with broker.subscribe(todo["user_id"]) as subscription:
+        response = await client.post("/api/todos/batch", json={"operations": [
+            {"op": "create", "text": "new"},
+            {"op": "delete", "id": todo["id"]},
+        ]}, headers=alice)
+        assert [result["status"] for result in response.json()["data"]["results"]] == [201, 404]
+        frames = []
+        while not subscription.queue.empty():
+            frames.append(subscription.queue.get_nowait())
+    assert len(frames) == 1
+    assert b"event: todo.created" in frames[0]
+
+    response = await client.get("/api/todos/changes", params={"since": todo["revision"]}, headers=alice)
+    assert response.json()["data"]["deleted"] == []
+
+
+# ==================== 统计 ====================
+
+async def test_stats_counters_follow_writes(client, engine, alice):
+    today = date.today()
+    response = await client.get("/api/todos/stats", headers=alice)
+    assert response.json()["data"]["total"] == 0
+
+    first = await create(client, alice, "a", due_date=str(today - timedelta(days=2)))
+    second = await create(client, alice, "b")
+    await client.put(f"/api/todos/{second['id']}", json={"completed": True}, headers=alice)
+    await client.post("/api/todos/batch", json={"operations": [
+        {"op": "create", "text": "c", "completed": True},
+        {"op": "update", "id": second["id"], "completed": False},
+        {"op": "delete", "id": first["id"]},
+    ]}, headers=alice)
+    await client.post(
+        "/api/todos/import", content=b'{"text": "d", "completed": true}\n{"text": "e"}\n', headers=alice
+    )
+
+    stats = (await client.get("/api/todos/stats", headers=alice)).json()["data"]
+    assert stats == {"total": 4, "completed": 2, "pending": 2, "overdue": 0}
+    async with AsyncSession(engine) as session:
+        assert await check_todo_stats(session) == []
@@ -0,0 +1,162 @@
+# ==================== 导入导出和搜索测试 ====================
+
+"""
+导入导出和全文搜索接口测试
+"""
+
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import main
+from backend.database import create_schema
+from backend.queries import fts_match_expression
+from backend.security import principal_cache, token_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_import_then_export_round_trip(client, alice):
+    body = b"".join([
+        b'{"text": "alpha", "completed": true, "due_date": "2030-01-02"}\n',
+        b'{"text": ""}\n',
+        b"not json\n",
+        b"\n",
+        b'{"text": "beta"}',
+    ])
+    response = await client.post("/api/todos/import", content=body, headers=alice)
+    data = response.json()["data"]
+    assert data["imported"] == 2
+    assert data["failed"] == 2
+    assert [error["line"] for error in data["errors"]] == [2, 3]
+
+    response = await client.get("/api/todos/export", headers=alice)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["text"], row["completed"], row["due_date"]) for row in rows] == [
+        ("alpha", True, "2030-01-02"), ("beta", False, None)
+    ]
+
+    response = await client.get("/api/todos/export", params={"format": "csv"}, headers=alice)
+    records = list(csv.DictReader(io.StringIO(response.text)))
+    assert [record["text"] for record in records] == ["alpha", "beta"]
+
+
+async def test_export_releases_request_connection(client, engine, alice, monkeypatch):
+    await client.post("/api/todos/import", content=b'{"text": "a"}\n{"text": "b"}\n', headers=alice)
+    checked_out = []
+
+    def encode(rows):
+        checked_out.append(engine.sync_engine.pool.checkedout())
+        return encode_ndjson_rows(rows)
+
+    encode_ndjson_rows = main.encode_ndjson_rows
+    monkeypatch.setattr(main, "encode_ndjson_rows", encode)
+    # 认证缓存未命中时请求会话会查询用户，占用一个连接
+    token_cache.clear()
+    principal_cache.clear()
+    response = await client.get("/api/todos/export", headers=alice)
+    assert len(response.text.splitlines()) == 2
+    # 只有导出会话占用连接，请求会话的连接已经归还
+    assert checked_out == [1]
+
+
+async def test_export_empty_csv_has_header(client, alice):
+    response = await client.get("/api/todos/export", params={"format": "csv"}, headers=alice)
+    assert response.text.startswith("id,")
+    assert len(response.text.splitlines()) == 1
+
+
+async def test_export_only_own_todos(client, alice, bob):
+    await client.post("/api/todos/import", content=b'{"text": "theirs"}\n', headers=bob)
+    response = await client.get("/api/todos/export", headers=alice)
+    assert response.text == ""
+
+
+async def test_search_prefix_and_tenant_isolation(client, alice, bob):
+    for text in ("buy milk", "walk dog", "milkshake recipe"):
+        await client.post("/api/todos", json={"text": text}, headers=alice)
+    await client.post("/api/todos", json={"text": "milk for bob"}, headers=bob)
+
+    response = await client.get("/api/todos/search", params={"q": "mil"}, headers=alice)
+    texts = {item["text"] for item in response.json()["data"]["items"]}
+    assert texts == {"buy milk", "milkshake recipe"}
+
+    response = await client.get("/api/todos/search", params={"q": "milk buy"}, headers=alice)
+    assert [item["text"] for item in response.json()["data"]["items"]] == ["buy milk"]
+
+
+async def test_search_follows_updates_and_deletes(client, alice):
+    response = await client.post("/api/todos", json={"text": "old words"}, headers=alice)
+    todo_id = response.json()["data"]["id"]
+    await client.put(f"/api/todos/{todo_id}", json={"text": "new words"}, headers=alice)
+
+    async def search(q):
+        response = await client.get("/api/todos/search", params={"q": q}, headers=alice)
+        return [item["id"] for item in response.json()["data"]["items"]]
+
+    assert await search("old") == []
+    assert await search("new") == [todo_id]
+    await client.delete(f"/api/todos/{todo_id}", headers=alice)
+    assert await search("words") == []
+
+
+async def search_texts(client, headers, q):
+    response = await client.get("/api/todos/search", params={"q": q}, headers=headers)
+    return sorted(item["text"] for item in response.json()["data"]["items"])
+
+
+async def test_imported_rows_are_indexed_and_trigger_restored(client, engine, alice, monkeypatch):
+    monkeypatch.setattr(main, "IMPORT_CHUNK_SIZE", 2)
+    body = b"".join(json.dumps({"text": f"imported row {i}"}).encode() + b"\n" for i in range(5))
+    response = await client.post("/api/todos/import", content=body, headers=alice)
+    assert response.json()["data"]["chunks"] == 3
+
+    assert len(await search_texts(client, alice, "import")) == 5
+    await client.post("/api/todos", json={"text": "created afterwards"}, headers=alice)
+    assert await search_texts(client, alice, "afterw") == ["created afterwards"]
+
+
+async def test_failed_import_chunk_restores_trigger(client, engine, alice, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(main, "adjust_todo_stats", broken)
+    response = await client.post("/api/todos/import", content=b'{"text": "lost"}\n', headers=alice)
+    assert response.json()["success"] is False
+    monkeypatch.undo()
+
+    async with AsyncSession(engine) as session:
+        triggers = (await session.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name = 'todos_fts_ai'")
+        )).all()
+    assert len(triggers) == 1
+
+
+def test_match_expression_is_scoped_to_user():
+    assert fts_match_expression(7, ['buy', 'say "hi"']) == 'user_id : "7" AND text : ("buy"* "say ""hi"""*)'
+
+
+def test_old_fts_index_is_rebuilt(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        create_schema(conn)
+        conn.exec_driver_sql("INSERT INTO users (id, username, hashed_password) VALUES (1, 'alice', 'x'), (2, 'bob', 'x')")
+        conn.exec_driver_sql("INSERT INTO todos (user_id, text, completed, revision) VALUES (1, 'buy milk', 0, 1), (2, 'buy milk', 0, 1)")
+        # 旧版本只索引 text 列
+        for statement in ("DROP TRIGGER todos_fts_ai", "DROP TRIGGER todos_fts_ad", "DROP TRIGGER todos_fts_au",
+                          "DROP TABLE todos_fts",
+                          "CREATE VIRTUAL TABLE todos_fts USING fts5(text, content='todos', content_rowid='id')"):
+            conn.exec_driver_sql(statement)
+
+    with engine.begin() as conn:
+        create_schema(conn)
+        rows = conn.exec_driver_sql(
+            "SELECT rowid FROM todos_fts WHERE todos_fts MATCH ?", (fts_match_expression(2, ["milk"]),)
+        ).all()
+    engine.dispose()
+    assert rows == [(2,)]
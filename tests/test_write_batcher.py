@@ -0,0 +1,84 @@
+# ==================== 写入合并测试 ====================
+
+"""
+写入合并测试：并发写操作合并提交，单个操作失败只回滚它自己的 SAVEPOINT
+"""
+
+import asyncio
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend import write_batcher
+from backend.models import Todo, User
+from backend.write_batcher import WriteBatcher
+
+pytestmark = pytest.mark.anyio
+
+
+async def count_todos(engine) -> int:
+    async with AsyncSession(engine) as session:
+        return (await session.execute(select(func.count()).select_from(Todo))).scalar_one()
+
+
+async def test_failed_operation_only_rolls_back_itself(engine):
+    async with AsyncSession(engine) as session:
+        user_id = (await session.execute(
+            insert(User).values(username="carol", hashed_password="x").returning(User.id)
+        )).scalar_one()
+        await session.commit()
+
+    async def add(db):
+        db.add(Todo(user_id=user_id, text="kept"))
+        await db.flush()
+        return "ok"
+
+    async def add_then_fail(db):
+        db.add(Todo(user_id=user_id, text="rolled back"))
+        await db.flush()
+        raise ValueError("boom")
+
+    batcher = WriteBatcher(engine, max_batch_size=8, window_ms=20)
+    results = await asyncio.gather(
+        batcher.submit(add), batcher.submit(add_then_fail), batcher.submit(add),
+        return_exceptions=True
+    )
+
+    assert results[0] == results[2] == "ok"
+    assert isinstance(results[1], ValueError)
+    assert (batcher.batches, batcher.operations, batcher.failed) == (1, 3, 1)
+    assert await count_todos(engine) == 2
+
+
+async def test_cancelled_operation_is_skipped(engine):
+    calls = []
+
+    async def record(db):
+        calls.append(1)
+
+    batcher = WriteBatcher(engine, max_batch_size=8, window_ms=50)
+    cancelled = asyncio.ensure_future(batcher.submit(record))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    await batcher.submit(record)
+    assert calls == [1]
+
+
+async def test_concurrent_requests_share_commits(client, alice, monkeypatch):
+    monkeypatch.setattr(write_batcher, "enabled", True)
+
+    responses = await asyncio.gather(
+        *[client.post("/api/todos", json={"text": f"todo {i}"}, headers=alice) for i in range(10)],
+        client.put("/api/todos/9999", json={"text": "missing"}, headers=alice),
+    )
+
+    assert [response.status_code for response in responses] == [201] * 10 + [404]
+    revisions = sorted(response.json()["data"]["revision"] for response in responses[:10])
+    assert revisions == list(range(revisions[0], revisions[0] + 10))
+    stats = write_batcher.write_batching_stats()
+    assert stats["operations"] == 11
+    assert stats["batches"] < 11
+
+    response = await client.get("/api/todos/stats", headers=alice)
+    assert response.json()["data"]["total"] == 10